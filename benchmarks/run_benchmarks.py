@@ -0,0 +1,183 @@
+"""
+Scaling benchmarks of the pipeline stages on synthetic datasets.
+
+Generates a synthetic dataset per size, runs every stage on it and records the wall time and
+the peak traced memory. The results are compared with a stored baseline and the script exits
+with status 1 when a stage got slower or larger than threshold times its baseline.
+
+Up to the kaggle size the whole dataset is loaded with csv_combined (about 3 GB at its peak).
+kaggle-10x (about 157M rows, 10 GB of CSV files) is only run through the streaming statistics
+of src.streaming, which keep one file in memory at a time; the plots are skipped there.
+
+    python benchmarks/run_benchmarks.py                      # compare with benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --sizes small kaggle
+    python benchmarks/run_benchmarks.py --update-baseline    # store the current results as baseline
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import data_visualization
+from src.data_analysis import (analyze_responses_by_condition_and_group, compute_group_differences,
+                               map_sensors_to_regions, perform_t_tests)
+from src.data_cleaning import csv_combined
+from src.streaming import (condition_stats_from_stats, group_differences_from_stats, stream_statistics,
+                           t_tests_from_stats)
+from src.synthetic_data import generate_dataset
+
+# Dataset sizes: subjects per group and trials per subject (64 channels x 256 samples per trial)
+SIZES = {
+    "small": {"n_alcoholic": 4, "n_control": 4, "n_trials": 6},            # 48 trials, 0.8M rows
+    "medium": {"n_alcoholic": 10, "n_control": 10, "n_trials": 12},        # 240 trials, 3.9M rows
+    "kaggle": {"n_alcoholic": 60, "n_control": 60, "n_trials": 8},         # 960 trials, about the Kaggle files
+    "kaggle-10x": {"n_alcoholic": 60, "n_control": 60, "n_trials": 80},    # 9,600 trials, streamed
+}
+# Too large to load at once
+STREAMING_SIZES = {"kaggle-10x"}
+
+# Measured on one machine: regenerate it with --update-baseline before comparing on another
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Differences below these floors are noise, not regressions
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 1.0
+
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func and returns its result, the wall time in seconds and the peak traced memory in MB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def run_stages(directory_path, figures_dir):
+    """
+    Runs the pipeline stages on a dataset and returns {stage: {"seconds", "peak_mb"}}.
+    """
+    value, subject_identifier, position = "sensor value", "subject identifier", "sensor position"
+    condition = "matching condition"
+    results = {}
+
+    def stage(name, func, *args, **kwargs):
+        result, seconds, peak_mb = measure(func, *args, **kwargs)
+        results[name] = {"seconds": round(seconds, 4), "peak_mb": round(peak_mb, 2)}
+        print(f"  {name:<28} {seconds:8.3f} s {peak_mb:10.1f} MB")
+        return result
+
+    # The typed ingestion the CLI uses, in threads so tracemalloc sees its memory, without
+    # progress output (the serial path prints a line per file, which would be timed as well)
+    combined_df = stage("csv_combined", csv_combined, directory_path, executor="thread", progress_every=0)
+    sensor_df = stage("map_sensors_to_regions", map_sensors_to_regions, combined_df.copy(deep=False), position)
+    stage("perform_t_tests", perform_t_tests, combined_df, value, subject_identifier, position, "a", "c",
+          ["X", "Y", "nd"], verbose=False)
+    stage("compute_group_differences", compute_group_differences, combined_df, value, subject_identifier, position,
+          "a", "c")
+    stage("analyze_responses", analyze_responses_by_condition_and_group, combined_df, value, condition,
+          subject_identifier)
+    stage("plot_time_series", data_visualization.time_series_visualization, combined_df, "time", value,
+          subject_identifier, save_path=os.path.join(figures_dir, "time_series.png"))
+    stage("plot_brain_regions", data_visualization.plot_brain_region_analysis, sensor_df, subject_identifier, value,
+          save_path=os.path.join(figures_dir, "regions.png"))
+    stage("plot_conditions", data_visualization.visualize_all_conditions, combined_df, value, condition,
+          subject_identifier, save_path=os.path.join(figures_dir, "conditions.png"))
+    return results
+
+
+def run_streaming_stages(directory_path):
+    """
+    Runs the streaming statistics and the analyses computed from them, returns {stage: {"seconds", "peak_mb"}}.
+    """
+    subject_identifier, position = "subject identifier", "sensor position"
+    results = {}
+
+    def stage(name, func, *args, **kwargs):
+        result, seconds, peak_mb = measure(func, *args, **kwargs)
+        results[name] = {"seconds": round(seconds, 4), "peak_mb": round(peak_mb, 2)}
+        print(f"  {name:<28} {seconds:8.3f} s {peak_mb:10.1f} MB")
+        return result
+
+    stats = stage("stream_statistics", stream_statistics, directory_path)
+    stage("t_tests_from_stats", t_tests_from_stats, stats, position, subject_identifier, "a", "c", ["X", "Y", "nd"])
+    stage("group_differences_from_stats", group_differences_from_stats, stats, position, subject_identifier, "a",
+          "c")
+    stage("condition_stats_from_stats", condition_stats_from_stats, stats, "matching condition", subject_identifier)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Lists the stages whose time or peak memory exceeds threshold times the baseline.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for name, current in stages.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+                if current[metric] > threshold * reference[metric] and current[metric] - reference[metric] > floor:
+                    regressions.append(f"{size}/{name}: {metric} {current[metric]} > {threshold} x {reference[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Allowed ratio to the baseline (default 1.5)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--data-dir", help="Keep the generated datasets here and reuse them on later runs")
+    parser.add_argument("--workers", type=int, help="Processes used to generate the datasets")
+    args = parser.parse_args(argv)
+
+    data_visualization.use_headless_backend()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            directory_path = os.path.join(args.data_dir or tmp, size)
+            if not os.path.isdir(directory_path):
+                print(f"Generating the {size} dataset ...")
+                generate_dataset(directory_path, **SIZES[size], workers=args.workers)
+            figures_dir = os.path.join(tmp, f"figures-{size}")
+            os.makedirs(figures_dir, exist_ok=True)
+            print(f"{size}:")
+            if size in STREAMING_SIZES:
+                results[size] = run_streaming_stages(directory_path)
+            else:
+                results[size] = run_stages(directory_path, figures_dir)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print("No regressions." if not regressions else f"{len(regressions)} regression(s).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.data_analysis import analyze_responses_by_condition_and_group, compute_group_differences
+from src.eeg_dataset import as_dataframe
+from src.shared_data import attach_array, release_array, share_array
+
+# Set in every worker process by _init_worker
+_worker_state = {}
+
+
+def _unit_totals(combined_df, value, subject_identifier, cell, unit_columns, groups):
+    """
+    Sum and count of value per resampling unit and cell, plus the group of each unit.
+
+    Returns:
+        tuple: (units, cells) float64 sums and counts, the group label of every unit and the cells.
+    """
+    df = combined_df[combined_df[subject_identifier].isin(groups)]
+    totals = df.groupby(unit_columns + [subject_identifier, cell], observed=True)[value].agg(["sum", "count"])
+    sums = totals["sum"].unstack(cell, fill_value=0)
+    counts = totals["count"].unstack(cell, fill_value=0).reindex(index=sums.index, columns=sums.columns)
+    unit_groups = sums.index.get_level_values(subject_identifier).to_numpy()
+    return sums.to_numpy(np.float64), counts.to_numpy(np.float64), unit_groups, sums.columns
+
+
+def _init_worker(sums, counts, group_units):
+    _worker_state.update(sums=sums, counts=counts, group_units=group_units)
+
+
+def _init_shared_worker(handles, group_units):
+    _init_worker(attach_array(handles[0]), attach_array(handles[1]), group_units)
+
+
+def _resample_batch(seed, n_resamples):
+    """
+    Group means of a batch of bootstrap resamples, shaped (groups, resamples, cells).
+
+    Units are drawn with replacement within each group; a resample is a vector of draw counts
+    per unit, so the sums and counts of all resamples of the batch are two matrix products.
+    """
+    state = _worker_state
+    rng = np.random.default_rng(seed)
+    means = []
+    for units in state["group_units"]:
+        weights = rng.multinomial(len(units), np.full(len(units), 1 / len(units)), size=n_resamples).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means.append((weights @ state["sums"][units]) / (weights @ state["counts"][units]))
+    return np.stack(means)
+
+
+def bootstrap_means(sums, counts, group_units, n_resamples=10000, workers=None, seed=0, batch_size=500):
+    """
+    Bootstrap distribution of the mean of every cell for every group.
+
+    Args:
+        sums (np.ndarray): (units, cells) sums of the values of each resampling unit.
+        counts (np.ndarray): (units, cells) number of values behind the sums.
+        group_units (list): Per group, the indices of its units.
+        n_resamples (int, optional): Number of bootstrap resamples (default is 10000).
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the resamples (default is 0).
+        batch_size (int, optional): Resamples per batch (default is 500).
+
+    Returns:
+        np.ndarray: Means shaped (groups, resamples, cells). Every batch has its own seed derived
+        from `seed`, so the result doesn't depend on the number of workers.
+    """
+    batches = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        batches.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    workers = min(workers or os.cpu_count() or 1, len(batches)) or 1
+
+    if workers == 1:
+        _init_worker(sums, counts, group_units)
+        parts = [_resample_batch(batch_seed, size) for batch_seed, size in zip(seeds, batches)]
+    else:
+        # The unit totals are published once in shared memory instead of pickled to every worker
+        shared = [share_array(sums), share_array(counts)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                                     initargs=([handle for _, handle in shared], group_units)) as pool:
+                parts = list(pool.map(_resample_batch, seeds, batches))
+        finally:
+            for block, _ in shared:
+                release_array(block)
+    return np.concatenate(parts, axis=1) if parts else np.empty((len(group_units), 0, sums.shape[1]))
+
+
+def _unit_columns(level, subject, trial):
+    if level == "subject":
+        return [subject]
+    if level == "trial":
+        return [subject, trial]
+    raise ValueError(f"level must be 'subject' or 'trial', got {level!r}")
+
+
+def bootstrap_group_differences(combined_df, value, subject_id, position, group1, group2, level="subject",
+                                subject="name", trial="trial number", n_resamples=10000, confidence=0.95,
+                                workers=None, seed=0):
+    """
+    `compute_group_differences` with bootstrap confidence intervals of the absolute difference.
+
+    Subjects (or trials) are resampled with replacement within each group; the per-unit sums
+    of every sensor are computed once and each batch of resamples is a matrix product over
+    them, spread over a process pool with reproducible per-batch seeds.
+
+    Args:
+        combined_df (DataFrame): The dataset to analyze (or an EEGDataset).
+        value (str): Column name for numerical values.
+        subject_id (str): Column name for group/category.
+        position (str): Column name for sensor positions (or any other column to compare by,
+            e.g. the condition).
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+        level (str, optional): "subject" or "trial", the resampling unit (default is "subject").
+        subject (str, optional): Column with the subject name (default is "name").
+        trial (str, optional): Column with the trial number (default is "trial number").
+        n_resamples (int, optional): Number of bootstrap resamples (default is 10000).
+        confidence (float, optional): Confidence level of the percentile intervals (default is 0.95).
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the resamples (default is 0).
+
+    Returns:
+        DataFrame: The output of `compute_group_differences` with "ci low" and "ci high" columns
+        bounding the absolute difference.
+    """
+    combined_df = as_dataframe(combined_df)
+    result = compute_group_differences(combined_df, value, subject_id, position, group1, group2)
+
+    sums, counts, unit_groups, cells = _unit_totals(combined_df, value, subject_id, position,
+                                                    _unit_columns(level, subject, trial), [group1, group2])
+    group_units = [np.flatnonzero(unit_groups == group) for group in (group1, group2)]
+    means = bootstrap_means(sums, counts, group_units, n_resamples, workers, seed)
+
+    tail = 100 * (1 - confidence) / 2
+    low, high = np.nanpercentile(np.abs(means[0] - means[1]), [tail, 100 - tail], axis=0)
+    result["ci low"] = pd.Series(low, index=cells)
+    result["ci high"] = pd.Series(high, index=cells)
+    return result
+
+
+def bootstrap_condition_stats(combined_df, value, condition, subject_identifier, level="subject", subject="name",
+                              trial="trial number", n_resamples=10000, confidence=0.95, workers=None, seed=0):
+    """
+    `analyze_responses_by_condition_and_group` with bootstrap confidence intervals of the means.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset to analyze (or an EEGDataset).
+        value (str): Column name for numerical values.
+        condition (str): Column name for the conditions.
+        subject_identifier (str): Column name for the group.
+        level (str, optional): "subject" or "trial", the resampling unit (default is "subject").
+        subject (str, optional): Column with the subject name (default is "name").
+        trial (str, optional): Column with the trial number (default is "trial number").
+        n_resamples (int, optional): Number of bootstrap resamples (default is 10000).
+        confidence (float, optional): Confidence level of the percentile intervals (default is 0.95).
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the resamples (default is 0).
+
+    Returns:
+        pd.DataFrame: The mean and standard deviation for each condition and group, with
+        "ci low" and "ci high" columns bounding the mean.
+    """
+    combined_df = as_dataframe(combined_df)
+    result = analyze_responses_by_condition_and_group(combined_df, value, condition, subject_identifier)
+
+    groups = list(pd.unique(result[subject_identifier]))
+    sums, counts, unit_groups, cells = _unit_totals(combined_df, value, subject_identifier, condition,
+                                                    _unit_columns(level, subject, trial), groups)
+    group_units = [np.flatnonzero(unit_groups == group) for group in groups]
+    means = bootstrap_means(sums, counts, group_units, n_resamples, workers, seed)
+
+    tail = 100 * (1 - confidence) / 2
+    with np.errstate(all="ignore"):
+        bounds = np.nanpercentile(means, [tail, 100 - tail], axis=1)
+    intervals = pd.DataFrame({
+        condition: np.tile(np.asarray(cells, dtype=object), len(groups)),
+        subject_identifier: np.repeat(np.asarray(groups, dtype=object), len(cells)),
+        "ci low": bounds[0].reshape(-1),
+        "ci high": bounds[1].reshape(-1),
+    })
+    keys = [condition, subject_identifier]
+    intervals = intervals.set_index(keys).reindex(pd.MultiIndex.from_frame(result[keys].astype(object)))
+    result["ci low"] = intervals["ci low"].to_numpy()
+    result["ci high"] = intervals["ci high"].to_numpy()
+    return result
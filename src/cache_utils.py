@@ -0,0 +1,79 @@
+import dataclasses
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def _update_hash(digest, obj):
+    if isinstance(obj, np.ndarray):
+        array = np.ascontiguousarray(obj)
+        digest.update(f"ndarray{array.dtype}{array.shape}".encode())
+        if array.dtype == object:
+            digest.update(pd.util.hash_array(array.ravel()).tobytes())
+        else:
+            digest.update(array.tobytes())
+    elif isinstance(obj, pd.DataFrame):
+        digest.update(f"DataFrame{list(obj.columns)}{list(obj.dtypes)}".encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        digest.update(f"Series{obj.name}{obj.dtype}".encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        digest.update(type(obj).__name__.encode())
+        for field in dataclasses.fields(obj):
+            digest.update(field.name.encode())
+            _update_hash(digest, getattr(obj, field.name))
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_hash(digest, item)
+    else:
+        digest.update(json.dumps(obj, sort_keys=True, default=str).encode())
+
+
+def fingerprint(*objs):
+    """
+    Content hash of arrays, DataFrames, dataclasses (e.g. EEGTensor) and JSON-like parameters.
+
+    Args:
+        *objs: The objects to hash together.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for obj in objs:
+        _update_hash(digest, obj)
+    return digest.hexdigest()
+
+
+def cached(cache_dir, name, key, compute, refresh=False):
+    """
+    Returns the result stored under (name, key) in cache_dir, computing and storing it if missing.
+
+    Args:
+        cache_dir (str): Cache directory; None disables caching.
+        name (str): Name of the cached result (part of the file name).
+        key (str): Fingerprint of everything the result depends on.
+        compute (callable): Computes the result when it isn't cached.
+        refresh (bool, optional): Recompute and overwrite the stored result (default is False).
+
+    Returns:
+        The cached or freshly computed result.
+    """
+    if cache_dir is None:
+        return compute()
+
+    path = os.path.join(cache_dir, f"{name}-{key[:32]}.pkl")
+    if not refresh and os.path.exists(path):
+        return pd.read_pickle(path)
+
+    result = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    pd.to_pickle(result, tmp_path)
+    os.replace(tmp_path, path)
+    return result
@@ -0,0 +1,291 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import optimize
+
+from src.cache_utils import cached, fingerprint
+from src.data_analysis import region_lookup, tested_sensors
+from src.data_cleaning import DEFAULT_CACHE_DIR
+from src.eeg_dataset import as_dataframe
+from src.eeg_tensor import EEGTensor
+from src.shared_data import attach_array, release_array, share_array
+from src.spectral_analysis import FREQUENCY_BANDS, SAMPLING_RATE, band_power_array
+
+# Set in every worker process by _init_worker
+_worker_state = {}
+
+
+def _trial_features(data, region_matrix, sampling_rate, bands):
+    """
+    (trials, channels + regions, features) mean, variance and log10 band powers of a batch of
+    trials; region features are the means of the features of their channels.
+    """
+    with np.errstate(all="ignore"):
+        means = np.nanmean(data, axis=2, dtype=np.float64)
+        variances = np.nanvar(data, axis=2, dtype=np.float64)
+        powers = np.log10(band_power_array(data, sampling_rate, bands) + 1e-12)
+    channel_features = np.concatenate([means[..., None], variances[..., None], powers], axis=2)
+
+    # Averaging over the channels of each region is one product with the (channels, regions) matrix;
+    # missing channels are left out of the average
+    present = ~np.isnan(channel_features)
+    totals = np.einsum("tcf,cr->trf", np.where(present, channel_features, 0.0), region_matrix)
+    counts = np.einsum("tcf,cr->trf", present.astype(np.float64), region_matrix)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        region_features = totals / counts
+    return np.concatenate([channel_features, region_features], axis=1)
+
+
+def _feature_frame(tensor, sampling_rate, bands, batch_size):
+    regions = region_lookup(np.asarray(tensor.channels, dtype=object))
+    region_names = list(dict.fromkeys(regions[regions != "Unknown Region"]))
+    region_matrix = (regions[:, None] == np.array(region_names, dtype=object)[None, :]).astype(np.float64)
+
+    n_trials = tensor.data.shape[0]
+    batches = [_trial_features(tensor.data[start:start + batch_size], region_matrix, sampling_rate, bands)
+               for start in range(0, n_trials, batch_size)]
+    n_features = (len(tensor.channels) + len(region_names)) * (2 + len(bands))
+    features = np.concatenate(batches).reshape(n_trials, -1) if batches else np.empty((0, n_features))
+
+    names = [f"{unit} {feature}" for unit in [*map(str, tensor.channels), *region_names]
+             for feature in ["mean", "var", *bands]]
+    return pd.DataFrame(features, columns=names, index=pd.MultiIndex.from_frame(tensor.trial_metadata()))
+
+
+def feature_matrix(tensor, sampling_rate=SAMPLING_RATE, bands=FREQUENCY_BANDS, batch_size=512,
+                   cache_dir=os.path.join(DEFAULT_CACHE_DIR, "features"), unknown_regions=("X", "Y", "nd")):
+    """
+    Trial x feature matrix: the mean, variance and log10 power of every frequency band of each
+    channel and of each brain region (the average over the region's channels, assigned with
+    `assign_brain_region`). As in the t-tests, channels listed in unknown_regions or without a
+    known brain region (the non-electrode channels) are left out.
+
+    Every batch of batch_size trials is computed at once over the (trials, channels, samples)
+    array, which bounds the memory of the spectral estimates. The matrix is cached on disk,
+    keyed by the content of the tensor and the parameters.
+
+    Args:
+        tensor (EEGTensor): The EEG data.
+        sampling_rate (float, optional): Sampling rate in Hz (default is 256).
+        bands (dict, optional): Band name -> (low, high) frequencies in Hz (default is FREQUENCY_BANDS).
+        batch_size (int, optional): Trials per batch (default is 512).
+        cache_dir (str, optional): Cache directory; None disables caching.
+        unknown_regions (tuple, optional): Channels to leave out (default is X, Y and nd).
+
+    Returns:
+        pd.DataFrame: One row per trial, indexed by the trial metadata (subject, trial number,
+        group, condition), with columns such as "FP1 mean", "FP1 alpha" or "Frontal Lobe var".
+    """
+    channels, _ = tested_sensors(tensor.channels, unknown_regions)
+    if len(channels) < len(tensor.channels):
+        tensor = tensor.select(channels=channels)
+    params = {"sampling_rate": sampling_rate, "bands": bands}
+    key = fingerprint(tensor, params)
+    return cached(cache_dir, "feature_matrix", key, lambda: _feature_frame(tensor, sampling_rate, bands, batch_size))
+
+
+def subject_folds(subjects, labels, n_folds=5, seed=0):
+    """
+    Assigns every trial to a cross-validation fold so that all trials of a subject share a fold.
+
+    The subjects of each class are shuffled and dealt to the folds in turn, so the classes are
+    spread evenly over the folds and no subject is ever in both a training and a test set.
+
+    Args:
+        subjects (np.ndarray): Subject of each trial.
+        labels (np.ndarray): Class of each trial (constant per subject).
+        n_folds (int, optional): Number of folds (default is 5).
+        seed (int, optional): Seed of the shuffle (default is 0).
+
+    Returns:
+        np.ndarray: Fold index of each trial.
+    """
+    subject_codes, unique_subjects = pd.factorize(subjects)
+    if not 2 <= n_folds <= len(unique_subjects):
+        raise ValueError(f"n_folds must be between 2 and the number of subjects ({len(unique_subjects)}), "
+                         f"got {n_folds}")
+    subject_labels = pd.Series(labels).groupby(subject_codes).first().to_numpy()
+    rng = np.random.default_rng(seed)
+    subject_fold = np.empty(len(unique_subjects), dtype=np.int64)
+    offset = 0
+    for label in pd.unique(subject_labels):
+        members = rng.permutation(np.flatnonzero(subject_labels == label))
+        subject_fold[members] = (offset + np.arange(len(members))) % n_folds
+        offset += len(members)
+    return subject_fold[subject_codes]
+
+
+def fit_logistic(x, y, l2=1.0):
+    """
+    L2-regularized logistic regression fitted with L-BFGS.
+
+    Args:
+        x (np.ndarray): (trials, features) standardized features.
+        y (np.ndarray): 0/1 labels.
+        l2 (float, optional): Strength of the penalty on the coefficients (default is 1.0).
+
+    Returns:
+        tuple: (coefficients, intercept)
+    """
+    n, p = x.shape
+
+    def loss(params):
+        w, b = params[:p], params[p]
+        z = x @ w + b
+        # log(1 + exp(z)) - y z, and its gradient, computed without overflow
+        value = np.logaddexp(0, z).sum() - y @ z + 0.5 * l2 * w @ w
+        residual = 1 / (1 + np.exp(-z)) - y
+        return value / n, np.append(x.T @ residual + l2 * w, residual.sum()) / n
+
+    result = optimize.minimize(loss, np.zeros(p + 1), jac=True, method="L-BFGS-B")
+    return result.x[:p], result.x[p]
+
+
+def fit_nearest_centroid(x, y, l2=None):
+    """
+    Nearest-centroid classifier on standardized features, as a linear decision function.
+
+    Returns:
+        tuple: (coefficients, intercept)
+    """
+    positive, negative = x[y == 1].mean(axis=0), x[y == 0].mean(axis=0)
+    w = positive - negative
+    return w, -w @ (positive + negative) / 2
+
+
+CLASSIFIERS = {
+    "logistic": fit_logistic,
+    "centroid": fit_nearest_centroid,
+}
+
+
+def _init_worker(x, y, folds):
+    _worker_state.update(x=x, y=y, folds=folds)
+
+
+def _init_shared_worker(handle, y, folds):
+    _init_worker(attach_array(handle), y, folds)
+
+
+def _run_fold(fold, classifier, l2):
+    """
+    Fits the classifier on all folds but one and predicts the held-out fold. The features are
+    standardized with the statistics of the training trials only.
+    """
+    x, y, folds = _worker_state["x"], _worker_state["y"], _worker_state["folds"]
+    train, test = folds != fold, folds == fold
+    with np.errstate(all="ignore"):
+        mean = np.nanmean(x[train], axis=0)
+        std = np.nanstd(x[train], axis=0)
+    mean = np.nan_to_num(mean)
+    std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    x_train = np.nan_to_num((x[train] - mean) / std)
+    x_test = np.nan_to_num((x[test] - mean) / std)
+
+    w, b = CLASSIFIERS[classifier](x_train, y[train], l2)
+    return fold, (x_test @ w + b > 0).astype(np.int64), w
+
+
+def cross_validate(features, subject="name", subject_identifier="subject identifier", group1="a", group2="c",
+                   classifier="logistic", n_folds=5, l2=1.0, workers=None, seed=0):
+    """
+    Subject-grouped k-fold cross-validation of a classifier separating group1 from group2.
+
+    All trials of a subject are in the same fold, so the classifier is always tested on
+    subjects it has never seen. The folds are fitted in parallel worker processes that share
+    the feature matrix through shared memory.
+
+    Args:
+        features (pd.DataFrame): Output of `feature_matrix`, with the subject and group in its index.
+        subject (str, optional): Index level with the subject name (default is "name").
+        subject_identifier (str, optional): Index level with the group (default is "subject identifier").
+        group1 (str, optional): Label of the positive group (default is 'a', alcoholic).
+        group2 (str, optional): Label of the negative group (default is 'c', control).
+        classifier (str, optional): Key of CLASSIFIERS (default is "logistic").
+        n_folds (int, optional): Number of folds (default is 5).
+        l2 (float, optional): Penalty of the logistic regression (default is 1.0).
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the fold assignment (default is 0).
+
+    Returns:
+        dict: "accuracy" (share of correctly classified test trials), "subject accuracy" (share of
+        subjects whose majority vote is correct), "baseline" (share of the larger group), "folds"
+        (a DataFrame with the size and accuracy of every fold), "predictions" (the out-of-fold
+        prediction of every trial) and "importance" (the mean absolute standardized coefficient
+        of every feature over the folds, largest first, with its mean signed coefficient).
+    """
+    if classifier not in CLASSIFIERS:
+        raise ValueError(f"classifier must be one of {list(CLASSIFIERS)}, got {classifier!r}")
+    groups = features.index.get_level_values(subject_identifier)
+    features = features[np.isin(groups, [group1, group2])]
+    subjects = np.asarray(features.index.get_level_values(subject))
+    y = (np.asarray(features.index.get_level_values(subject_identifier)) == group1).astype(np.int64)
+    x = features.to_numpy(np.float64)
+    folds = subject_folds(subjects, y, n_folds, seed)
+
+    workers = min(workers or os.cpu_count() or 1, n_folds)
+    if workers == 1:
+        _init_worker(x, y, folds)
+        results = [_run_fold(fold, classifier, l2) for fold in range(n_folds)]
+    else:
+        block, handle = share_array(x)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                                     initargs=(handle, y, folds)) as pool:
+                results = list(pool.map(_run_fold, range(n_folds), [classifier] * n_folds, [l2] * n_folds))
+        finally:
+            release_array(block)
+
+    predictions = np.empty(len(y), dtype=np.int64)
+    fold_rows = []
+    for fold, fold_predictions, _ in results:
+        test = folds == fold
+        predictions[test] = fold_predictions
+        fold_rows.append({"fold": fold, "train trials": int((~test).sum()), "test trials": int(test.sum()),
+                          "test subjects": len(np.unique(subjects[test])),
+                          "accuracy": float((fold_predictions == y[test]).mean())})
+
+    correct = predictions == y
+    votes = pd.DataFrame({"subject": subjects, "y": y, "prediction": predictions}).groupby("subject")
+    subject_correct = (votes["prediction"].mean() > 0.5).astype(np.int64) == votes["y"].first()
+    coefficients = np.stack([w for _, _, w in results])
+    importance = pd.DataFrame({"importance": np.abs(coefficients).mean(axis=0),
+                               "coefficient": coefficients.mean(axis=0)}, index=features.columns)
+    return {
+        "accuracy": float(correct.mean()),
+        "subject accuracy": float(subject_correct.mean()),
+        "baseline": float(max(y.mean(), 1 - y.mean())),
+        "folds": pd.DataFrame(fold_rows),
+        "predictions": pd.Series(np.where(predictions == 1, group1, group2), index=features.index, name="prediction"),
+        "importance": importance.sort_values("importance", ascending=False),
+    }
+
+
+def classify_groups(combined_df, classifier="logistic", n_folds=5, l2=1.0, workers=None, seed=0,
+                    cache_dir=os.path.join(DEFAULT_CACHE_DIR, "features"), group1="a", group2="c",
+                    unknown_regions=("X", "Y", "nd"), **columns):
+    """
+    Builds the feature matrix of the long-format data and cross-validates a group classifier on it.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset (or EEGDataset).
+        classifier (str, optional): Key of CLASSIFIERS (default is "logistic").
+        n_folds (int, optional): Number of subject-grouped folds (default is 5).
+        l2 (float, optional): Penalty of the logistic regression (default is 1.0).
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the fold assignment (default is 0).
+        cache_dir (str, optional): Cache directory of the feature matrix; None disables caching.
+        group1 (str, optional): Label of the positive group (default is 'a', alcoholic).
+        group2 (str, optional): Label of the negative group (default is 'c', control).
+        unknown_regions (tuple, optional): Channels left out of the features (default is X, Y and nd).
+        **columns: Column names overriding eeg_tensor.DEFAULT_COLUMNS.
+
+    Returns:
+        dict: See `cross_validate`.
+    """
+    tensor = EEGTensor.from_dataframe(as_dataframe(combined_df), **columns)
+    features = feature_matrix(tensor, cache_dir=cache_dir, unknown_regions=unknown_regions)
+    return cross_validate(features, tensor.columns["subject"], tensor.columns["subject_identifier"], group1, group2,
+                          classifier, n_folds, l2, workers, seed)
@@ -0,0 +1,263 @@
+"""
+Command-line entry point of the EEG analysis.
+
+    python -m src.cli --data-dir PATH ingest     # load, combine and clean (cached)
+    python -m src.cli --data-dir PATH analyze    # t-tests, group differences, condition statistics
+    python -m src.cli --data-dir PATH plot       # figures, written to --figures-dir without a display
+    python -m src.cli --data-dir PATH all        # analyze + plot
+    python -m src.cli --data-dir PATH classify   # cross-validated alcoholic/control classifier
+
+Only the modules a command needs are imported, and only when it runs: statistics-only commands
+never load matplotlib or seaborn.
+"""
+import argparse
+import os
+import sys
+
+COMMANDS = {
+    "ingest": ["cleaned_data"],
+    "analyze": ["t_tests", "group_differences", "condition_stats"],
+    "plot": ["figures"],
+    "all": ["t_tests", "group_differences", "condition_stats", "figures"],
+    "classify": ["classification"],
+}
+
+
+def region_means(combined_df, position, subject_identifier, value):
+    from src import data_analysis, data_visualization
+
+    # Shallow copy: map_sensors_to_regions adds a column, and other stages read combined_df concurrently
+    sensor_df = data_analysis.map_sensors_to_regions(combined_df.copy(deep=False), sensor_column=position)
+    return data_visualization.aggregate_brain_regions(sensor_df, subject_identifier, value)
+
+
+def draw_figures(region_stats, time_stats, condition_means, value, condition, subject_identifier, time="time",
+                 figures_dir=None):
+    from src import data_visualization
+
+    if figures_dir is None:
+        data_visualization.plot_region_means(region_stats)
+        data_visualization.plot_time_series(time_stats, time, subject_identifier)
+        data_visualization.plot_condition_means(condition_means, value, condition, subject_identifier)
+    else:
+        # Rendered in parallel without a display; unchanged figures are skipped
+        data_visualization.render_figures([
+            data_visualization.FigureSpec("abs_differences.png", "region_means", region_stats),
+            data_visualization.FigureSpec("time series fig.png", "time_series", time_stats,
+                                          {"time": time, "subject_identifier": subject_identifier}),
+            data_visualization.FigureSpec("abs_condition_differences.png", "condition_means", condition_means,
+                                          {"value": value, "condition_column": condition,
+                                           "subject_identifier": subject_identifier}),
+        ], figures_dir)
+
+
+def classify(combined_df, classifier, n_folds, cache_dir, value, subject_identifier, position, condition, group1,
+             group2, unknown_regions):
+    from src.classification import classify_groups
+
+    return classify_groups(combined_df, classifier, n_folds, cache_dir=cache_dir, group1=group1, group2=group2,
+                           unknown_regions=unknown_regions, value=value, subject_identifier=subject_identifier,
+                           position=position, condition=condition)
+
+
+def draw_animation(differences, save_path):
+    from src.topography import animate_topography
+
+    return animate_topography(differences, save_path)
+
+
+def build_pipeline(directory_path, figures_dir=None, value="sensor value", subject_identifier="subject identifier",
+                   position="sensor position", condition="matching condition", time="time", group1="a", group2="c",
+                   unknown_regions=("X", "Y", "nd"), cache_dir=None, executor="process", export_csv=None,
+                   refresh=False, workers=4, verbose=True, animation_path="topography.gif", classifier="logistic",
+                   n_folds=5):
+    """
+    The analysis as a cached `Pipeline`: cleaned data, t-tests, group differences, condition
+    statistics, the plot aggregations, the figures, the topographic animation and the group classifier.
+
+    Args:
+        directory_path (str): Root directory of the recordings, or an archive of them.
+        figures_dir (str, optional): Write the figures here without a display; None shows them.
+        value, subject_identifier, position, condition, time (str, optional): Column names.
+        group1 (str, optional): Label of the first group (default is 'a', alcoholic).
+        group2 (str, optional): Label of the second group (default is 'c', control).
+        unknown_regions (tuple, optional): Sensor positions excluded from the t-tests and the classifier.
+        cache_dir (str, optional): Root of the caches (default is DEFAULT_CACHE_DIR).
+        executor (str, optional): "process", "thread" or None (serial) file ingestion.
+        export_csv (str, optional): Also write the cleaned data to this CSV file.
+        refresh (bool, optional): Rebuild the cleaned data even if it is cached.
+        workers (int, optional): Number of stages run concurrently (default is 4).
+        verbose (bool, optional): Print the status of every stage (default is True).
+        animation_path (str, optional): Where the "animation" stage writes the scalp map animation.
+        classifier (str, optional): Classifier of the "classification" stage (default is "logistic").
+        n_folds (int, optional): Number of subject-grouped cross-validation folds (default is 5).
+
+    Returns:
+        Pipeline: The stages of the analysis.
+    """
+    from src import data_analysis, data_cleaning, data_visualization, topography
+    from src.pipeline import Pipeline, Stage
+
+    cache_dir = data_cleaning.DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+    groups = {"value": value, "subject_id": subject_identifier, "position": position, "group1": group1, "group2": group2}
+    data = {"combined_df": "cleaned_data"}
+    return Pipeline([
+        # Load, combine and clean the data (it has its own columnar cache; the source manifest keys the stages below)
+        Stage("cleaned_data", data_cleaning.load_cleaned_data,
+              params={"directory_path": directory_path, "value_column": value, "executor": executor,
+                      "cache_dir": cache_dir, "export_csv": export_csv, "refresh": refresh},
+              source=lambda: data_cleaning.source_manifest(directory_path), cache=False,
+              ignore_params=("executor", "export_csv", "refresh")),
+        # Analysis
+        Stage("t_tests", data_analysis.welch_t_tests, data, {**groups, "unknown_regions": list(unknown_regions)}),
+        Stage("group_differences", data_analysis.compute_group_differences, data, groups),
+        Stage("condition_stats", data_analysis.analyze_responses_by_condition_and_group, data,
+              {"value": value, "condition": condition, "subject_identifier": subject_identifier}),
+        Stage("region_means", region_means, data,
+              {"position": position, "subject_identifier": subject_identifier, "value": value}),
+        Stage("time_series_stats", data_visualization.aggregate_time_series, data,
+              {"time": time, "value": value, "subject_identifier": subject_identifier}),
+        Stage("condition_means", data_visualization.aggregate_conditions, data,
+              {"value": value, "condition_column": condition, "subject_identifier": subject_identifier}),
+        # Visualization
+        Stage("figures", draw_figures,
+              {"region_stats": "region_means", "time_stats": "time_series_stats", "condition_means": "condition_means"},
+              {"value": value, "condition": condition, "subject_identifier": subject_identifier, "time": time,
+               "figures_dir": figures_dir},
+              cache=False, main_thread=True),
+        Stage("topography_frames", topography.group_difference_frames, data,
+              {"value": value, "subject_identifier": subject_identifier, "position": position, "time": time,
+               "group1": group1, "group2": group2}),
+        Stage("animation", draw_animation, {"differences": "topography_frames"}, {"save_path": animation_path},
+              cache=False, main_thread=True),
+        # Classification (the feature matrix has its own cache)
+        Stage("classification", classify, data,
+              {"classifier": classifier, "n_folds": n_folds, "cache_dir": os.path.join(cache_dir, "features"),
+               "value": value, "subject_identifier": subject_identifier, "position": position,
+               "condition": condition, "group1": group1, "group2": group2,
+               "unknown_regions": list(unknown_regions)}),
+    ], cache_dir=os.path.join(cache_dir, "stages"), workers=workers, verbose=verbose)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="eeg-analysis", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(COMMANDS), help="What to run")
+    parser.add_argument("--data-dir", default=os.environ.get("EEG_DATA_DIR"),
+                        help="Root directory of the recordings, or a .zip/.tar.gz/.gz archive of them "
+                             "(default is $EEG_DATA_DIR)")
+    parser.add_argument("--cache-dir", default=".eeg_cache", help="Root of the caches (default is .eeg_cache)")
+    parser.add_argument("--figures-dir", default=os.path.join("output", "figures"),
+                        help="Where plot/all write the figures (default is output/figures)")
+    parser.add_argument("--show", action="store_true", help="Show the figures in windows instead of writing them")
+    parser.add_argument("--animate", metavar="PATH",
+                        help="Also write an animated scalp map of the group difference (.gif, or .mp4 with ffmpeg)")
+    parser.add_argument("--output-dir", help="Also write the analysis results as CSV files to this directory")
+    parser.add_argument("--export-csv", help="Also write the cleaned data to this CSV file")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Rebuild the cleaned data and re-run every stage even if they are cached")
+    parser.add_argument("--executor", choices=["process", "thread", "serial"], default="process",
+                        help="How the CSV files are read (default is process)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of stages run concurrently (default is 4)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default is 0.05)")
+    parser.add_argument("--classifier", choices=["logistic", "centroid"], default="logistic",
+                        help="Classifier of the classify command (default is logistic)")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds of classify (default is 5)")
+    parser.add_argument("--profile", metavar="REPORT_PATH",
+                        help="Write per-call timings to REPORT_PATH.json and REPORT_PATH.txt")
+    parser.add_argument("--quiet", action="store_true", help="Don't print the status of every stage")
+
+    columns = parser.add_argument_group("columns and groups")
+    columns.add_argument("--value-column", default="sensor value")
+    columns.add_argument("--group-column", default="subject identifier")
+    columns.add_argument("--position-column", default="sensor position")
+    columns.add_argument("--condition-column", default="matching condition")
+    columns.add_argument("--time-column", default="time")
+    columns.add_argument("--groups", nargs=2, default=["a", "c"], metavar=("GROUP1", "GROUP2"),
+                         help="Labels of the two compared groups (default is a c)")
+    columns.add_argument("--exclude-sensors", nargs="*", default=["X", "Y", "nd"],
+                         help="Sensor positions left out of the t-tests and the classifier (default is X Y nd)")
+    return parser
+
+
+def run(args):
+    """
+    Runs the command of the parsed arguments and prints its results.
+
+    Returns:
+        dict: Stage name -> output of the stages the command needed.
+    """
+    targets = list(COMMANDS[args.command])
+    if args.animate:
+        targets.append("animation")
+    figures_dir = None
+    if ("figures" in targets or args.animate) and not args.show:
+        from src.data_visualization import use_headless_backend
+
+        use_headless_backend()
+        figures_dir = args.figures_dir
+
+    pipeline = build_pipeline(
+        args.data_dir, figures_dir, value=args.value_column, subject_identifier=args.group_column,
+        position=args.position_column, condition=args.condition_column, time=args.time_column,
+        group1=args.groups[0], group2=args.groups[1], unknown_regions=tuple(args.exclude_sensors),
+        cache_dir=args.cache_dir, executor=None if args.executor == "serial" else args.executor,
+        export_csv=args.export_csv, refresh=args.refresh, workers=args.workers, verbose=not args.quiet,
+        animation_path=args.animate, classifier=args.classifier, n_folds=args.folds)
+    results = pipeline.run(targets, refresh=args.refresh)
+
+    if "cleaned_data" in results:
+        print(f"{len(results['cleaned_data'])} cleaned rows")
+    if "t_tests" in results:
+        from src.data_analysis import format_t_test_results
+
+        print(format_t_test_results(results["t_tests"], args.alpha))
+        print(results["condition_stats"])
+    if "classification" in results:
+        classification = results["classification"]
+        print(f"Accuracy {classification['accuracy']:.3f} per trial, {classification['subject accuracy']:.3f} "
+              f"per subject (majority group {classification['baseline']:.3f})")
+        print(classification["importance"].head(10))
+    if args.output_dir and "classification" in results:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name in ("folds", "importance"):
+            results["classification"][name].to_csv(os.path.join(args.output_dir, f"classification_{name}.csv"))
+    if args.output_dir and "t_tests" in results:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name in ("t_tests", "group_differences", "condition_stats"):
+            results[name].to_csv(os.path.join(args.output_dir, f"{name}.csv"))
+    if figures_dir is not None and "figures" in targets:
+        print(f"Figures written to {figures_dir}")
+    if args.animate:
+        print(f"Animation written to {args.animate}")
+    return results
+
+
+def main(argv=None):
+    """
+    Parses the command line (default is sys.argv) and runs the command.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.data_dir:
+        parser.error("the data directory is required: pass --data-dir or set EEG_DATA_DIR")
+    from src.data_cleaning import is_archive
+
+    if not (os.path.isdir(args.data_dir) or is_archive(args.data_dir)):
+        parser.error(f"no such directory or archive: {args.data_dir}")
+
+    if args.profile:
+        from src.instrumentation import Instrumentation
+
+        with Instrumentation(report_path=args.profile):
+            run(args)
+    else:
+        run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
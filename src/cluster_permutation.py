@@ -0,0 +1,242 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage, sparse, stats
+from scipy.sparse.csgraph import connected_components
+
+from src.shared_data import attach_array, release_array, share_array
+
+# Clusters along time only: neighbouring samples of the same channel
+_TIME_STRUCTURE = np.array([[0, 0, 0], [1, 1, 1], [0, 0, 0]])
+
+# Set in every worker process by _init_worker; the data itself is shared, not sent to the workers
+_worker_state = {}
+
+
+def _welch_t(sums, squares, counts, total_sum, total_squares, total_count):
+    """
+    Welch t statistics of group 1 vs the rest from per-group sums, sums of squares and counts.
+    All arguments broadcast, so a whole batch of permutations is handled at once.
+    """
+    sums2 = total_sum - sums
+    squares2 = total_squares - squares
+    counts2 = total_count - counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean1 = sums / counts
+        mean2 = sums2 / counts2
+        var1 = (squares - sums * mean1) / (counts - 1)
+        var2 = (squares2 - sums2 * mean2) / (counts2 - 1)
+        return (mean1 - mean2) / np.sqrt(var1 / counts + var2 / counts2)
+
+
+def _label_clusters(mask, adjacency=None):
+    """
+    Labels connected clusters of a boolean (channels, samples) mask. Cells are connected to the
+    neighbouring samples of the same channel and, if an adjacency matrix is given, to the same
+    sample of adjacent channels.
+
+    Returns:
+        tuple: Integer label array (0 outside clusters) and the number of clusters.
+    """
+    if adjacency is None:
+        return ndimage.label(mask, structure=_TIME_STRUCTURE)
+
+    nodes = np.arange(mask.size).reshape(mask.shape)
+    time_edges = mask[:, :-1] & mask[:, 1:]
+    rows = [nodes[:, :-1][time_edges]]
+    cols = [nodes[:, 1:][time_edges]]
+    for channel1, channel2 in zip(*np.nonzero(np.triu(adjacency, k=1))):
+        both = mask[channel1] & mask[channel2]
+        rows.append(nodes[channel1][both])
+        cols.append(nodes[channel2][both])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    graph = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(mask.size, mask.size))
+    _, components = connected_components(graph, directed=False)
+
+    labels = np.zeros(mask.size, dtype=int)
+    _, labels[mask.ravel()] = np.unique(components[mask.ravel()], return_inverse=True)
+    labels[mask.ravel()] += 1
+    return labels.reshape(mask.shape), labels.max()
+
+
+def _cluster_masses(t_map, threshold, adjacency=None):
+    """
+    Finds the positive (t > threshold) and negative (t < -threshold) clusters of a t map.
+
+    Returns:
+        list: (sign, mass, labels, label) for every cluster; mass is the sum of t in the cluster.
+    """
+    clusters = []
+    for sign in (1, -1):
+        labels, n_clusters = _label_clusters(sign * t_map > threshold, adjacency)
+        if n_clusters:
+            masses = ndimage.sum_labels(t_map, labels, index=np.arange(1, n_clusters + 1))
+            clusters.extend((sign, mass, labels, label) for label, mass in enumerate(masses, start=1))
+    return clusters
+
+
+def _max_cluster_mass(t_map, threshold, adjacency=None):
+    clusters = _cluster_masses(np.nan_to_num(t_map), threshold, adjacency)
+    return max((abs(mass) for _, mass, _, _ in clusters), default=0.0)
+
+
+def _init_worker(data, valid, unit_index, unit_labels, shape, threshold, adjacency, squares=None):
+    squares = data * data if squares is None else squares
+    _worker_state.update(data=data, squares=squares, valid=valid, unit_index=unit_index, unit_labels=unit_labels,
+                         shape=shape, threshold=threshold, adjacency=adjacency, total_sum=data.sum(axis=0),
+                         total_squares=squares.sum(axis=0),
+                         total_count=valid.sum(axis=0) if valid is not None else len(data))
+
+
+def _init_shared_worker(handles, *args):
+    # The large (trials, cells) arrays are views of the parent's shared memory
+    data, valid, squares = (attach_array(handle) if handle is not None else None for handle in handles)
+    _init_worker(data, valid, *args, squares=squares)
+
+
+def _permutation_batch(seed, n_permutations):
+    """
+    Maximum cluster mass of a batch of label permutations. The group sums of all permutations
+    of the batch come from one matrix product over the (trials, cells) data.
+    """
+    state = _worker_state
+    rng = np.random.default_rng(seed)
+
+    # One row of 0/1 trial labels per permutation; labels are shuffled between units (subjects or trials)
+    permuted_units = np.array([rng.permutation(state["unit_labels"]) for _ in range(n_permutations)])
+    labels = permuted_units[:, state["unit_index"]].astype(np.float64)
+
+    valid = state["valid"]
+    counts = labels @ valid if valid is not None else labels.sum(axis=1, keepdims=True)
+    t_maps = _welch_t(labels @ state["data"], labels @ state["squares"], counts, state["total_sum"],
+                      state["total_squares"], state["total_count"])
+
+    return np.array([_max_cluster_mass(t_map.reshape(state["shape"]), state["threshold"], state["adjacency"])
+                     for t_map in t_maps])
+
+
+def cluster_permutation_test(tensor, group1="a", group2="c", n_permutations=1000, threshold=None, alpha=0.05,
+                             level="subject", adjacency=None, workers=None, seed=0, batch_size=64):
+    """
+    Cluster-based permutation test of the difference between two groups over sensors and time.
+
+    Welch t statistics are computed for every (channel, sample) cell; neighbouring cells above
+    the threshold form clusters whose mass is the sum of their t values. Group labels are then
+    shuffled between subjects (or trials) and the largest cluster mass of each permutation
+    forms the null distribution from which the cluster p-values are derived. This controls the
+    family-wise error rate without assuming independent samples.
+
+    Permutations are evaluated in batches of batch_size, each batch as one matrix product, and
+    batches are spread over a process pool. Every batch has its own seed derived from `seed`, so
+    results are reproducible and don't depend on the number of workers.
+
+    Args:
+        tensor (EEGTensor): The EEG data.
+        group1 (str, optional): Label of the first group (default is 'a').
+        group2 (str, optional): Label of the second group (default is 'c').
+        n_permutations (int, optional): Number of permutations (default is 1000).
+        threshold (float, optional): Cluster-forming |t| threshold (default is the two-sided
+            t critical value at alpha).
+        alpha (float, optional): Significance level used for the default threshold (default is 0.05).
+        level (str, optional): "subject" or "trial", the unit whose labels are shuffled.
+        adjacency (np.ndarray, optional): Boolean (channels, channels) matrix of neighbouring
+            channels; clusters only extend along time if not given.
+        workers (int, optional): Number of worker processes; 1 runs in the calling process.
+        seed (int, optional): Seed of the permutations (default is 0).
+        batch_size (int, optional): Permutations per batch (default is 64).
+
+    Returns:
+        dict: "t" (channel x sample DataFrame of observed t), "clusters" (DataFrame with the sign,
+        mass, size, channels, sample range and corrected p-value of every observed cluster),
+        "cluster_labels" (channel x sample DataFrame of cluster ids, 0 outside clusters) and
+        "null_distribution" (array of the maximum cluster mass of each permutation).
+    """
+    if level not in ("subject", "trial"):
+        raise ValueError(f"level must be 'subject' or 'trial', got {level!r}")
+
+    trials = np.flatnonzero(np.isin(tensor.groups, [group1, group2]))
+    n_trials, n_channels, n_samples = len(trials), tensor.data.shape[1], tensor.data.shape[2]
+    shape = (n_channels, n_samples)
+
+    # Center every cell (doesn't change t, keeps the sums of squares accurate)
+    data = tensor.data[trials].reshape(n_trials, -1).astype(np.float64)
+    valid = None
+    if np.isnan(data).any():
+        valid = (~np.isnan(data)).astype(np.float64)
+    data -= np.nanmean(data, axis=0)
+    data = np.nan_to_num(data)
+
+    in_group1 = tensor.groups[trials] == group1
+    if level == "subject":
+        units, unit_index = np.unique(tensor.subjects[trials], return_inverse=True)
+        unit_labels = np.zeros(len(units), dtype=bool)
+        unit_labels[unit_index[in_group1]] = True
+    else:
+        unit_index = np.arange(n_trials)
+        unit_labels = in_group1
+
+    if threshold is None:
+        threshold = stats.t.ppf(1 - alpha / 2, n_trials - 2)
+
+    # Observed statistics and clusters
+    labels = in_group1.astype(np.float64)[None, :]
+    counts = labels @ valid if valid is not None else labels.sum(axis=1, keepdims=True)
+    total_counts = valid.sum(axis=0) if valid is not None else n_trials
+    t_obs = _welch_t(labels @ data, labels @ (data * data), counts, data.sum(axis=0), (data * data).sum(axis=0),
+                     total_counts).reshape(shape)
+    observed = _cluster_masses(np.nan_to_num(t_obs), threshold, adjacency)
+
+    # Null distribution of the maximum cluster mass
+    batches = [batch_size] * (n_permutations // batch_size)
+    if n_permutations % batch_size:
+        batches.append(n_permutations % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    init_args = (unit_index, unit_labels, shape, threshold, adjacency)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(data, valid, *init_args)
+        null_parts = [_permutation_batch(batch_seed, size) for batch_seed, size in zip(seeds, batches)]
+    else:
+        # Publish the data once in shared memory instead of pickling a copy to every worker
+        shared = [share_array(array) if array is not None else None for array in (data, valid, data * data)]
+        handles = [entry[1] if entry is not None else None for entry in shared]
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                                     initargs=(handles, *init_args)) as pool:
+                null_parts = list(pool.map(_permutation_batch, seeds, batches))
+        finally:
+            for entry in shared:
+                if entry is not None:
+                    release_array(entry[0])
+    null_distribution = np.concatenate(null_parts) if null_parts else np.empty(0)
+
+    # Corrected p-values of the observed clusters
+    cluster_labels = np.zeros(shape, dtype=int)
+    rows = []
+    for cluster_id, (sign, mass, label_map, label) in enumerate(observed, start=1):
+        cells = label_map == label
+        cluster_labels[cells] = cluster_id
+        cluster_channels, cluster_samples = np.nonzero(cells)
+        rows.append({
+            "cluster": cluster_id,
+            "sign": sign,
+            "mass": mass,
+            "size": int(cells.sum()),
+            "channels": ", ".join(str(channel) for channel in tensor.channels[np.unique(cluster_channels)]),
+            "first sample": tensor.samples[cluster_samples.min()],
+            "last sample": tensor.samples[cluster_samples.max()],
+            "p": (1 + np.sum(null_distribution >= abs(mass))) / (1 + len(null_distribution)),
+        })
+    columns = ["cluster", "sign", "mass", "size", "channels", "first sample", "last sample", "p"]
+    clusters = pd.DataFrame(rows, columns=columns).set_index("cluster").sort_values("p")
+
+    index = pd.Index(tensor.channels, name=tensor.columns["position"])
+    sample_columns = pd.Index(tensor.samples, name=tensor.columns["sample"])
+    return {
+        "t": pd.DataFrame(t_obs, index=index, columns=sample_columns),
+        "clusters": clusters,
+        "cluster_labels": pd.DataFrame(cluster_labels, index=index, columns=sample_columns),
+        "null_distribution": null_distribution,
+    }
@@ -1,4 +1,9 @@
-from scipy.stats import ttest_ind
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.eeg_dataset import as_dataframe
 
 # Define a list of tuples (prefix, region)
 region_mapping = [
@@ -13,7 +18,8 @@ region_mapping = [
     ("FC", "Motor Cortex"),
     ("FT", "Frontal-Temporal Lobe"),
 ]
-# Function to assign brain regions
+# Function to assign brain regions (memoized: there are only a few dozen distinct sensor names)
+@lru_cache(maxsize=None)
 def assign_brain_region(sensor_name):
     """
     Assigns a brain region based on the sensor name using predefined mappings.
@@ -53,23 +59,55 @@ def map_sensors_to_regions(data, sensor_column):
     Map EEG sensors to brain regions and add a 'region' column to the DataFrame.
 
     Args:
-        data (pd.DataFrame): The DataFrame containing sensor data.
+        data (pd.DataFrame): The DataFrame (or EEGDataset) containing sensor data.
         sensor_column (str): The name of the column with sensor identifiers.
 
     Returns:
-        pd.DataFrame: The updated DataFrame with a new 'region' column.
+        pd.DataFrame: The updated DataFrame with a new 'region' column. When there are rows of
+        sensors without a known region (X, Y and nd in the Kaggle files), the result is a copy
+        of the other rows taken by position; this one copy is kept on purpose, since pandas
+        can't return a view of a subset of the rows. Otherwise data itself is returned.
     """
-    data["region"] = data[sensor_column].apply(assign_brain_region)
-    data = data.dropna(subset=["region"])
-    data = data[data["region"] != "Unknown Region"]
+    if not isinstance(data, pd.DataFrame):
+        # An EEGDataset: add the column to a shallow copy, not to the rows of the dataset
+        data = as_dataframe(data).copy(deep=False)
+
+    # Assign a region once per distinct sensor, then broadcast it to the rows through the codes
+    sensor_codes, sensors = pd.factorize(data[sensor_column])
+    sensor_regions = region_lookup(sensors)
+    categories = list(dict.fromkeys(sensor_regions[sensor_regions != "Unknown Region"])) + ["Unknown Region"]
+    unknown_code = len(categories) - 1
+
+    # The extra last entry maps missing sensors (code -1) to 'Unknown Region'
+    region_codes = np.append(pd.Index(categories).get_indexer(sensor_regions), unknown_code)[sensor_codes]
+    data["region"] = pd.Categorical.from_codes(region_codes, categories=categories)
+
+    known_rows = np.flatnonzero(region_codes != unknown_code)
+    if len(known_rows) < len(data):
+        data = data.take(known_rows)
     return data
 
+
+def region_lookup(sensor_names):
+    """
+    Looks up the brain region of each of the given (distinct) sensor names.
+
+    Args:
+        sensor_names (list): Sensor names.
+
+    Returns:
+        np.ndarray: The region of each sensor, 'Unknown Region' for unmapped or missing names.
+    """
+    return np.array([assign_brain_region(sensor) if isinstance(sensor, str) else "Unknown Region"
+                     for sensor in sensor_names], dtype=object)
+
 def compute_group_differences(combined_df, value, subject_id, position, group1, group2):
     """
     Computes mean differences in sensor values between two groups for each sensor position.
 
     Args:
-        combined_df (DataFrame): The dataset to analyze.
+        combined_df (DataFrame): The dataset to analyze (or an EEGDataset). Accumulated statistics
+            (see `src.streaming` and `src.sufficient_stats`) are answered directly, without the raw rows.
         value (str): Column name for numerical values.
         subject_id (str): Column name for group/category.
         position (str): Column name for sensor positions.
@@ -80,8 +118,13 @@ def compute_group_differences(combined_df, value, subject_id, position, group1,
         DataFrame: A DataFrame showing mean values for each group, differences, and sorted by difference.
     """
     
+    combined_df = as_dataframe(combined_df)
+
     # Compute mean sensor values for each group at each sensor position
-    grouped = combined_df.groupby([position, subject_id])[value].mean().unstack(fill_value=0)
+    if _is_statistics(combined_df):
+        grouped = combined_df.rollup([position, subject_id])["mean"].sort_index().unstack(fill_value=0)
+    else:
+        grouped = combined_df.groupby([position, subject_id])[value].mean().unstack(fill_value=0)
 
     # Add a column for the absolute difference
     grouped["difference"] = abs(grouped[group1] - grouped[group2])
@@ -92,13 +135,258 @@ def compute_group_differences(combined_df, value, subject_id, position, group1,
     return sorted_diff
 
 
-def perform_t_tests(combined_df, value, subject_id, position, group1, group2, unknown_regions, alpha=0.05):
+def _welch_from_moments(n1, mean1, var1, n2, mean2, var2):
+    """
+    Welch's t-test from group sizes, means and (ddof=1) variances; works elementwise on arrays.
+
+    Returns:
+        tuple: Arrays of t statistics, degrees of freedom and two-sided p-values.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se1 = var1 / n1
+        se2 = var2 / n2
+        t_stat = (mean1 - mean2) / np.sqrt(se1 + se2)
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    # Imported here: scipy is slow to import and only needed once a test is actually run
+    from scipy.special import stdtr
+
+    # Two-sided p-value from the Student t distribution function (what scipy.stats.t.sf uses)
+    p_val = 2 * stdtr(dof, -np.abs(t_stat))
+    return t_stat, dof, p_val
+
+
+def _group_moments(combined_df, value, subject_id, keys, group1, group2):
+    """
+    Count, mean and variance of the values of both groups per combination of the keys, in one
+    groupby pass. Columns are (statistic, group) pairs.
+    """
+    moments = combined_df.groupby(keys + [subject_id], observed=True)[value].agg(["count", "mean", "var"])
+    return moments.unstack(subject_id).reindex(
+        columns=pd.MultiIndex.from_product([["count", "mean", "var"], [group1, group2]]))
+
+
+def _is_statistics(data):
+    # Accumulated statistics (a streaming MomentAccumulator or a SufficientStatsStore) instead of raw rows
+    return hasattr(data, "rollup")
+
+
+def _moments_from_statistics(statistics, subject_id, position, group1, group2):
+    """
+    Per-sensor group moments, in order of first appearance, from accumulated statistics.
+    """
+    rolled = statistics.rollup([position, subject_id])
+    sensors = np.asarray(pd.unique(rolled.index.get_level_values(position)), dtype=object)
+    moments = rolled[["count", "mean", "var"]].unstack(subject_id).reindex(
+        index=sensors, columns=pd.MultiIndex.from_product([["count", "mean", "var"], [group1, group2]]))
+    moments.index.name = position
+    return moments
+
+
+def tested_sensors(sensors, unknown_regions):
+    """
+    The sensors to analyze and their regions: sensors in unknown_regions or without a known brain
+    region (the non-electrode channels) are left out, the order is kept. Used by the t-tests and
+    the classifier features.
+
+    Args:
+        sensors (list): Distinct sensor names.
+        unknown_regions (list): Sensor names to leave out.
+
+    Returns:
+        tuple: (list of the kept sensors, np.ndarray of their regions)
+    """
+    sensors = np.asarray(sensors, dtype=object)
+    regions = region_lookup(sensors)
+    tested = ~np.isin(sensors, list(unknown_regions)) & (regions != "Unknown Region")
+    return list(sensors[tested]), regions[tested]
+
+
+def welch_t_tests(combined_df, value, subject_id, position, group1, group2, unknown_regions=()):
+    """
+    Runs Welch's t-test between two groups for every sensor position at once.
+
+    Per-sensor group counts, means and variances come from a single groupby pass, and the
+    t statistics and p-values are derived from them for all sensors together. Missing values
+    are ignored. Sensors listed in unknown_regions or without a known brain region are skipped.
+
+    Args:
+        combined_df (DataFrame): The dataset containing EEG data, or accumulated
+            statistics (see `compute_group_differences`).
+        value (str): Column name for numerical values.
+        subject_id (str): Column name for group/category.
+        position (str): Column name for sensor positions.
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+        unknown_regions (list, optional): Sensor positions to exclude from the t-tests.
+
+    Returns:
+        DataFrame: One row per sensor position with its region, t statistic, p-value,
+        Welch degrees of freedom and effect size (Cohen's d, group1 minus group2).
+    """
+    if _is_statistics(combined_df):
+        return t_tests_from_moments(_moments_from_statistics(combined_df, subject_id, position, group1, group2),
+                                    group1, group2, unknown_regions)
+
+    combined_df = as_dataframe(combined_df)
+    moments = _group_moments(combined_df, value, subject_id, [position], group1, group2)
+    # Keep the sensors in order of appearance, like the printed results always were
+    moments = moments.reindex(np.asarray(pd.unique(combined_df[position]), dtype=object))
+    moments.index.name = position
+    return t_tests_from_moments(moments, group1, group2, unknown_regions)
+
+
+def t_tests_from_moments(moments, group1, group2, unknown_regions=()):
+    """
+    Welch's t-tests per sensor from precomputed group counts, means and variances.
+
+    Args:
+        moments (DataFrame): Indexed by sensor position, with ("count" | "mean" | "var", group)
+            columns for both groups; variances with ddof=1.
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+        unknown_regions (list, optional): Sensor positions to exclude from the t-tests.
+
+    Returns:
+        DataFrame: Same as `welch_t_tests`, in the order of the moments index.
+    """
+    sensors, regions = tested_sensors(moments.index, unknown_regions)
+    position = moments.index.name
+    moments = moments.reindex(sensors)
+
+    n1, n2 = moments[("count", group1)].to_numpy(float), moments[("count", group2)].to_numpy(float)
+    mean1, mean2 = moments[("mean", group1)].to_numpy(float), moments[("mean", group2)].to_numpy(float)
+    var1, var2 = moments[("var", group1)].to_numpy(float), moments[("var", group2)].to_numpy(float)
+
+    t_stat, dof, p_val = _welch_from_moments(n1, mean1, var1, n2, mean2, var2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled_sd = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
+        effect_size = (mean1 - mean2) / pooled_sd
+
+    results = pd.DataFrame({
+        "region": regions,
+        "t": t_stat,
+        "p": p_val,
+        "df": dof,
+        "effect size": effect_size,
+    }, index=pd.Index(sensors, name=position))
+    return results
+
+
+def adjust_p_values(p_values, method="fdr_bh"):
+    """
+    Corrects p-values for multiple comparisons. Missing (NaN) p-values are ignored and kept.
+
+    Args:
+        p_values (np.ndarray): p-values of any shape.
+        method (str, optional): "fdr_bh" (Benjamini-Hochberg false discovery rate), "bonferroni"
+            or None for no correction (default is "fdr_bh").
+
+    Returns:
+        np.ndarray: Corrected p-values with the same shape.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    flat = p_values.ravel()
+    valid = ~np.isnan(flat)
+    m = valid.sum()
+    adjusted = np.full(flat.shape, np.nan)
+
+    if method is None:
+        adjusted[valid] = flat[valid]
+    elif method == "bonferroni":
+        adjusted[valid] = np.minimum(flat[valid] * m, 1.0)
+    elif method == "fdr_bh":
+        order = np.argsort(flat[valid])
+        ranked = flat[valid][order] * m / np.arange(1, m + 1)
+        # Enforce monotonicity from the largest p-value down
+        ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+        corrected = np.empty(m)
+        corrected[order] = np.minimum(ranked, 1.0)
+        adjusted[valid] = corrected
+    else:
+        raise ValueError(f"Unknown correction method: {method!r}")
+    return adjusted.reshape(p_values.shape)
+
+
+def time_resolved_t_tests(combined_df, value, subject_id, position, sample, group1, group2, unknown_regions=(),
+                          correction="fdr_bh", alpha=0.05):
+    """
+    Runs Welch's t-test between two groups for every (sensor, sample) cell at once, showing
+    when during the trial the groups diverge.
+
+    Group counts, means and variances of all cells come from one groupby pass; the tests and
+    the multiple-comparison correction (over all cells) are vectorized array operations.
+
+    Args:
+        combined_df (DataFrame): The dataset (or EEGDataset) containing EEG data.
+        value (str): Column name for numerical values.
+        subject_id (str): Column name for group/category.
+        position (str): Column name for sensor positions.
+        sample (str): Column name for the sample (time point) number.
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+        unknown_regions (list, optional): Sensor positions to exclude from the t-tests.
+        correction (str, optional): "fdr_bh", "bonferroni" or None (default is "fdr_bh").
+        alpha (float, optional): Significance level for the corrected p-values (default is 0.05).
+
+    Returns:
+        dict: sensor x sample DataFrames "t", "df", "p", "p_corrected" and "significant".
+    """
+    combined_df = as_dataframe(combined_df)
+    moments = _group_moments(combined_df, value, subject_id, [position, sample], group1, group2)
+    sensors, _ = tested_sensors(pd.unique(combined_df[position]), unknown_regions)
+    samples = np.sort(pd.unique(combined_df[sample]))
+    moments = moments.reindex(pd.MultiIndex.from_product([sensors, samples]))
+
+    shape = (len(sensors), len(samples))
+    arrays = {(statistic, group): moments[(statistic, group)].to_numpy(float).reshape(shape)
+              for statistic in ("count", "mean", "var") for group in (group1, group2)}
+    t_stat, dof, p_val = _welch_from_moments(
+        arrays[("count", group1)], arrays[("mean", group1)], arrays[("var", group1)],
+        arrays[("count", group2)], arrays[("mean", group2)], arrays[("var", group2)],
+    )
+    p_corrected = adjust_p_values(p_val, correction)
+
+    index = pd.Index(sensors, name=position)
+    columns = pd.Index(samples, name=sample)
+    return {
+        "t": pd.DataFrame(t_stat, index=index, columns=columns),
+        "df": pd.DataFrame(dof, index=index, columns=columns),
+        "p": pd.DataFrame(p_val, index=index, columns=columns),
+        "p_corrected": pd.DataFrame(p_corrected, index=index, columns=columns),
+        "significant": pd.DataFrame(p_corrected < alpha, index=index, columns=columns),
+    }
+
+
+def format_t_test_results(results, alpha=0.05):
+    """
+    Formats the output of `welch_t_tests` as the significant sensors grouped by brain region.
+
+    Args:
+        results (DataFrame): The output of `welch_t_tests`.
+        alpha (float, optional): Significance level for hypothesis testing (default is 0.05).
+
+    Returns:
+        str: Lines formatted as "Region name: sensor1, sensor2, sensor3".
+    """
+    significant = results[results["p"] < alpha]
+    if significant.empty:
+        return "No sensor positions showed statistically significant differences."
+
+    lines = [f"The following regions have shown a significant difference (p < {alpha}):"]
+    for region, sensors in significant.groupby("region", sort=False):
+        lines.append(f"{region}: {', '.join(str(sensor) for sensor in sensors.index)}")
+    return "\n".join(lines)
+
+
+def perform_t_tests(combined_df, value, subject_id, position, group1, group2, unknown_regions, alpha=0.05,
+                    verbose=True):
     """
     Performs independent t-tests for each sensor position and prints only those with statistically significant differences,
     excluding sensors in the unknown_regions list. Groups the significant sensors by brain region.
 
     Args:
-        combined_df (DataFrame): The dataset containing EEG data.
+        combined_df (DataFrame): The dataset containing EEG data, or accumulated
+            statistics (see `compute_group_differences`).
         value (str): Column name for numerical values.
         subject_id (str): Column name for group/category.
         position (str): Column name for sensor positions.
@@ -106,48 +394,26 @@ def perform_t_tests(combined_df, value, subject_id, position, group1, group2, un
         group2 (str): Label for the second group.
         unknown_regions (list): List of sensor positions to exclude from the t-tests.
         alpha (float, optional): Significance level for hypothesis testing (default is 0.05).
+        verbose (bool, optional): Print the significant sensors by region (default is True).
 
     Prints:
         Brain regions with significant sensors, formatted as: 
         "Region name: sensor1, sensor2, sensor3"
+
+    Returns:
+        DataFrame: The per-sensor results of `welch_t_tests`.
     """
-    significant_sensors_by_region = {}
-
-    for sensor in combined_df[position].unique():
-        # Skip sensors listed in unknown_regions or invalid sensors like 'X', 'Y'
-        if sensor in unknown_regions or assign_brain_region(sensor) == "Unknown Region":
-            continue
-
-        group1_values = combined_df[(combined_df[subject_id] == group1) & (combined_df[position] == sensor)][value]
-        group2_values = combined_df[(combined_df[subject_id] == group2) & (combined_df[position] == sensor)][value]
-
-        # Perform independent t-test
-        t_stat, p_val = ttest_ind(group1_values, group2_values, equal_var=False, nan_policy='omit')
-
-        # Check if significant
-        if p_val < alpha:
-            # Get the corresponding brain region for the sensor
-            region = assign_brain_region(sensor)
-            
-            # Add the sensor to the corresponding region in the dictionary
-            if region not in significant_sensors_by_region:
-                significant_sensors_by_region[region] = []
-            significant_sensors_by_region[region].append(sensor)
-
-    # Print results by region
-    if significant_sensors_by_region:
-        print(f"The following regions have shown a significant difference (p < {alpha}):")
-        for region, sensors in significant_sensors_by_region.items():
-            print(f"{region}: {', '.join(sensors)}")
-    else:
-        print("No sensor positions showed statistically significant differences.")
+    results = welch_t_tests(combined_df, value, subject_id, position, group1, group2, unknown_regions)
+    if verbose:
+        print(format_t_test_results(results, alpha))
+    return results
     
 def analyze_responses_by_condition_and_group(combined_df, value, condition, subject_identifier):
     """
     Analyzes the responses for each condition and group (e.g., alcoholic vs control) and computes statistics (mean, std) for each.
 
     Args:
-        combined_df (pd.DataFrame): The dataset to analyze.
+        combined_df (pd.DataFrame): The dataset to analyze, or accumulated statistics.
         value (str): Column name for numerical values.
         condition_column (str): Column name for the conditions (e.g., "matching_condition").
         group_column (str): Column name for the group (e.g., "subject_identifier").
@@ -155,6 +421,12 @@ def analyze_responses_by_condition_and_group(combined_df, value, condition, subj
     Returns:
         pd.DataFrame: A DataFrame showing the mean and standard deviation for each condition and group.
     """
+    if _is_statistics(combined_df):
+        rolled = combined_df.rollup([condition, subject_identifier]).sort_index()
+        return pd.DataFrame({"mean": rolled["mean"], "std": np.sqrt(rolled["var"])}).reset_index()
+
+    combined_df = as_dataframe(combined_df)
+
     # Group by both condition and group, then calculate mean and std for each combination
     condition_group_stats = combined_df.groupby([condition, subject_identifier])[value].agg(['mean', 'std']).reset_index()
 
@@ -1,20 +1,289 @@
 import pandas as pd
+import numpy as np
 import glob
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
  #write definition for each function 
 
-def csv_combined(directory_path):
-    # finding all CSV files in the directory and its subdirectories
-    csv_files = glob.glob(os.path.join(directory_path, "**", "*.csv"), recursive=True)
+# Declared column types of the Kaggle Alcoholics recordings, used by the typed ingestion mode
+EEG_SCHEMA = {
+    "trial number": "int16",
+    "sensor position": "category",
+    "sample num": "int16",
+    "sensor value": "float32",
+    "subject identifier": "category",
+    "matching condition": "category",
+    "channel": "int16",
+    "name": "category",
+    "time": "float32",
+}
+
+
+def read_typed_csv(file, schema=None):
+    """
+    Reads a single recording CSV with a declared column schema.
+
+    Columns of the schema that are missing from the file are ignored. If the file doesn't fit
+    the schema (an integer column with missing values, text in a numeric column), it is read
+    untyped and every row is kept: integer columns with missing values get the nullable dtype
+    (e.g. Int16) and columns that can't be converted keep their inferred dtype, so the rows
+    and their positions are the same as with an untyped read.
+
+    Args:
+        file (str or file-like): Path of the CSV file, or its contents in a binary buffer.
+        schema (dict, optional): Mapping of column name to dtype (default is EEG_SCHEMA).
+
+    Returns:
+        pd.DataFrame: The typed contents of the file.
+    """
+    schema = EEG_SCHEMA if schema is None else schema
+    try:
+        return pd.read_csv(file, dtype=schema)
+    except ValueError:
+        if hasattr(file, "seek"):  # in-memory archive member
+            file.seek(0)
+        return apply_schema(pd.read_csv(file), schema)
+
+
+def apply_schema(df, schema=None):
+    """
+    Converts the columns of an untyped DataFrame to the schema without dropping any row.
+
+    Integer columns with missing values get the nullable dtype (e.g. Int16) and columns that
+    can't be converted (e.g. text in a numeric column) keep their dtype.
+
+    Args:
+        df (pd.DataFrame): Rows read without a schema; converted in place.
+        schema (dict, optional): Mapping of column name to dtype (default is EEG_SCHEMA).
+
+    Returns:
+        pd.DataFrame: df
+    """
+    schema = EEG_SCHEMA if schema is None else schema
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if pd.api.types.is_integer_dtype(dtype) and df[column].isna().any():
+            dtype = str(dtype).capitalize()  # int16 -> Int16
+        try:
+            df[column] = df[column].astype(dtype)
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def _read_file(file, schema):
+    # Worker task: never raises, so one bad file doesn't cancel the whole pool
+    try:
+        return file, read_typed_csv(file, schema), None
+    except Exception as e:
+        return file, None, e
+
+
+def _read_member(name, data, schema):
+    # Worker task for archive members: parses the bytes in memory, never raises
+    try:
+        return name, read_typed_csv(io.BytesIO(data), schema), None
+    except Exception as e:
+        return name, None, e
+
+
+# Extensions of the compressed sources csv_combined reads without extracting them
+ARCHIVE_EXTENSIONS = (".zip", ".tar.gz", ".tgz", ".tar", ".gz")
+
+# Buffer of the archive file: members are read with a few large sequential reads
+ARCHIVE_BUFFER_SIZE = 2 ** 20
+
+
+def is_archive(path):
+    """
+    Whether path is a .zip, .tar(.gz) or .gz file rather than a directory of recordings.
+    """
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_archive_members(archive_path):
+    """
+    Yields the CSV files of an archive as (member name, bytes), reading the archive front to
+    back: zip members in the order of their offsets, tar members as they are streamed. A .gz
+    file is a single compressed CSV. Nothing is extracted to disk.
+
+    Args:
+        archive_path (str): Path of a .zip, .tar, .tar.gz/.tgz or .gz file.
+
+    Yields:
+        tuple: (member name, raw CSV bytes)
+    """
+    lower = archive_path.lower()
+    with open(archive_path, "rb", buffering=ARCHIVE_BUFFER_SIZE) as f:
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(f) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir() and info.filename.lower().endswith(".csv")]
+                for info in sorted(members, key=lambda info: info.header_offset):
+                    yield info.filename, archive.read(info)
+        elif lower.endswith((".tar", ".tar.gz", ".tgz")):
+            # Stream mode: a single pass over the (decompressed) archive, no seeking back
+            with tarfile.open(fileobj=f, mode="r|*") as archive:
+                for member in archive:
+                    if member.isfile() and member.name.lower().endswith(".csv"):
+                        yield member.name, archive.extractfile(member).read()
+        else:
+            with gzip.GzipFile(fileobj=f) as member:
+                yield os.path.basename(archive_path)[:-len(".gz")], member.read()
+
+
+def _read_members_parallel(members, workers, executor, schema, progress_every):
+    """
+    Parses (name, bytes) archive members concurrently and returns (name, DataFrame) pairs in
+    archive order. The archive is read in the calling thread while the pool parses; at most
+    2 * workers members are in flight, so memory doesn't grow with the size of the archive.
+    """
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    read_files = []
+    errors = 0
+    empty = 0
+    done = 0
+
+    def collect(future):
+        nonlocal errors, empty, done
+        name, df, error = future.result()
+        done += 1
+        if error is not None:
+            errors += 1
+            print(f"Error reading {name}: {error}")
+        else:
+            empty += df.empty
+            read_files.append((name, df))
+        if progress_every and done % progress_every == 0:
+            print(f"Read {done} files ({empty} empty, {errors} failed)")
+
+    with pool_class(max_workers=workers) as pool:
+        in_flight = deque()
+        for name, data in members:
+            if len(in_flight) >= 2 * workers:
+                collect(in_flight.popleft())
+            in_flight.append(pool.submit(_read_member, name, data, schema))
+        while in_flight:
+            collect(in_flight.popleft())
+    if progress_every:
+        print(f"Read {done} files ({empty} empty, {errors} failed)")
+    return read_files
+
+
+def _concat_typed(data_frames, ignore_index=True):
+    """
+    Concatenates typed DataFrames, keeping categorical columns categorical.
+
+    pd.concat falls back to object dtype when categories differ between files, so the
+    categories are unified (and sorted) before concatenating.
+    """
+    first = data_frames[0]
+    for column in first.columns:
+        if isinstance(first[column].dtype, pd.CategoricalDtype):
+            categories = set()
+            for df in data_frames:
+                categories.update(df[column].cat.categories)
+            dtype = pd.CategoricalDtype(sorted(categories))
+            for df in data_frames:
+                df[column] = df[column].astype(dtype)
+    return pd.concat(data_frames, ignore_index=ignore_index)
+
+
+def _read_files_parallel(csv_files, workers, executor, schema, progress_every):
+    """
+    Reads the CSV files concurrently and returns (file, DataFrame) pairs in file order.
+    Files that could not be read are reported and left out.
+    """
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    read_files = []
+    errors = 0
+    empty = 0
+    total = len(csv_files)
+    chunksize = max(1, total // (4 * (workers or os.cpu_count() or 1))) if executor == "process" else 1
+
+    with pool_class(max_workers=workers) as pool:
+        results = pool.map(_read_file, csv_files, [schema] * total, chunksize=chunksize)
+        for done, (file, df, error) in enumerate(results, start=1):
+            if error is not None:
+                errors += 1
+                print(f"Error reading {file}: {error}")
+            else:
+                empty += df.empty
+                read_files.append((file, df))
+            if progress_every and (done % progress_every == 0 or done == total):
+                print(f"Read {done}/{total} files ({empty} empty, {errors} failed)")
+    return read_files
+
+
+def csv_combined(directory_path, workers=None, executor=None, schema=None, progress_every=100):
+    """
+    Combines all CSV files under a directory (recursively) into one DataFrame, then removes
+    duplicate and incomplete rows.
+
+    directory_path can also be a .zip, .tar, .tar.gz/.tgz or .gz archive of the recordings: its
+    CSV members are read sequentially and parsed in memory, without extracting them, in archive
+    order. The result is the same as for the extracted tree when files are read in that order.
+
+    By default files are read one at a time with inferred column types. Passing `executor`
+    ("thread" or "process") reads them concurrently with a declared schema (EEG_SCHEMA unless
+    `schema` is given) and reports progress in aggregate. Rows and their order are the same in
+    both modes; only the column dtypes differ.
+
+    Args:
+        directory_path (str): Root directory of the recordings, or an archive of them.
+        workers (int, optional): Number of pool workers (default is the executor's default).
+        executor (str, optional): "thread" or "process" to enable parallel typed ingestion.
+        schema (dict, optional): Column dtypes for the typed mode (default is EEG_SCHEMA).
+        progress_every (int, optional): Print a progress line every this many files in the
+            typed mode (0 disables progress output).
+
+    Returns:
+        pd.DataFrame: The combined and cleaned DataFrame.
+    """
+    if executor not in (None, "thread", "process"):
+        raise ValueError(f"executor must be 'thread' or 'process', got {executor!r}")
+
+    archive = is_archive(directory_path)
+    if archive:
+        members = iter_archive_members(directory_path)
+        sources = ((f"{directory_path}:{name}", io.BytesIO(data)) for name, data in members)
+    else:
+        # finding all CSV files in the directory and its subdirectories
+        csv_files = glob.glob(os.path.join(directory_path, "**", "*.csv"), recursive=True)
+        sources = ((file, file) for file in csv_files)
+
+    if executor is not None:
+        if archive:
+            read_files = _read_members_parallel(members, workers, executor, schema, progress_every)
+        else:
+            read_files = _read_files_parallel(csv_files, workers, executor, schema, progress_every)
+        data_frames = [df for _, df in read_files if not df.empty]
+        if len(data_frames) == 0:
+            print("No data frames to concatenate.")
+            return pd.DataFrame()
+        combined_df = _concat_typed(data_frames)
+        combined_df.drop_duplicates(inplace=True)
+        combined_df.dropna(inplace=True)
+        return combined_df
 
     # Initializig an empty list to hold DataFrames
     data_frames = []
 
     # Looping through each CSV file and read it into a DataFrame
-    for file in csv_files:
+    for file, source in sources:
         print(f"Reading file: {file}")  # Check which file is being processed
         try:
-            df = pd.read_csv(file)
+            df = pd.read_csv(source)
             if df.empty:
                 print(f"Warning: {file} is empty.")
             else:
@@ -34,6 +303,312 @@ def csv_combined(directory_path):
 
 def convert_numeric_val(columname,combined_df):
     combined_df[columname] = pd.to_numeric(combined_df[columname], errors='coerce')
-    
 
-    
\ No newline at end of file
+
+# Default location of the cleaned-data cache (relative to the working directory)
+DEFAULT_CACHE_DIR = ".eeg_cache"
+
+
+def source_manifest(directory_path):
+    """
+    Lists the CSV files under a directory together with their sizes and modification times.
+    An archive is listed as a single entry.
+
+    Args:
+        directory_path (str): Root directory of the recordings, or an archive of them.
+
+    Returns:
+        list: Sorted [relative path, size in bytes, mtime in ns] entries, one per CSV file.
+    """
+    if is_archive(directory_path):
+        stat = os.stat(directory_path)
+        return [[os.path.basename(directory_path), stat.st_size, stat.st_mtime_ns]]
+    csv_files = glob.glob(os.path.join(directory_path, "**", "*.csv"), recursive=True)
+    manifest = []
+    for file in csv_files:
+        stat = os.stat(file)
+        manifest.append([os.path.relpath(file, directory_path).replace(os.sep, "/"), stat.st_size, stat.st_mtime_ns])
+    return sorted(manifest)
+
+
+def _manifest_key(manifest, options):
+    payload = json.dumps({"files": manifest, "options": options}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def save_columnar(df, cache_path):
+    """
+    Writes a DataFrame as one .npy file per column plus a small JSON description.
+
+    String columns are stored as categorical codes with their categories in the JSON file, so
+    every column can be loaded (or memory-mapped) as a plain NumPy array.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to store.
+        cache_path (str): Directory to write; it is replaced if it already exists.
+    """
+    tmp_path = cache_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        entry = {"name": column, "file": f"col{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry.update(kind="category", categories=series.cat.categories.tolist())
+            array = series.cat.codes.to_numpy()
+        elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            entry.update(kind="numeric")
+            array = series.to_numpy()
+        else:
+            # Strings: stored like a categorical, restored to the original dtype on load
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            entry.update(kind="string", dtype=str(series.dtype), categories=categories.tolist())
+            array = codes
+        np.save(os.path.join(tmp_path, entry["file"]), array)
+        columns.append(entry)
+
+    np.save(os.path.join(tmp_path, "index.npy"), df.index.to_numpy())
+    with open(os.path.join(tmp_path, "columns.json"), "w") as f:
+        json.dump(columns, f)
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+
+
+def load_columnar(cache_path, mmap=False):
+    """
+    Loads a DataFrame written by `save_columnar`.
+
+    Args:
+        cache_path (str): Directory written by `save_columnar`.
+        mmap (bool, optional): Memory-map the numeric columns instead of reading them (default is False).
+
+    Returns:
+        pd.DataFrame: The stored DataFrame.
+    """
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(cache_path, "columns.json")) as f:
+        columns = json.load(f)
+
+    data = {}
+    string_dtypes = {}
+    for entry in columns:
+        array = np.load(os.path.join(cache_path, entry["file"]), mmap_mode=mmap_mode)
+        if entry["kind"] == "numeric":
+            data[entry["name"]] = array
+        else:
+            data[entry["name"]] = pd.Categorical.from_codes(array, categories=entry["categories"])
+            if entry["kind"] == "string":
+                string_dtypes[entry["name"]] = entry["dtype"]
+    index = np.load(os.path.join(cache_path, "index.npy"))
+    return pd.DataFrame(data, index=index).astype(string_dtypes)
+
+
+def load_cleaned_data(directory_path, value_column="sensor value", cache_dir=DEFAULT_CACHE_DIR, export_csv=None,
+                      refresh=False, **ingest_options):
+    """
+    Returns the output of `csv_combined` + `convert_numeric_val`, using an on-disk columnar cache.
+
+    The cache is keyed by the manifest of source files (paths, sizes and modification times) and
+    the ingestion options, so it is rebuilt automatically whenever a recording is added, removed
+    or modified.
+
+    Args:
+        directory_path (str): Root directory of the recordings.
+        value_column (str, optional): Column converted with `convert_numeric_val` (default is "sensor value").
+        cache_dir (str, optional): Directory holding the cache; None disables caching.
+        export_csv (str, optional): If given, the cleaned data is also written to this CSV path.
+        refresh (bool, optional): Rebuild the cache even if it is up to date (default is False).
+        **ingest_options: Passed on to `csv_combined` (e.g. executor="process", workers=8).
+
+    Returns:
+        pd.DataFrame: The cleaned dataset.
+    """
+    combined_df = None
+    if cache_dir is not None:
+        options = {"value_column": value_column, **ingest_options}
+        options.pop("workers", None)  # doesn't affect the result
+        options.pop("progress_every", None)
+        key = _manifest_key(source_manifest(directory_path), options)
+        cache_path = os.path.join(cache_dir, "cleaned")
+        key_file = os.path.join(cache_path, "manifest_key")
+
+        if not refresh and os.path.exists(key_file):
+            with open(key_file) as f:
+                if f.read() == key:
+                    print(f"Loading cleaned data from cache: {cache_path}")
+                    combined_df = load_columnar(cache_path)
+
+    if combined_df is None:
+        combined_df = csv_combined(directory_path, **ingest_options)
+        convert_numeric_val(value_column, combined_df)
+        if cache_dir is not None:
+            save_columnar(combined_df, cache_path)
+            with open(key_file, "w") as f:
+                f.write(key)
+
+    if export_csv is not None:
+        combined_df.to_csv(export_csv, index=False)
+    return combined_df
+
+
+def _content_hash(file):
+    with open(file, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+
+def row_hashes(df):
+    """
+    64-bit hash of every row of a DataFrame (its values only, not its index).
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def dedup_by_hash(hashes, stored_hashes=None):
+    """
+    Returns a mask keeping the first occurrence of every row hash that isn't already stored.
+    """
+    keep = ~pd.Index(hashes).duplicated(keep="first")
+    if stored_hashes is not None and len(stored_hashes):
+        keep &= ~np.isin(hashes, stored_hashes)
+    return keep
+
+
+def csv_combined_incremental(directory_path, store_dir=os.path.join(DEFAULT_CACHE_DIR, "incremental"), workers=None,
+                             executor="thread", schema=None, progress_every=100):
+    """
+    Incremental version of the typed `csv_combined`: only new or modified CSV files are parsed.
+
+    The store keeps a manifest of every source file (size, mtime and SHA-1 of its content), the
+    parsed rows of each file and the combined dataset together with a hash of each of its rows.
+    Files whose size and mtime (or, failing that, content hash) are unchanged are not read again.
+    When files are only added after the already stored ones, their rows are deduplicated against
+    the stored row hashes and appended. Deleted or modified files, or a change in file order,
+    reassemble the dataset from the stored per-file rows (still without parsing them again).
+    Either way the result equals `csv_combined(directory_path, executor=...)`, index included.
+
+    Args:
+        directory_path (str): Root directory of the recordings.
+        store_dir (str, optional): Directory holding the incremental store.
+        workers (int, optional): Number of pool workers used to parse changed files.
+        executor (str, optional): "thread" or "process" (default is "thread").
+        schema (dict, optional): Column dtypes (default is EEG_SCHEMA).
+        progress_every (int, optional): Print a progress line every this many parsed files.
+
+    Returns:
+        pd.DataFrame: The combined and cleaned DataFrame.
+    """
+    if is_archive(directory_path):
+        raise ValueError("csv_combined_incremental needs a directory of CSV files; read archives with csv_combined")
+    schema = EEG_SCHEMA if schema is None else schema
+    parts_dir = os.path.join(store_dir, "parts")
+    combined_path = os.path.join(store_dir, "combined")
+    hashes_path = os.path.join(store_dir, "combined_hashes.npy")
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    os.makedirs(parts_dir, exist_ok=True)
+
+    manifest = {"schema": schema, "files": {}, "order": [], "raw_rows": 0}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            stored_manifest = json.load(f)
+        # Parts stored with another schema can't be reused
+        if stored_manifest["schema"] == schema:
+            manifest = stored_manifest
+    stored = manifest["files"]
+
+    # Compare the directory with the manifest
+    csv_files = glob.glob(os.path.join(directory_path, "**", "*.csv"), recursive=True)
+    relative = {file: os.path.relpath(file, directory_path).replace(os.sep, "/") for file in csv_files}
+    current = {}
+    to_read = []
+    for file in csv_files:
+        rel = relative[file]
+        stat = os.stat(file)
+        entry = stored.get(rel)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            current[rel] = entry
+            continue
+        digest = _content_hash(file)
+        if entry is not None and entry["sha1"] == digest:
+            current[rel] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            continue
+        current[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest,
+                        "part": hashlib.sha1(rel.encode()).hexdigest()}
+        to_read.append(file)
+
+    # Parse new and modified files; store their rows (incomplete rows removed) and row hashes
+    modified = set()
+    for file, df in _read_files_parallel(to_read, workers, executor or "thread", schema, progress_every):
+        rel = relative[file]
+        entry = current[rel]
+        df = df.reset_index(drop=True)
+        entry["rows"] = len(df)
+        part = df.dropna()
+        part.to_pickle(os.path.join(parts_dir, entry["part"] + ".pkl"))
+        np.save(os.path.join(parts_dir, entry["part"] + ".npy"), row_hashes(part))
+        if rel in stored:
+            modified.add(rel)
+    for file in to_read:
+        if "rows" not in current[relative[file]]:  # could not be read, retried on the next update
+            del current[relative[file]]
+
+    removed = [rel for rel in stored if rel not in current]
+    for rel in removed:
+        for extension in (".pkl", ".npy"):
+            part_file = os.path.join(parts_dir, stored[rel]["part"] + extension)
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    order = [relative[file] for file in csv_files if relative[file] in current and current[relative[file]]["rows"]]
+    old_order = manifest["order"]
+    appendable = (os.path.exists(combined_path) and not removed and not modified
+                  and order[:len(old_order)] == old_order)
+
+    if appendable:
+        if len(order) == len(old_order):
+            manifest["files"] = current
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f)
+            return load_columnar(combined_path)
+        data_frames = [load_columnar(combined_path)]
+        stored_hashes = np.load(hashes_path)
+        offset = manifest["raw_rows"]
+        new_files = order[len(old_order):]
+    else:
+        data_frames = []
+        stored_hashes = np.empty(0, dtype=np.uint64)
+        offset = 0
+        new_files = order
+
+    # Deduplicate the new rows against the stored row hashes instead of a global drop_duplicates
+    parts = []
+    part_hashes = []
+    for rel in new_files:
+        entry = current[rel]
+        part = pd.read_pickle(os.path.join(parts_dir, entry["part"] + ".pkl"))
+        part.index = part.index + offset  # same row labels as the ignore_index concat of csv_combined
+        offset += entry["rows"]
+        parts.append(part)
+        part_hashes.append(np.load(os.path.join(parts_dir, entry["part"] + ".npy")))
+    hashes = np.concatenate(part_hashes) if part_hashes else np.empty(0, dtype=np.uint64)
+    keep = dedup_by_hash(hashes, stored_hashes)
+
+    start = 0
+    for part in parts:
+        data_frames.append(part.take(np.flatnonzero(keep[start:start + len(part)])))
+        start += len(part)
+
+    if data_frames:
+        combined_df = _concat_typed(data_frames, ignore_index=False)
+    else:
+        print("No data frames to concatenate.")
+        combined_df = pd.DataFrame()
+
+    save_columnar(combined_df, combined_path)
+    np.save(hashes_path, np.concatenate([stored_hashes, hashes[keep]]))
+    manifest.update(schema=schema, files=current, order=order, raw_rows=offset)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return combined_df
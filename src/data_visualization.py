@@ -1,57 +1,319 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+from src.cache_utils import fingerprint
 from src.data_analysis import compute_group_differences
+from src.eeg_dataset import as_dataframe
 
-def time_series_visualization(combined_df, time,value,subject_identifier):
-    sns.lineplot(data=combined_df, x=time, y=value, hue=subject_identifier)
-    plt.title("EEG Response Over Time:")
-    plt.xlabel("Time (seconds)")
-    plt.ylabel("Sensor Value (µV)")
-    plt.show()
+# matplotlib and seaborn are imported inside the plotting functions, so the aggregations (and
+# statistics-only jobs importing this module) don't pay for their start-up time
 
 
-def plot_brain_region_analysis(grouped_data, subject_identifier, value, title="Absolute Mean EEG Values by Brain Region and Group"):
+def use_headless_backend():
+    """
+    Switches matplotlib to the non-interactive Agg backend, for servers and batch jobs.
+    Combine with the save_path argument of the plotting functions to write figures to files.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def finish_figure(fig, save_path):
+    """
+    Shows the figure, or writes it to save_path (format from the extension, e.g. .png or .svg)
+    and closes it. Shared by the plotting functions of this and other modules (e.g. topography).
+
+    Args:
+        fig (matplotlib.figure.Figure): The finished figure.
+        save_path (str): Output file, or None to show the figure.
+    """
+    import matplotlib.pyplot as plt
+
+    if save_path is None:
+        plt.show()
+        return
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fig.savefig(save_path, dpi=150)
+    plt.close(fig)
+
+
+def aggregate_time_series(combined_df, time, value, subject_identifier):
+    """
+    Computes the mean and the standard error of the mean per time point and group.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset (or EEGDataset) to aggregate.
+        time (str): Column name for the time points.
+        value (str): Column name for numerical values.
+        subject_identifier (str): Column name for the group.
+
+    Returns:
+        pd.DataFrame: One row per (group, time) with count, mean, std and sem columns.
+    """
+    combined_df = as_dataframe(combined_df)
+    stats = combined_df.groupby([subject_identifier, time], observed=True)[value].agg(["count", "mean", "std"])
+    stats["sem"] = stats["std"] / np.sqrt(stats["count"])
+    return stats.reset_index()
+
+
+def plot_time_series(stats, time, subject_identifier, save_path=None):
+    """
+    Plots the mean response over time per group with a 95% confidence band (1.96 standard errors).
+
+    Args:
+        stats (pd.DataFrame): Output of `aggregate_time_series`.
+        time (str): Column name for the time points.
+        subject_identifier (str): Column name for the group.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for group, group_stats in stats.groupby(subject_identifier, observed=True):
+        line, = ax.plot(group_stats[time], group_stats["mean"], label=group)
+        ax.fill_between(group_stats[time], group_stats["mean"] - 1.96 * group_stats["sem"],
+                        group_stats["mean"] + 1.96 * group_stats["sem"], color=line.get_color(), alpha=0.2,
+                        linewidth=0)
+    ax.legend(title=subject_identifier)
+    ax.set_title("EEG Response Over Time:")
+    ax.set_xlabel("Time (seconds)")
+    ax.set_ylabel("Sensor Value (µV)")
+    finish_figure(fig, save_path)
+
+
+def time_series_visualization(combined_df, time,value,subject_identifier, save_path=None):
+    """
+    Plots the EEG response over time per group from pre-aggregated means and standard errors.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset (or EEGDataset) to plot.
+        time (str): Column name for the time points.
+        value (str): Column name for numerical values.
+        subject_identifier (str): Column name for the group.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    stats = aggregate_time_series(combined_df, time, value, subject_identifier)
+    plot_time_series(stats, time, subject_identifier, save_path)
+
+
+def aggregate_brain_regions(grouped_data, subject_identifier, value):
+    """
+    Computes the absolute mean value per brain region and group.
+
+    Args:
+        grouped_data (pd.DataFrame): Data with a 'region' column (see map_sensors_to_regions).
+        subject_identifier (str): Column name for the group.
+        value (str): Column name for numerical values.
+
+    Returns:
+        pd.DataFrame: Regions as rows and groups as columns.
+    """
+    region_means = grouped_data.groupby(["region", subject_identifier], observed=True)[value].mean().unstack()
+    return region_means.abs()
+
+
+def plot_region_means(region_means, title="Absolute Mean EEG Values by Brain Region and Group", save_path=None):
+    """
+    Plots the output of `aggregate_brain_regions` as a bar chart.
+
+    Args:
+        region_means (pd.DataFrame): Regions as rows and groups as columns.
+        title (str): Title of the plot.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    region_means.plot(kind="bar", colormap="coolwarm", ax=ax)
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel("Brain Region", fontsize=12)
+    ax.set_ylabel("Mean Value", fontsize=12)
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.legend(title="Group", fontsize=10)
+    fig.tight_layout()
+    finish_figure(fig, save_path)
+
+
+def plot_brain_region_analysis(grouped_data, subject_identifier, value, title="Absolute Mean EEG Values by Brain Region and Group",
+                               save_path=None):
     """
     Plot a bar chart for mean EEG values grouped by brain region and subject group.
     
     Args:
         grouped_data (pd.DataFrame): Grouped data (mean values by region and group).
         title (str): Title of the plot.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    plot_region_means(aggregate_brain_regions(grouped_data, subject_identifier, value), title, save_path)
+
+
+def aggregate_conditions(combined_df, value, condition_column, subject_identifier):
+    """
+    Computes the absolute mean value per condition and group.
+
+    Returns:
+        pd.DataFrame: One row per (condition, group) with the absolute mean in the value column.
     """
-    grouped_data = grouped_data.groupby(["region", subject_identifier])[value].mean().unstack()
-    grouped_data = grouped_data.abs()
-    grouped_data.plot(kind="bar", figsize=(10, 6), colormap="coolwarm")
-    plt.title(title, fontsize=16)
-    plt.xlabel("Brain Region", fontsize=12)
-    plt.ylabel("Mean Value", fontsize=12)
-    plt.xticks(rotation=45)
-    plt.legend(title="Group", fontsize=10)
-    plt.tight_layout()
-    plt.show()
+    combined_df = as_dataframe(combined_df)
+    condition_group_means = combined_df.groupby([condition_column, subject_identifier], observed=True)[value].mean().reset_index()
+    condition_group_means[value] = condition_group_means[value].abs()
+    return condition_group_means
 
 
-def visualize_all_conditions(combined_df, value, condition_column, subject_identifier):
+def plot_condition_means(condition_group_means, value, condition_column, subject_identifier, save_path=None):
+    """
+    Plots the output of `aggregate_conditions` as a grouped bar chart.
+
+    Args:
+        condition_group_means (pd.DataFrame): One row per (condition, group).
+        value (str): Column name for numerical values.
+        condition_column (str): Column name for the conditions.
+        subject_identifier (str): Column name for the group.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x=condition_column, y=value, hue=subject_identifier, data=condition_group_means, errorbar=None, ax=ax)
+    ax.set_title("Mean Response by Condition and Group")
+    ax.set_xlabel("Condition")
+    ax.set_ylabel("Mean Response Value")
+
+    fig.tight_layout()
+    finish_figure(fig, save_path)
+
+
+def visualize_all_conditions(combined_df, value, condition_column, subject_identifier, save_path=None):
     """
     Visualizes the response values for each condition, separated by group (e.g., alcoholic vs control),
     using both a box plot and bar plot.
     
     Args:
-        combined_df (pd.DataFrame): The dataset to analyze.
+        combined_df (pd.DataFrame): The dataset (or EEGDataset) to analyze.
         value (str): Column name for numerical values.
         condition_column (str): Column name for the conditions (e.g., "matching_condition").
         subject_identifier (str): Column name for the group (e.g., "subject_identifier").
+        save_path (str, optional): Write the figure to this file instead of showing it.
     """
-    plt.figure(figsize=(10, 6))
-    condition_group_means = combined_df.groupby([condition_column, subject_identifier])[value].mean().reset_index()
-    condition_group_means[value] = condition_group_means[value].abs()
-    sns.barplot(x=condition_column, y=value, hue=subject_identifier, data=condition_group_means)
-    plt.title("Mean Response by Condition and Group")
-    plt.xlabel("Condition")
-    plt.ylabel("Mean Response Value")
+    condition_group_means = aggregate_conditions(combined_df, value, condition_column, subject_identifier)
+    plot_condition_means(condition_group_means, value, condition_column, subject_identifier, save_path)
+
+
+# Plotting functions usable in figure specs; each takes the pre-aggregated data as first argument
+FIGURE_KINDS = {
+    "time_series": plot_time_series,
+    "region_means": plot_region_means,
+    "condition_means": plot_condition_means,
+}
 
-    plt.tight_layout()
-    plt.show()
 
+@dataclass
+class FigureSpec:
+    """
+    One figure of a batch rendered by `render_figures`.
+
+    Attributes:
+        name (str): Output file name relative to the output directory (e.g. "CZ.png").
+        kind (str): Key of FIGURE_KINDS.
+        data (pd.DataFrame): Pre-aggregated data passed to the plotting function.
+        params (dict): Other keyword arguments of the plotting function.
+    """
+    name: str
+    kind: str
+    data: object
+    params: dict = field(default_factory=dict)
+
+
+def time_series_specs(combined_df, time, value, subject_identifier, by, file_format="png"):
+    """
+    Builds one time series figure spec per value of the `by` column (e.g. per sensor or subject),
+    aggregating the whole dataset in a single groupby.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset (or EEGDataset) to plot.
+        time (str): Column name for the time points.
+        value (str): Column name for numerical values.
+        subject_identifier (str): Column name for the group.
+        by (str): Column with one figure per distinct value.
+        file_format (str, optional): File extension of the figures (default is "png").
+
+    Returns:
+        list: FigureSpec objects named "<value of by>.<file_format>".
+    """
+    combined_df = as_dataframe(combined_df)
+    stats = combined_df.groupby([by, subject_identifier, time], observed=True)[value].agg(["count", "mean", "std"])
+    stats["sem"] = stats["std"] / np.sqrt(stats["count"])
+    stats = stats.reset_index()
+    return [
+        FigureSpec(f"{key}.{file_format}", "time_series", key_stats.drop(columns=by).reset_index(drop=True),
+                   {"time": time, "subject_identifier": subject_identifier})
+        for key, key_stats in stats.groupby(by, observed=True)
+    ]
+
+
+def _render_figure(spec, path):
+    FIGURE_KINDS[spec.kind](spec.data, **spec.params, save_path=path)
+    return spec.name
+
+
+def render_figures(specs, output_dir, workers=None, use_cache=True):
+    """
+    Renders a batch of figures to files in a process pool, skipping unchanged figures.
+
+    Every worker only receives the pre-aggregated data of its figures. A manifest in the output
+    directory records a hash of each figure's kind, data and parameters; figures whose hash is
+    unchanged and whose file still exists are not rendered again.
+
+    Args:
+        specs (list): FigureSpec objects.
+        output_dir (str): Directory the figures are written to.
+        workers (int, optional): Number of worker processes; 1 renders in the calling process.
+        use_cache (bool, optional): Skip unchanged figures (default is True).
+
+    Returns:
+        dict: Figure name -> "rendered" or "cached".
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, ".figures.json")
+    manifest = {}
+    if use_cache and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    status = {}
+    to_render = []
+    for spec in specs:
+        if spec.kind not in FIGURE_KINDS:
+            raise ValueError(f"Unknown figure kind: {spec.kind!r}")
+        key = fingerprint(spec.kind, spec.data, spec.params)
+        path = os.path.join(output_dir, spec.name)
+        if use_cache and manifest.get(spec.name) == key and os.path.exists(path):
+            status[spec.name] = "cached"
+        else:
+            to_render.append((spec, path, key))
 
+    if workers == 1 or len(to_render) <= 1:
+        for spec, path, _ in to_render:
+            _render_figure(spec, path)
+    else:
+        # Not forked: render_figures runs next to other pipeline threads, and a child forked while one
+        # of them holds a lock (e.g. the import lock of a lazy import) would wait for it forever
+        context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                              else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=use_headless_backend) as pool:
+            list(pool.map(_render_figure, [spec for spec, _, _ in to_render], [path for _, path, _ in to_render]))
 
+    for spec, _, key in to_render:
+        manifest[spec.name] = key
+        status[spec.name] = "rendered"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    return status
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from src.eeg_tensor import DEFAULT_COLUMNS, EEGTensor
+
+# Levels of the index, outermost first, and the DEFAULT_COLUMNS key of their column
+LEVELS = {
+    "group": "subject_identifier",
+    "subject": "subject",
+    "condition": "condition",
+    "trial": "trial",
+    "sensor": "position",
+}
+
+
+class EEGDataset:
+    """
+    The long-format EEG data sorted once by group, subject, condition, trial, sensor and sample,
+    with an offset table over the sorted rows.
+
+    Every (group, subject, condition, trial) prefix and every sensor of a trial is a contiguous
+    block of rows, so selecting one is a dictionary lookup (plus a binary search over the few
+    dozen sensors of a trial) and returns a zero-copy slice of the data. Other selections, e.g.
+    one sensor across all trials, gather only the matching blocks.
+
+    The analysis and visualization functions accept a dataset in place of the DataFrame.
+
+    Attributes:
+        frame (pd.DataFrame): The sorted rows.
+        columns (dict): Column names (see DEFAULT_COLUMNS).
+    """
+
+    def __init__(self, frame, codes, uniques, columns):
+        self.frame = frame
+        self.columns = columns
+        # (rows, levels) codes of each row and the value of every code, per level
+        self._codes = codes
+        self._uniques = uniques
+        self._offsets = None
+
+    @classmethod
+    def from_dataframe(cls, combined_df, **columns):
+        """
+        Builds the dataset from the long-format output of `csv_combined`.
+
+        Args:
+            combined_df (pd.DataFrame): One row per (trial, sensor, sample).
+            **columns: Column names overriding DEFAULT_COLUMNS.
+
+        Returns:
+            EEGDataset: The sorted, indexed data.
+        """
+        columns = {**DEFAULT_COLUMNS, **columns}
+        # Levels keep their order of appearance; samples are sorted in time
+        factorized = [pd.factorize(combined_df[columns[key]]) for key in LEVELS.values()]
+        sample_codes, _ = pd.factorize(combined_df[columns["sample"]], sort=True)
+        codes = np.column_stack([level_codes for level_codes, _ in factorized]).astype(np.int32)
+
+        order = np.lexsort([sample_codes] + [codes[:, i] for i in reversed(range(len(LEVELS)))])
+        frame = combined_df.take(order).reset_index(drop=True)
+        return cls(frame, codes[order], [pd.Index(uniques) for _, uniques in factorized], columns)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def to_dataframe(self):
+        return self.frame
+
+    def to_tensor(self):
+        """
+        The dense `EEGTensor` of the selected rows.
+        """
+        return EEGTensor.from_dataframe(self.frame, **self.columns)
+
+    def values(self, level):
+        """
+        The distinct values of a level ("group", "subject", "condition", "trial" or "sensor") in the data.
+        """
+        return self._uniques[_level_number(level)][np.unique(self._codes[:, _level_number(level)])]
+
+    def _offset_table(self):
+        """
+        Start row of every (group, subject, condition, trial, sensor) block and the block range
+        of every (group, ...) prefix, built on first use.
+        """
+        if self._offsets is None:
+            codes = self._codes
+            new_block = np.ones(len(codes), dtype=bool)
+            new_block[1:] = (codes[1:] != codes[:-1]).any(axis=1)
+            starts = np.flatnonzero(new_block)
+            block_codes = codes[starts]
+
+            prefixes = {}
+            blocks = pd.DataFrame(block_codes[:, :-1]).reset_index()
+            for depth in range(1, len(LEVELS)):
+                ranges = blocks.groupby(list(range(depth)), sort=False)["index"].agg(["min", "max"])
+                keys = ranges.index if depth > 1 else [(key,) for key in ranges.index]
+                prefixes.update(zip(keys, zip(ranges["min"], ranges["max"] + 1)))
+            self._offsets = (np.append(starts, len(codes)), block_codes, prefixes)
+        return self._offsets
+
+    def select(self, group=None, subject=None, condition=None, trial=None, sensor=None):
+        """
+        Selects rows by any combination of group, subject, condition, trial and sensor. Each
+        argument is a single value or a list of values; None keeps every value.
+
+        Single values that form a prefix of (group, subject, condition, trial), optionally with a
+        sensor after a full trial, select one contiguous block: this is a constant-time lookup
+        and the result shares the rows of this dataset. Any other selection copies only the
+        matching rows.
+
+        Returns:
+            EEGDataset: The selected rows, still sorted and indexed.
+        """
+        selection = dict(zip(LEVELS, (group, subject, condition, trial, sensor)))
+        row_starts, block_codes, prefixes = self._offset_table()
+
+        # Fast path: a run of single values from the outermost level inwards is one block
+        codes = []
+        for number, value in enumerate(selection.values()):
+            if value is None or isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+                break
+            code = self._uniques[number].get_indexer([value])[0]
+            if code < 0:
+                return self._slice(0, 0)
+            codes.append(code)
+        rest = list(selection.values())[len(codes):]
+        if codes and all(value is None for value in rest):
+            if len(codes) < len(LEVELS):
+                first, stop = prefixes.get(tuple(codes), (0, 0))
+            else:
+                first, stop = prefixes.get(tuple(codes[:-1]), (0, 0))
+                # The sensors of a trial are consecutive blocks in code order
+                first += np.searchsorted(block_codes[first:stop, -1], codes[-1])
+                stop = first + 1 if first < stop and block_codes[first, -1] == codes[-1] else first
+            return self._slice(row_starts[first], row_starts[stop])
+
+        # General case: filter the (much smaller) block table, then gather the rows of the blocks
+        keep = np.ones(len(block_codes), dtype=bool)
+        for number, value in enumerate(selection.values()):
+            if value is not None:
+                values = value if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)) else [value]
+                wanted = self._uniques[number].get_indexer(list(values))
+                keep &= np.isin(block_codes[:, number], wanted[wanted >= 0])
+        blocks = np.flatnonzero(keep)
+        if len(blocks) == 0:
+            return self._slice(0, 0)
+        lengths = row_starts[blocks + 1] - row_starts[blocks]
+        rows = np.repeat(row_starts[blocks] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return EEGDataset(self.frame.take(rows).reset_index(drop=True), self._codes[rows], self._uniques,
+                          self.columns)
+
+    def _slice(self, start, stop):
+        return EEGDataset(self.frame.iloc[start:stop], self._codes[start:stop], self._uniques, self.columns)
+
+
+def _level_number(level):
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level!r}, expected one of {list(LEVELS)}")
+    return list(LEVELS).index(level)
+
+
+def as_dataframe(data):
+    """
+    The rows of an `EEGDataset`, or data itself if it is already a DataFrame.
+    """
+    return data.frame if isinstance(data, EEGDataset) else data
@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Column names of the Kaggle Alcoholics recordings, as used throughout main.py
+DEFAULT_COLUMNS = {
+    "value": "sensor value",
+    "position": "sensor position",
+    "sample": "sample num",
+    "subject_identifier": "subject identifier",
+    "condition": "matching condition",
+    "subject": "name",
+    "trial": "trial number",
+    "channel": "channel",
+    "time": "time",
+}
+
+
+@dataclass
+class EEGTensor:
+    """
+    Dense (trials, channels, samples) representation of the long-format EEG data.
+
+    Every trial is one recording of one subject; its subject, group (subject identifier),
+    condition and trial number are kept in small per-trial arrays. Cells that are missing
+    from the long-format data are NaN.
+
+    Attributes:
+        data (np.ndarray): float32 array shaped (trials, channels, samples).
+        channels (np.ndarray): Sensor position of each channel.
+        samples (np.ndarray): Sample number of each sample.
+        subjects (np.ndarray): Subject name of each trial.
+        groups (np.ndarray): Group label of each trial (e.g. 'a' or 'c').
+        conditions (np.ndarray): Matching condition of each trial.
+        trial_numbers (np.ndarray): Trial number of each trial.
+        columns (dict): Column names used when converting from/to a DataFrame.
+    """
+    data: np.ndarray
+    channels: np.ndarray
+    samples: np.ndarray
+    subjects: np.ndarray
+    groups: np.ndarray
+    conditions: np.ndarray
+    trial_numbers: np.ndarray
+    columns: dict = field(default_factory=lambda: dict(DEFAULT_COLUMNS))
+
+    @classmethod
+    def from_dataframe(cls, combined_df, **columns):
+        """
+        Builds the tensor from the long-format output of `csv_combined`.
+
+        Args:
+            combined_df (pd.DataFrame): One row per (trial, sensor, sample).
+            **columns: Column names overriding DEFAULT_COLUMNS (value, position, sample,
+                subject_identifier, condition, subject, trial).
+
+        Returns:
+            EEGTensor: The dense representation of the data.
+        """
+        columns = {**DEFAULT_COLUMNS, **columns}
+        trial_keys = [columns["subject"], columns["trial"], columns["subject_identifier"], columns["condition"]]
+
+        trial_codes = combined_df.groupby(trial_keys, sort=True, observed=True).ngroup().to_numpy()
+        channel_codes, channels = pd.factorize(combined_df[columns["position"]])
+        sample_codes, samples = pd.factorize(combined_df[columns["sample"]], sort=True)
+
+        n_trials = trial_codes.max() + 1 if len(trial_codes) else 0
+        data = np.full((n_trials, len(channels), len(samples)), np.nan, dtype=np.float32)
+        data[trial_codes, channel_codes, sample_codes] = combined_df[columns["value"]].to_numpy(np.float32)
+
+        # Per-trial metadata from the first row of each trial
+        _, first_rows = np.unique(trial_codes, return_index=True)
+        metadata = combined_df.iloc[first_rows]
+        return cls(
+            data=data,
+            channels=np.asarray(channels),
+            samples=np.asarray(samples),
+            subjects=metadata[columns["subject"]].to_numpy(),
+            groups=metadata[columns["subject_identifier"]].to_numpy(),
+            conditions=metadata[columns["condition"]].to_numpy(),
+            trial_numbers=metadata[columns["trial"]].to_numpy(),
+            columns=columns,
+        )
+
+    def to_dataframe(self, sampling_rate=256):
+        """
+        Converts the tensor back to the long format, one row per (trial, sensor, sample), with
+        the columns of the Kaggle files. The channel number is the position of the sensor in
+        the channel order and the time is the sample number divided by the sampling rate.
+
+        Args:
+            sampling_rate (float, optional): Sampling rate in Hz (default is 256).
+
+        Returns:
+            pd.DataFrame: The long-format data; missing (NaN) cells are left out.
+        """
+        n_trials, n_channels, n_samples = self.data.shape
+        trial_index, channel_index, sample_index = np.indices(self.data.shape).reshape(3, -1)
+        values = self.data.reshape(-1)
+        present = ~np.isnan(values)
+
+        df = pd.DataFrame({
+            self.columns["trial"]: self.trial_numbers[trial_index[present]],
+            self.columns["position"]: self.channels[channel_index[present]],
+            self.columns["sample"]: self.samples[sample_index[present]],
+            self.columns["value"]: values[present],
+            self.columns["subject_identifier"]: self.groups[trial_index[present]],
+            self.columns["condition"]: self.conditions[trial_index[present]],
+            self.columns["channel"]: channel_index[present],
+            self.columns["subject"]: self.subjects[trial_index[present]],
+            self.columns["time"]: self.samples[sample_index[present]] / sampling_rate,
+        })
+        return df
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def trial_metadata(self):
+        """
+        Returns:
+            pd.DataFrame: One row per trial with its subject, group, condition and trial number.
+        """
+        return pd.DataFrame({
+            self.columns["subject"]: self.subjects,
+            self.columns["trial"]: self.trial_numbers,
+            self.columns["subject_identifier"]: self.groups,
+            self.columns["condition"]: self.conditions,
+        })
+
+    def select(self, groups=None, conditions=None, subjects=None, channels=None):
+        """
+        Returns a new tensor restricted to the given groups, conditions, subjects and channels.
+
+        Args:
+            groups (list, optional): Group labels to keep.
+            conditions (list, optional): Conditions to keep.
+            subjects (list, optional): Subjects to keep.
+            channels (list, optional): Sensor positions to keep.
+
+        Returns:
+            EEGTensor: The selected trials and channels.
+        """
+        trials = np.ones(len(self.groups), dtype=bool)
+        if groups is not None:
+            trials &= np.isin(self.groups, groups)
+        if conditions is not None:
+            trials &= np.isin(self.conditions, conditions)
+        if subjects is not None:
+            trials &= np.isin(self.subjects, subjects)
+        channel_mask = np.ones(len(self.channels), dtype=bool) if channels is None else np.isin(self.channels, channels)
+
+        return EEGTensor(
+            data=self.data[trials][:, channel_mask],
+            channels=self.channels[channel_mask],
+            samples=self.samples,
+            subjects=self.subjects[trials],
+            groups=self.groups[trials],
+            conditions=self.conditions[trials],
+            trial_numbers=self.trial_numbers[trials],
+            columns=dict(self.columns),
+        )
+
+    def group_mean(self, group):
+        """
+        Mean over the trials of one group.
+
+        Args:
+            group (str): Group label (e.g. 'a').
+
+        Returns:
+            np.ndarray: float64 array shaped (channels, samples).
+        """
+        return np.nanmean(self.data[self.groups == group], axis=0, dtype=np.float64)
+
+    def group_difference(self, group1, group2):
+        """
+        Difference of the trial-averaged signals of two groups (group1 minus group2).
+
+        Returns:
+            np.ndarray: float64 array shaped (channels, samples).
+        """
+        return self.group_mean(group1) - self.group_mean(group2)
+
+    def sensor_group_differences(self, group1, group2):
+        """
+        Tensor version of `data_analysis.compute_group_differences`: mean value of each group
+        per sensor (over all trials and samples) and their absolute difference.
+
+        Returns:
+            pd.DataFrame: Mean values per group and the absolute difference, indexed by
+            sensor position and sorted by the largest difference.
+        """
+        means = {}
+        for group in (group1, group2):
+            group_data = self.data[self.groups == group]
+            counts = np.sum(~np.isnan(group_data), axis=(0, 2))
+            with np.errstate(invalid="ignore"):
+                means[group] = np.nansum(group_data, axis=(0, 2), dtype=np.float64) / counts
+
+        grouped = pd.DataFrame(means, index=pd.Index(self.channels, name=self.columns["position"]))
+        grouped["difference"] = abs(grouped[group1] - grouped[group2])
+        return grouped.sort_values(by="difference", ascending=False)
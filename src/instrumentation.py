@@ -0,0 +1,251 @@
+import cProfile
+import functools
+import importlib
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Modules whose public functions are instrumented by default
+DEFAULT_MODULES = ("src.data_cleaning", "src.data_analysis", "src.data_visualization")
+
+
+def _rows(obj):
+    """
+    Number of rows of a DataFrame, Series, EEGDataset or array, None for anything else.
+    """
+    if hasattr(obj, "shape") and getattr(obj, "ndim", 0) >= 1:
+        return int(obj.shape[0])
+    if hasattr(obj, "frame") and hasattr(obj.frame, "shape"):
+        return int(obj.frame.shape[0])
+    return None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(max_rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, memory and rows in/out of every call to the public functions
+    of the data_cleaning, data_analysis and data_visualization modules.
+
+    While active, the functions are replaced by timing wrappers in their modules and in every
+    loaded `src` module (and main) that imported them, so pipelines built inside the context
+    are instrumented too; on exit the originals are restored, so there is no overhead at all
+    when instrumentation isn't used.
+
+    Memory is the peak traced by tracemalloc during the call, above what was allocated when it
+    started, plus the process's peak RSS. Both are process-wide, so calls running concurrently
+    in threads share them. With profile=True every outermost call is also run under cProfile
+    and the hottest functions are added to the report.
+
+    Example:
+        with Instrumentation(report_path="run_profile"):
+            main()
+        # -> run_profile.json and run_profile.txt
+
+    Args:
+        modules (tuple, optional): Names of the modules to instrument (default is DEFAULT_MODULES).
+        memory (bool, optional): Trace memory with tracemalloc (default is True; slows allocations down).
+        profile (bool, optional): Capture cProfile statistics (default is False).
+        top (int, optional): Number of functions in the profile summary (default is 20).
+        report_path (str, optional): On exit, write <report_path>.json and <report_path>.txt.
+        verbose (bool, optional): Print the text summary on exit (default is True).
+    """
+
+    def __init__(self, modules=DEFAULT_MODULES, memory=True, profile=False, top=20, report_path=None, verbose=True):
+        self.modules = modules
+        self.memory = memory
+        self.profile = profile
+        self.top = top
+        self.report_path = report_path
+        self.verbose = verbose
+        self.records = []
+        self._profiles = []
+        self._patched = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        self.records = []
+        self._profiles = []
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        wrappers = {}
+        for module_name in self.modules:
+            module = importlib.import_module(module_name)
+            for name, func in vars(module).items():
+                if inspect.isfunction(func) and func.__module__ == module_name and not name.startswith("_"):
+                    wrappers[id(func)] = (func, self._wrap(func))
+
+        # Replace the functions wherever they were imported, e.g. `from src.data_analysis import ...`
+        modules = [module for name, module in list(sys.modules.items())
+                   if module is not None and (name.startswith("src.") or name == "__main__")]
+        for module in modules:
+            for name, obj in list(vars(module).items()):
+                if id(obj) in wrappers and wrappers[id(obj)][0] is obj:
+                    setattr(module, name, wrappers[id(obj)][1])
+                    self._patched.append((module, name, obj))
+        return self
+
+    def __exit__(self, *exc_info):
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched = []
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        if self.report_path is not None:
+            self.write_report(self.report_path)
+        if self.verbose:
+            print(self.format_report())
+
+    def _wrap(self, func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = self._local.__dict__.setdefault("stack", [])
+            frame = {"peak": 0}
+            stack.append(frame)
+
+            tracing = self.memory and tracemalloc.is_tracing()
+            if tracing:
+                start_memory, outer_peak = tracemalloc.get_traced_memory()
+                if len(stack) > 1:
+                    stack[-2]["peak"] = max(stack[-2]["peak"], outer_peak)
+                tracemalloc.reset_peak()
+            profiler = None
+            if self.profile and len(stack) == 1:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Python 3.12+ allows one active profiler per process: a concurrent call is profiled already
+                    profiler = None
+
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+                if profiler is not None:
+                    profiler.disable()
+                stack.pop()
+                peak_mb = None
+                if tracing:
+                    peak = max(tracemalloc.get_traced_memory()[1], frame["peak"])
+                    peak_mb = round((peak - start_memory) / 2 ** 20, 2)
+                    if stack:
+                        stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            rows_in = next((rows for rows in map(_rows, list(args) + list(kwargs.values())) if rows is not None), None)
+            record = {
+                "function": name,
+                "depth": len(stack),
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "peak_traced_mb": peak_mb,
+                "max_rss_mb": _max_rss_mb(),
+                "rows_in": rows_in,
+                "rows_out": _rows(result),
+            }
+            with self._lock:
+                self.records.append(record)
+                if profiler is not None:
+                    self._profiles.append(profiler)
+            return result
+
+        return wrapper
+
+    def summary(self):
+        """
+        Per-function totals: calls, wall and CPU time, the largest peak memory and rows.
+
+        Returns:
+            list: One dict per function, slowest total wall time first.
+        """
+        functions = {}
+        for record in self.records:
+            entry = functions.setdefault(record["function"], {
+                "function": record["function"], "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_traced_mb": None,
+                "max_rss_mb": None, "rows_in": None, "rows_out": None})
+            entry["calls"] += 1
+            entry["wall_s"] = round(entry["wall_s"] + record["wall_s"], 6)
+            entry["cpu_s"] = round(entry["cpu_s"] + record["cpu_s"], 6)
+            for key in ("peak_traced_mb", "max_rss_mb", "rows_in", "rows_out"):
+                if record[key] is not None:
+                    entry[key] = max(entry[key] or 0, record[key])
+        return sorted(functions.values(), key=lambda entry: entry["wall_s"], reverse=True)
+
+    def profile_summary(self):
+        """
+        The hottest functions by cumulative time over all profiled calls (empty without profile=True).
+        """
+        if not self._profiles:
+            return []
+        stats = pstats.Stats(self._profiles[0], stream=io.StringIO())
+        for profiler in self._profiles[1:]:
+            stats.add(profiler)
+        rows = []
+        for (file, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({"function": f"{function} ({os.path.basename(file)}:{line})", "calls": calls,
+                         "tottime_s": round(tottime, 6), "cumtime_s": round(cumtime, 6)})
+        return sorted(rows, key=lambda row: row["cumtime_s"], reverse=True)[:self.top]
+
+    def report(self):
+        """
+        Machine-readable report: the individual calls, the per-function summary and the profile.
+        """
+        return {"calls": self.records, "summary": self.summary(), "profile": self.profile_summary()}
+
+    def format_report(self):
+        """
+        Human-readable summary table (and the hottest profiled functions, if any).
+        """
+        lines = [f"{'function':<60} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'rows in':>10} {'rows out':>10}"]
+        for entry in self.summary():
+            peak = "-" if entry["peak_traced_mb"] is None else f"{entry['peak_traced_mb']:.1f}"
+            rows_in = "-" if entry["rows_in"] is None else entry["rows_in"]
+            rows_out = "-" if entry["rows_out"] is None else entry["rows_out"]
+            lines.append(f"{entry['function']:<60} {entry['calls']:>5} {entry['wall_s']:>9.3f} {entry['cpu_s']:>9.3f} "
+                         f"{peak:>9} {rows_in:>10} {rows_out:>10}")
+        max_rss = _max_rss_mb()
+        if max_rss is not None:
+            lines.append(f"Peak RSS of the process: {max_rss:.1f} MB")
+        profile = self.profile_summary()
+        if profile:
+            lines.append("")
+            lines.append(f"{'profiled function':<80} {'calls':>8} {'tottime s':>10} {'cumtime s':>10}")
+            for row in profile:
+                lines.append(f"{row['function'][-80:]:<80} {row['calls']:>8} {row['tottime_s']:>10.3f} "
+                             f"{row['cumtime_s']:>10.3f}")
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        """
+        Writes <path>.json (the full report) and <path>.txt (the summary table).
+        """
+        with open(f"{path}.json", "w") as f:
+            json.dump(self.report(), f, indent=2)
+        with open(f"{path}.txt", "w") as f:
+            f.write(self.format_report() + "\n")
@@ -0,0 +1,184 @@
+import inspect
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from src.cache_utils import cached, fingerprint
+from src.data_cleaning import DEFAULT_CACHE_DIR
+
+
+@dataclass
+class Stage:
+    """
+    One step of a `Pipeline`.
+
+    Attributes:
+        name (str): Unique stage name.
+        func (callable): Function computing the stage output.
+        inputs (dict): Keyword argument of func -> name of the stage providing it.
+        params (dict): Other keyword arguments of func.
+        source (callable, optional): For stages reading external data: returns a description of
+            that data (e.g. a file manifest) that is part of the stage's cache key.
+        cache (bool): Store the output in the stage cache (default is True).
+        main_thread (bool): Run in the calling thread, e.g. for plotting (default is False).
+        ignore_params (tuple): Parameters that don't change the output (e.g. the number of workers
+            or an extra export), left out of the cache key.
+    """
+    name: str
+    func: object
+    inputs: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    source: object = None
+    cache: bool = True
+    main_thread: bool = False
+    ignore_params: tuple = ()
+
+
+def _function_id(func):
+    """
+    Name and source code of a stage function (just the name when the source isn't available).
+    """
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = None
+    return f"{func.__module__}.{func.__qualname__}", source
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order with a content-addressed on-disk cache.
+
+    The key of a stage is a hash of its function (name and source code), parameters, source
+    description and the keys of its inputs, so changing a parameter or editing a stage function
+    only invalidates that stage and the stages downstream of it. Edits to helpers the stage
+    function calls are not detected: pass their stages to `run(refresh=...)` after such a change.
+    Cached outputs are only loaded when a target or a stage that has to run needs them, and
+    independent stages run concurrently in a thread pool.
+    """
+
+    def __init__(self, stages, cache_dir=os.path.join(DEFAULT_CACHE_DIR, "stages"), workers=4, verbose=True):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            missing = set(stage.inputs.values()) - set(self.stages)
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stages: {sorted(missing)}")
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.verbose = verbose
+        self.last_run = {}
+
+    def _order(self, targets):
+        """
+        The targets and everything they depend on, in dependency order.
+        """
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in the pipeline at stage {name!r}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs.values():
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def keys(self, targets=None):
+        """
+        Cache key of each stage needed for the targets (default is all stages).
+        """
+        keys = {}
+        for name in self._order(targets or list(self.stages)):
+            stage = self.stages[name]
+            source = stage.source() if stage.source is not None else None
+            params = {key: value for key, value in stage.params.items() if key not in stage.ignore_params}
+            keys[name] = fingerprint(name, _function_id(stage.func), params, source,
+                                     {arg: keys[dependency] for arg, dependency in stage.inputs.items()})
+        return keys
+
+    def _is_cached(self, name, key):
+        return (self.stages[name].cache and self.cache_dir is not None
+                and os.path.exists(os.path.join(self.cache_dir, f"{name}-{key[:32]}.pkl")))
+
+    def run(self, targets=None, refresh=()):
+        """
+        Computes the targets (default is all stages), re-running only stages whose cache key changed.
+
+        Args:
+            targets (list, optional): Names of the stages whose outputs are returned.
+            refresh (list or bool, optional): Stages to re-run, with the stages downstream of them,
+                even if they are cached; True re-runs every stage needed for the targets.
+
+        Returns:
+            dict: Stage name -> output for every target.
+        """
+        targets = targets or list(self.stages)
+        order = self._order(targets)
+        keys = self.keys(targets)
+
+        # Decide which stages run and which cached outputs have to be loaded, from the targets back
+        refresh = set(order) if refresh is True else set(refresh or ())
+        for name in order:  # a refreshed output may differ, so the stages using it are refreshed too
+            if refresh & set(self.stages[name].inputs.values()):
+                refresh.add(name)
+        to_run = {name for name in order if name in refresh or not self._is_cached(name, keys[name])}
+        needed = set(targets)
+        for name in reversed(order):
+            if name in to_run and name in needed:
+                needed.update(self.stages[name].inputs.values())
+        self.last_run = {name: ("run" if name in to_run else "cached") if name in needed else "skipped"
+                         for name in order}
+
+        results = {}
+        lock = threading.Lock()
+
+        def execute(name):
+            stage = self.stages[name]
+            compute = lambda: stage.func(**{arg: results[dependency] for arg, dependency in stage.inputs.items()},
+                                         **stage.params)
+            output = cached(self.cache_dir if stage.cache else None, name, keys[name], compute, name in refresh)
+            with lock:
+                results[name] = output
+            return name
+
+        def report(name):
+            # Called from this thread only, so the lines of concurrent stages don't interleave
+            if self.verbose:
+                print(f"[pipeline] {name}: {self.last_run[name]}")
+
+        pending = [name for name in order if name in needed]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            while pending or futures:
+                # Cached outputs can be loaded right away; stages that run wait for their inputs
+                ready = [name for name in pending if name not in to_run
+                         or all(dependency in results for dependency in self.stages[name].inputs.values())]
+                for name in ready:
+                    pending.remove(name)
+                    if self.stages[name].main_thread:
+                        continue
+                    futures[pool.submit(execute, name)] = name
+                # Main-thread stages run here while the pool keeps working
+                for name in ready:
+                    if self.stages[name].main_thread:
+                        report(execute(name))
+                if not futures:
+                    if pending and not ready:
+                        raise RuntimeError(f"Pipeline is stuck with pending stages: {pending}")
+                    continue
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.pop(future)
+                    report(future.result())  # re-raises errors of the stage
+
+        return {name: results[name] for name in targets}
@@ -0,0 +1,178 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Shared-memory blocks attached by this process, kept open while their arrays are in use
+_attached = {}
+_worker_state = {}
+
+
+def share_array(array):
+    """
+    Copies an array into a new named shared-memory block.
+
+    Args:
+        array (np.ndarray): The array to publish.
+
+    Returns:
+        tuple: The SharedMemory block (close and unlink it when done) and a small picklable
+        handle (name, shape, dtype) that other processes pass to `attach_array`.
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach_array(handle):
+    """
+    Read-only view of an array published with `share_array`, without copying it.
+
+    Args:
+        handle (tuple): The handle returned by `share_array`.
+
+    Returns:
+        np.ndarray: A view of the shared-memory block.
+    """
+    name, shape, dtype = handle
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[name].buf)
+    array.flags.writeable = False
+    return array
+
+
+def release_array(block):
+    """
+    Closes and unlinks a block created by `share_array`, including this process's attachment.
+    """
+    attached = _attached.pop(block.name, None)
+    for handle in (attached, block):
+        if handle is not None:
+            try:
+                handle.close()
+            except BufferError:
+                # Arrays still viewing the block keep the mapping alive until they are gone
+                pass
+    block.unlink()
+
+
+class SharedFrame:
+    """
+    The columns of a DataFrame published once in shared memory, for process-pool workers.
+
+    Numeric columns are shared as they are; categorical and string columns as their integer
+    codes, with the (small) categories in the handle. Workers rebuild the DataFrame from the
+    shared buffers with `attach_frame` without copying any column, so the data is in memory
+    once however many workers there are.
+
+    With partition_by, the rows are sorted by that column first so every partition (e.g. one
+    sensor or one subject) is a contiguous slice, see `map_partitions`.
+
+    Use as a context manager, or call close(), to release the shared memory.
+    """
+
+    def __init__(self, df, columns=None, partition_by=None):
+        columns = list(df.columns if columns is None else columns)
+        self.partitions = None
+        if partition_by is not None:
+            codes, values = pd.factorize(df[partition_by], sort=True)
+            order = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            stops = np.cumsum(counts) + np.count_nonzero(codes < 0)
+            self.partitions = {value: (int(stop - count), int(stop))
+                               for value, count, stop in zip(values, counts, stops)}
+            df = df.take(order)
+
+        self._blocks = []
+        self.handle = {"columns": {}, "length": len(df)}
+        for column in columns:
+            series = df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                array, categories = series.array.codes, series.cat.categories
+            elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                array, categories = series.to_numpy(), None
+            else:
+                array, categories = pd.factorize(series)
+            block, array_handle = share_array(array)
+            self._blocks.append(block)
+            self.handle["columns"][column] = (array_handle, None if categories is None else list(categories))
+
+    def close(self):
+        """
+        Releases the shared memory of the published columns.
+        """
+        for block in self._blocks:
+            release_array(block)
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_frame(handle, start=None, stop=None):
+    """
+    Rebuilds (rows start:stop of) a DataFrame published with `SharedFrame`, without copying.
+
+    Args:
+        handle (dict): The handle attribute of the SharedFrame.
+        start (int, optional): First row.
+        stop (int, optional): End row (exclusive).
+
+    Returns:
+        pd.DataFrame: Read-only columns backed by the shared memory.
+    """
+    columns = {}
+    for column, (array_handle, categories) in handle["columns"].items():
+        array = attach_array(array_handle)[start:stop]
+        if categories is not None:
+            array = pd.Categorical.from_codes(array, dtype=pd.CategoricalDtype(categories), validate=False)
+        columns[column] = array
+    return pd.DataFrame(columns, copy=False)
+
+
+def _init_worker(handle):
+    _worker_state["handle"] = handle
+
+
+def _run_partition(func, start, stop, kwargs):
+    return func(attach_frame(_worker_state["handle"], start, stop), **kwargs)
+
+
+def map_partitions(func, shared, workers=None, **kwargs):
+    """
+    Runs an analysis function (e.g. `compute_group_differences` or `welch_t_tests` from
+    `data_analysis`) on every partition of a SharedFrame in a process pool.
+
+    Only the handle of the shared memory is sent to the workers; each partition is a
+    zero-copy slice of the shared columns.
+
+    Args:
+        func (callable): Module-level function taking the partition DataFrame first.
+        shared (SharedFrame): Data published with partition_by.
+        workers (int, optional): Number of processes (default is os.cpu_count()); 1 runs in this process.
+        **kwargs: Other keyword arguments of func.
+
+    Returns:
+        dict: Partition value -> result of func.
+    """
+    if shared.partitions is None:
+        raise ValueError("map_partitions needs a SharedFrame created with partition_by")
+    keys = list(shared.partitions)
+    starts = [shared.partitions[key][0] for key in keys]
+    stops = [shared.partitions[key][1] for key in keys]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(shared.handle)
+        results = [_run_partition(func, start, stop, kwargs) for start, stop in zip(starts, stops)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.handle,)) as pool:
+            results = list(pool.map(_run_partition, [func] * len(keys), starts, stops, [kwargs] * len(keys)))
+    return dict(zip(keys, results))
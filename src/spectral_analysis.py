@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+from src.cache_utils import cached, fingerprint
+from src.data_analysis import compute_group_differences, welch_t_tests
+from src.data_cleaning import DEFAULT_CACHE_DIR
+
+# Frequency bands in Hz, as [low, high)
+FREQUENCY_BANDS = {
+    "delta": (0.5, 4),
+    "theta": (4, 8),
+    "alpha": (8, 13),
+    "beta": (13, 30),
+    "gamma": (30, 100),
+}
+
+# The recordings are sampled at 256 Hz (256 samples per one-second trial)
+SAMPLING_RATE = 256
+
+BAND_COLUMN = "band"
+POWER_COLUMN = "band power"
+
+
+def band_power_array(data, sampling_rate=SAMPLING_RATE, bands=FREQUENCY_BANDS, nperseg=None):
+    """
+    Computes the power of every frequency band for every trial and channel at once.
+
+    The power spectral density of the whole (trials, channels, samples) array is estimated in
+    one batched Welch call along the sample axis and integrated over each band. Missing samples
+    are treated as zeros.
+
+    Args:
+        data (np.ndarray): Signal shaped (trials, channels, samples).
+        sampling_rate (float, optional): Sampling rate in Hz (default is 256).
+        bands (dict, optional): Band name -> (low, high) frequencies in Hz (default is FREQUENCY_BANDS).
+        nperseg (int, optional): Welch segment length (default is the whole trial, 1 Hz resolution at 256 Hz).
+
+    Returns:
+        np.ndarray: float64 band powers shaped (trials, channels, bands), in the order of `bands`.
+    """
+    nperseg = data.shape[-1] if nperseg is None else nperseg
+    frequencies, psd = signal.welch(np.nan_to_num(data), fs=sampling_rate, nperseg=nperseg, axis=-1)
+    resolution = frequencies[1] - frequencies[0]
+
+    # (frequencies, bands) 0/1 matrix, so all bands are integrated with one matrix product
+    band_matrix = np.array([(frequencies >= low) & (frequencies < high) for low, high in bands.values()]).T
+    return (psd @ band_matrix.astype(psd.dtype)).astype(np.float64) * resolution
+
+
+def band_powers(tensor, sampling_rate=SAMPLING_RATE, bands=FREQUENCY_BANDS, nperseg=None, log=False,
+                cache_dir=os.path.join(DEFAULT_CACHE_DIR, "spectral")):
+    """
+    Band power of every trial, channel and frequency band as a long-format DataFrame.
+
+    Results are cached on disk, keyed by the content of the tensor and the parameters, so
+    repeated runs don't recompute the transforms.
+
+    Args:
+        tensor (EEGTensor): The EEG data.
+        sampling_rate (float, optional): Sampling rate in Hz (default is 256).
+        bands (dict, optional): Band name -> (low, high) frequencies in Hz (default is FREQUENCY_BANDS).
+        nperseg (int, optional): Welch segment length (default is the whole trial).
+        log (bool, optional): Return 10*log10 power (dB) instead of power (default is False).
+        cache_dir (str, optional): Cache directory; None disables caching.
+
+    Returns:
+        pd.DataFrame: One row per (trial, sensor, band) with the trial metadata, the band name
+        and its power in the "band power" column.
+    """
+    params = {"sampling_rate": sampling_rate, "bands": bands, "nperseg": nperseg, "log": log}
+    key = fingerprint(tensor, params)
+    return cached(cache_dir, "band_powers", key,
+                  lambda: _band_power_frame(tensor, sampling_rate, bands, nperseg, log))
+
+
+def _band_power_frame(tensor, sampling_rate, bands, nperseg, log):
+    power = band_power_array(tensor.data, sampling_rate, bands, nperseg)
+    if log:
+        with np.errstate(divide="ignore"):
+            power = 10 * np.log10(power)
+
+    n_trials, n_channels, n_bands = power.shape
+    trial_index, channel_index, band_index = np.indices(power.shape).reshape(3, -1)
+    columns = tensor.columns
+    return pd.DataFrame({
+        columns["subject"]: tensor.subjects[trial_index],
+        columns["trial"]: tensor.trial_numbers[trial_index],
+        columns["subject_identifier"]: tensor.groups[trial_index],
+        columns["condition"]: tensor.conditions[trial_index],
+        columns["position"]: tensor.channels[channel_index],
+        BAND_COLUMN: pd.Categorical.from_codes(band_index, categories=list(bands)),
+        POWER_COLUMN: power.reshape(-1),
+    })
+
+
+def band_power_group_differences(power_df, subject_id, position, group1, group2):
+    """
+    `compute_group_differences` for every frequency band.
+
+    Args:
+        power_df (pd.DataFrame): Output of `band_powers`.
+        subject_id (str): Column name for group/category.
+        position (str): Column name for sensor positions.
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+
+    Returns:
+        pd.DataFrame: Mean band power of each group per (band, sensor) and the absolute
+        difference, sorted by difference within each band.
+    """
+    return pd.concat({
+        band: compute_group_differences(band_df, POWER_COLUMN, subject_id, position, group1, group2)
+        for band, band_df in power_df.groupby(BAND_COLUMN, observed=True, sort=False)
+    }, names=[BAND_COLUMN])
+
+
+def band_power_t_tests(power_df, subject_id, position, group1, group2, unknown_regions=()):
+    """
+    `welch_t_tests` of the band power for every frequency band.
+
+    Args:
+        power_df (pd.DataFrame): Output of `band_powers`.
+        subject_id (str): Column name for group/category.
+        position (str): Column name for sensor positions.
+        group1 (str): Label for the first group.
+        group2 (str): Label for the second group.
+        unknown_regions (list, optional): Sensor positions to exclude from the t-tests.
+
+    Returns:
+        pd.DataFrame: Region, t, p, df and effect size per (band, sensor).
+    """
+    return pd.concat({
+        band: welch_t_tests(band_df, POWER_COLUMN, subject_id, position, group1, group2, unknown_regions)
+        for band, band_df in power_df.groupby(BAND_COLUMN, observed=True, sort=False)
+    }, names=[BAND_COLUMN])
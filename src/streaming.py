@@ -0,0 +1,233 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.data_analysis import analyze_responses_by_condition_and_group, compute_group_differences, welch_t_tests
+from src.data_cleaning import EEG_SCHEMA, apply_schema, read_typed_csv
+
+# Default grouping of the accumulated statistics: fine enough to answer every analysis
+DEFAULT_KEYS = ["sensor position", "subject identifier", "matching condition", "sample num"]
+
+
+class MomentAccumulator:
+    """
+    Mergeable count, sum and sum of squares of a value per combination of key columns.
+
+    Accumulators can be updated chunk by chunk and merged with each other in any order, so
+    statistics over data that doesn't fit in memory can be built from bounded pieces. The
+    order in which key combinations were first seen is kept as well, so results can follow
+    the order of appearance like the in-memory analysis functions do.
+    """
+
+    def __init__(self, keys=DEFAULT_KEYS, value="sensor value"):
+        self.keys = list(keys)
+        self.value = value
+        self.stats = pd.DataFrame(
+            {"count": [], "sum": [], "sum_sq": [], "order": []},
+            index=pd.MultiIndex.from_arrays([[] for _ in self.keys], names=self.keys),
+        )
+        self._seen = 0
+
+    def update(self, df):
+        """
+        Adds the rows of a DataFrame (missing values are ignored).
+        """
+        values = df[self.value].astype("float64")
+        frame = pd.DataFrame({key: df[key] for key in self.keys})
+        frame["count"] = values.notna().astype("int64")
+        frame["sum"] = values.fillna(0)
+        frame["sum_sq"] = frame["sum"] * frame["sum"]
+
+        chunk = frame.groupby(self.keys, observed=True, sort=False)[["count", "sum", "sum_sq"]].sum()
+        chunk["order"] = np.arange(self._seen, self._seen + len(chunk))
+        self._seen += len(chunk)
+        self._merge_stats(chunk)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the statistics of another accumulator with the same keys and value.
+        """
+        if other.keys != self.keys or other.value != self.value:
+            raise ValueError("Only accumulators with the same keys and value can be merged")
+        self._merge_stats(other.stats.assign(order=other.stats["order"] + self._seen))
+        self._seen += other._seen
+        return self
+
+    def _merge_stats(self, stats):
+        # Plain (non-categorical) key values, so statistics of different chunks line up
+        stats = stats.reset_index()
+        for key in self.keys:
+            if isinstance(stats[key].dtype, pd.CategoricalDtype):
+                stats[key] = stats[key].astype(stats[key].cat.categories.dtype)
+        stats = stats.set_index(self.keys)
+        if len(self.stats):
+            stats = pd.concat([self.stats, stats])
+            stats = stats.groupby(level=self.keys, sort=False).agg(
+                {"count": "sum", "sum": "sum", "sum_sq": "sum", "order": "min"})
+        self.stats = stats
+
+    def rollup(self, keys):
+        """
+        Combines the statistics over all other keys.
+
+        Args:
+            keys (list): Subset of the accumulator keys to keep.
+
+        Returns:
+            pd.DataFrame: count, mean and var (ddof=1) per combination of the keys, in order of
+            first appearance.
+        """
+        stats = self.stats.groupby(level=list(keys), sort=False).agg(
+            {"count": "sum", "sum": "sum", "sum_sq": "sum", "order": "min"}).sort_values("order")
+        count = stats["count"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = stats["sum"] / count
+            var = (stats["sum_sq"] - stats["sum"] * mean) / (count - 1)
+        return pd.DataFrame({"count": count, "mean": mean.where(count > 0), "var": var.where(count > 1).clip(lower=0)})
+
+
+class _HashIndex:
+    """
+    Set of 64-bit row hashes: a sorted array plus a small unsorted buffer that is merged into
+    it when it grows, so each lookup is a binary search (8 bytes per stored row).
+    """
+
+    def __init__(self):
+        self.sorted = np.empty(0, dtype=np.uint64)
+        self.buffer = np.empty(0, dtype=np.uint64)
+
+    def add_new(self, hashes):
+        """
+        Adds the hashes and returns a mask of those that weren't present (first occurrence only).
+        """
+        new = ~pd.Index(hashes).duplicated(keep="first")
+        if len(self.sorted):
+            positions = np.searchsorted(self.sorted, hashes).clip(max=len(self.sorted) - 1)
+            new &= self.sorted[positions] != hashes
+        if len(self.buffer):
+            new &= ~np.isin(hashes, self.buffer)
+        self.buffer = np.concatenate([self.buffer, hashes[new]])
+        if len(self.buffer) > max(1_000_000, len(self.sorted) // 4):
+            self.sorted = np.union1d(self.sorted, self.buffer)
+            self.buffer = np.empty(0, dtype=np.uint64)
+        return new
+
+
+def iter_recordings(directory_path, schema=None, chunksize=None, workers=None):
+    """
+    Yields the recordings under a directory one file (or chunk of chunksize rows) at a time,
+    with incomplete rows removed. Whole files are read ahead by a small thread pool, but at
+    most a few of them are held in memory at once; chunks are read one after the other.
+
+    Files that can't be read are reported and skipped, like in `csv_combined`. In chunked mode
+    the chunks read before the error have already been yielded; the rest of the file is skipped.
+
+    Args:
+        directory_path (str): Root directory of the recordings.
+        schema (dict, optional): Column dtypes (default is EEG_SCHEMA).
+        chunksize (int, optional): Split files into chunks of this many rows.
+        workers (int, optional): Number of reading threads (default is 4); not with chunksize.
+
+    Yields:
+        pd.DataFrame: The rows of one file or chunk.
+    """
+    schema = EEG_SCHEMA if schema is None else schema
+    csv_files = glob.glob(os.path.join(directory_path, "**", "*.csv"), recursive=True)
+
+    if chunksize is not None:
+        if workers is not None:
+            raise ValueError("workers can't be combined with chunksize: chunks are read sequentially")
+        for file in csv_files:
+            reader = None
+            while True:
+                try:
+                    reader = reader or pd.read_csv(file, chunksize=chunksize)
+                    chunk = next(reader, None)
+                except Exception as e:
+                    print(f"Error reading {file}: {e}")
+                    break
+                if chunk is None:
+                    break
+                # Typed per chunk, so a chunk with missing integers or bad values doesn't fail the whole file
+                yield apply_schema(chunk, schema).dropna()
+        return
+
+    workers = workers or 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Bounded read-ahead: keep at most 2 * workers files in flight
+        futures = [pool.submit(read_typed_csv, file, schema) for file in csv_files[:2 * workers]]
+        for i, file in enumerate(csv_files):
+            future, futures[i] = futures[i], None
+            if i + 2 * workers < len(csv_files):
+                futures.append(pool.submit(read_typed_csv, csv_files[i + 2 * workers], schema))
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"Error reading {file}: {e}")
+                continue
+            if not df.empty:
+                yield df.dropna()
+
+
+def stream_statistics(directory_path, keys=DEFAULT_KEYS, value="sensor value", deduplicate=True, schema=None,
+                      chunksize=None, workers=None):
+    """
+    Accumulates per-key statistics of all recordings under a directory without ever holding
+    the whole dataset in memory.
+
+    With deduplicate=True rows that are exact duplicates of earlier rows are skipped, like the
+    drop_duplicates of `csv_combined`; this keeps an 8-byte hash per distinct row in memory.
+
+    Args:
+        directory_path (str): Root directory of the recordings.
+        keys (list, optional): Columns to group by (default is DEFAULT_KEYS).
+        value (str, optional): Column with the numerical values (default is "sensor value").
+        deduplicate (bool, optional): Skip duplicate rows (default is True).
+        schema (dict, optional): Column dtypes (default is EEG_SCHEMA).
+        chunksize (int, optional): Read files in chunks of this many rows.
+        workers (int, optional): Number of reading threads; not with chunksize.
+
+    Returns:
+        MomentAccumulator: The accumulated statistics.
+    """
+    accumulator = MomentAccumulator(keys, value)
+    seen = _HashIndex() if deduplicate else None
+    for df in iter_recordings(directory_path, schema, chunksize, workers):
+        if seen is not None:
+            df = df[seen.add_new(pd.util.hash_pandas_object(df, index=False).to_numpy())]
+        accumulator.update(df)
+    return accumulator
+
+
+def group_differences_from_stats(accumulator, position, subject_id, group1, group2):
+    """
+    `compute_group_differences` from accumulated statistics.
+
+    Returns:
+        DataFrame: Mean values of each group per sensor, their absolute difference, sorted by difference.
+    """
+    return compute_group_differences(accumulator, accumulator.value, subject_id, position, group1, group2)
+
+
+def condition_stats_from_stats(accumulator, condition, subject_identifier):
+    """
+    `analyze_responses_by_condition_and_group` from accumulated statistics.
+
+    Returns:
+        pd.DataFrame: The mean and standard deviation for each condition and group.
+    """
+    return analyze_responses_by_condition_and_group(accumulator, accumulator.value, condition, subject_identifier)
+
+
+def t_tests_from_stats(accumulator, position, subject_id, group1, group2, unknown_regions=()):
+    """
+    `welch_t_tests` from accumulated statistics.
+
+    Returns:
+        DataFrame: Region, t, p, df and effect size per sensor, in order of appearance.
+    """
+    return welch_t_tests(accumulator, accumulator.value, subject_id, position, group1, group2, unknown_regions)
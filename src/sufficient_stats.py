@@ -0,0 +1,409 @@
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.data_cleaning import (DEFAULT_CACHE_DIR, EEG_SCHEMA, dedup_by_hash, read_typed_csv, row_hashes,
+                               source_manifest)
+from src.streaming import DEFAULT_KEYS
+
+STATS_COLUMNS = ["count", "mean", "m2"]
+# Bumped when the layout of the store on disk changes
+STORE_VERSION = 2
+
+
+def recording_statistics(df, keys, value):
+    """
+    Count, mean and sum of squared deviations (M2) of value per combination of keys.
+
+    Args:
+        df (pd.DataFrame): Rows of one recording.
+        keys (list): Columns to group by.
+        value (str): Column with the numerical values; missing values are ignored.
+
+    Returns:
+        pd.DataFrame: count, mean and m2 columns, indexed by the keys in order of appearance.
+    """
+    frame = pd.DataFrame({key: _plain(df[key]) for key in keys})
+    frame[value] = df[value].astype("float64")
+    grouped = frame.dropna(subset=[value]).groupby(keys, sort=False)[value]
+    stats = grouped.agg(["count", "mean", "var"])
+    stats["m2"] = stats.pop("var").fillna(0) * (stats["count"] - 1)
+    stats["count"] = stats["count"].astype("float64")
+    return stats
+
+
+def _plain(column):
+    # Categorical keys as their plain values, so statistics of different recordings line up
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.astype(column.cat.categories.dtype)
+    return column
+
+
+def merge_statistics(a, b, sign=1):
+    """
+    Combines two sets of per-key statistics with Chan et al.'s parallel update (sign=1), or
+    takes b back out of a (sign=-1).
+
+    Args:
+        a (pd.DataFrame): count, mean and m2 per key.
+        b (pd.DataFrame): count, mean and m2 per key (for sign=-1, a subset of what a contains).
+        sign (int, optional): 1 to add b, -1 to remove it (default is 1).
+
+    Returns:
+        pd.DataFrame: The combined statistics in the order of a followed by new keys of b;
+        keys left without values are dropped.
+    """
+    index = a.index.append(b.index[~b.index.isin(a.index)]) if sign > 0 else a.index
+    a = a.reindex(index, fill_value=0)
+    b = b.reindex(index, fill_value=0)
+    n_a, mean_a, m2_a = (a[column].to_numpy() for column in STATS_COLUMNS)
+    n_b, mean_b, m2_b = (b[column].to_numpy() for column in STATS_COLUMNS)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if sign > 0:
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            mean = np.where(n > 0, mean_a + delta * n_b / n, 0)
+            m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+        else:
+            # Inverse of the update: the remaining part is what merged with b gives a
+            n = n_a - n_b
+            mean = np.where(n > 0, (n_a * mean_a - n_b * mean_b) / n, 0)
+            delta = mean_b - mean
+            m2 = m2_a - m2_b - delta ** 2 * n * n_b / n_a
+
+    merged = pd.DataFrame({"count": n, "mean": mean, "m2": np.maximum(np.nan_to_num(m2), 0)}, index=index)
+    return merged[merged["count"] > 0]
+
+
+class _RowIndex:
+    """
+    Number of recordings holding each distinct row hash. The hashes are kept in a few sorted
+    runs of decreasing size: the new hashes of a recording become a run of their own, merged
+    with the previous run once they are at least half as many, so a lookup is one binary
+    search per run and adding a recording never re-sorts the whole store.
+    """
+
+    def __init__(self, hashes=None, counts=None):
+        self.runs = []
+        if hashes is not None and len(hashes):
+            self.runs.append((np.asarray(hashes, dtype=np.uint64), np.asarray(counts, dtype=np.int64)))
+
+    def _find(self, values):
+        # Per run: the position of every value and whether it is held there
+        for hashes, counts in self.runs:
+            positions = np.searchsorted(hashes, values).clip(max=len(hashes) - 1)
+            yield counts, positions, (hashes[positions] == values) & (counts[positions] > 0)
+
+    def contains(self, values):
+        """
+        Returns a mask of the values held by at least one recording.
+        """
+        held = np.zeros(len(values), dtype=bool)
+        for _, _, found in self._find(values):
+            held |= found
+        return held
+
+    def add(self, values):
+        """
+        Counts the distinct hashes of one more recording; returns a mask of those that weren't held yet.
+        """
+        held = np.zeros(len(values), dtype=bool)
+        for counts, positions, found in self._find(values):
+            counts[positions[found]] += 1
+            held |= found
+        if not held.all():
+            self.runs.append((np.sort(values[~held]), np.ones(int((~held).sum()), dtype=np.int64)))
+            while len(self.runs) > 1 and 2 * len(self.runs[-1][0]) >= len(self.runs[-2][0]):
+                self._merge(2)
+        return ~held
+
+    def remove(self, values):
+        """
+        Takes the distinct hashes of a recording back out (hashes left without a recording are
+        dropped when their run is next merged).
+        """
+        for counts, positions, found in self._find(values):
+            counts[positions[found]] -= 1
+
+    def _merge(self, n_runs):
+        runs, self.runs = self.runs[-n_runs:], self.runs[:-n_runs]
+        hashes = np.concatenate([hashes for hashes, _ in runs])
+        counts = np.concatenate([counts for _, counts in runs])
+        order = np.argsort(hashes, kind="stable")
+        held = counts[order] > 0
+        if held.any():
+            self.runs.append((hashes[order][held], counts[order][held]))
+
+    def arrays(self):
+        """
+        Merges the runs and returns the sorted hashes and their counts.
+        """
+        if len(self.runs) > 1 or (self.runs and not (self.runs[0][1] > 0).all()):
+            self._merge(len(self.runs))
+        if not self.runs:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        return self.runs[0]
+
+
+def _write_replace(path, write):
+    # Writes through a temporary file, so a crash never leaves a half-written file behind
+    with open(path + ".tmp", "wb") as f:
+        write(f)
+    os.replace(path + ".tmp", path)
+
+
+class SufficientStatsStore:
+    """
+    Persistent per-(sensor, group, condition, sample) count, mean and M2 of the sensor values,
+    updated incrementally as recordings are added or removed.
+
+    Like `csv_combined`, the store counts every distinct complete row once, even when several
+    recordings contain it. Each recording keeps the hashes of its rows and the keys and values
+    of the rows it contributes, so it can be taken back out exactly: rows that another recording
+    also contains are handed over to it. Adding or removing a recording only touches the
+    recordings it shares rows with. The store can be passed in place of the data to
+    `compute_group_differences`, `analyze_responses_by_condition_and_group` and `welch_t_tests`.
+    """
+
+    def __init__(self, store_dir=os.path.join(DEFAULT_CACHE_DIR, "stats"), keys=DEFAULT_KEYS,
+                 value="sensor value"):
+        self.store_dir = store_dir
+        self.keys = list(keys)
+        self.value = value
+        self._reset()
+        # Recording id -> {"part": file name, "source": [size, mtime] or None}
+        self.index = {}
+        self._parts = {}
+        # Part files replaced since the last save, deleted once the new index is written
+        self._stale_parts = []
+        self._load()
+
+    def _reset(self):
+        self.totals = pd.DataFrame({column: [] for column in STATS_COLUMNS},
+                                   index=pd.MultiIndex.from_arrays([[] for _ in self.keys], names=self.keys))
+        # Hashes of the distinct rows in the store and the number of recordings holding each
+        self.row_index = _RowIndex()
+
+    def _index_path(self):
+        return os.path.join(self.store_dir, "index.json")
+
+    def _load(self):
+        if self.store_dir is None or not os.path.exists(self._index_path()):
+            return
+        with open(self._index_path()) as f:
+            index = json.load(f)
+        if index["keys"] != self.keys or index["value"] != self.value:
+            raise ValueError(f"The store in {self.store_dir} holds statistics of {index['value']!r} "
+                             f"by {index['keys']}, not of {self.value!r} by {self.keys}")
+        if index.get("version") != STORE_VERSION:
+            print(f"The store in {self.store_dir} has an older format; all recordings will be read again")
+            return
+        self.index = index["recordings"]
+        self.totals = pd.read_pickle(os.path.join(self.store_dir, "totals.pkl"))
+        with np.load(os.path.join(self.store_dir, "rows.npz")) as rows:
+            self.row_index = _RowIndex(rows["hashes"], rows["counts"])
+
+    def save(self):
+        """
+        Writes the totals, the row hashes and the list of recordings (the per-recording parts
+        are written as they change), then deletes the part files that were replaced.
+        """
+        if self.store_dir is None:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        _write_replace(os.path.join(self.store_dir, "totals.pkl"), lambda f: pd.to_pickle(self.totals, f))
+        _write_replace(os.path.join(self.store_dir, "rows.npz"),
+                       lambda f: np.savez(f, **dict(zip(["hashes", "counts"], self.row_index.arrays()))))
+        _write_replace(self._index_path(), lambda f: f.write(json.dumps(
+            {"version": STORE_VERSION, "keys": self.keys, "value": self.value, "recordings": self.index}).encode()))
+        for part_file in self._stale_parts:
+            path = os.path.join(self.store_dir, "parts", part_file)
+            if os.path.exists(path):
+                os.remove(path)
+        self._stale_parts = []
+
+    @property
+    def recordings(self):
+        return sorted(self.index)
+
+    def _read_part(self, recording_id):
+        # The hashes of a recording's rows and the rows it contributes, or None if the file is gone
+        if recording_id in self._parts:
+            return self._parts[recording_id]
+        path = os.path.join(self.store_dir or "", "parts", self.index[recording_id]["part"] or "")
+        if self.store_dir is None or not os.path.isfile(path):
+            return None
+        return pd.read_pickle(path)
+
+    def _write_part(self, recording_id, part):
+        # Written under a new name, so the saved index keeps pointing to a complete part
+        self._drop_part(recording_id)
+        self.index[recording_id]["part"] = uuid.uuid4().hex + ".pkl"
+        if self.store_dir is None:
+            self._parts[recording_id] = part
+            return
+        os.makedirs(os.path.join(self.store_dir, "parts"), exist_ok=True)
+        pd.to_pickle(part, os.path.join(self.store_dir, "parts", self.index[recording_id]["part"]))
+
+    def _drop_part(self, recording_id):
+        self._parts.pop(recording_id, None)
+        if self.index[recording_id]["part"] is not None:
+            self._stale_parts.append(self.index[recording_id]["part"])
+
+    def _add_rows(self, rows, sign=1):
+        if len(rows):
+            self.totals = merge_statistics(self.totals, recording_statistics(rows, self.keys, self.value), sign)
+
+    def add_recording(self, recording_id, df, source=None):
+        """
+        Adds the statistics of one recording (replacing an earlier version with the same id).
+        Incomplete rows and rows already in the store are left out.
+
+        Args:
+            recording_id (str): Unique name of the recording, e.g. its file path.
+            df (pd.DataFrame): The rows of the recording.
+            source (list, optional): Description of the source file, used by `sync_directory`.
+        """
+        if recording_id in self.index:
+            self.remove_recording(recording_id)
+        df = df.dropna()
+        hashes = row_hashes(df)
+        distinct = dedup_by_hash(hashes)
+        df, hashes = df[distinct], hashes[distinct]
+        owned = self.row_index.add(hashes)
+        rows = df.loc[owned, self.keys + [self.value]].set_axis(pd.Index(hashes[owned]), axis=0)
+
+        self._add_rows(rows)
+        self.index[recording_id] = {"part": None, "source": source}
+        self._write_part(recording_id, {"hashes": hashes, "rows": rows})
+
+    def remove_recording(self, recording_id):
+        """
+        Takes the statistics of a recording back out of the totals. If its part file is
+        missing, the totals are rebuilt from the other recordings instead.
+
+        Args:
+            recording_id (str): Name the recording was added under.
+        """
+        part = self._read_part(recording_id)
+        self._drop_part(recording_id)
+        del self.index[recording_id]
+        if part is None:
+            print(f"Statistics of {recording_id} are missing; rebuilding the totals from the other recordings")
+            self._rebuild()
+            return
+
+        self._add_rows(part["rows"], sign=-1)
+        self.row_index.remove(part["hashes"])
+        # Rows that other recordings also contain are now counted with one of them
+        shared = part["rows"][self.row_index.contains(part["rows"].index.to_numpy())]
+        for other in self.recordings:
+            if shared.empty:
+                break
+            other_part = self._read_part(other)
+            if other_part is None:
+                print(f"Statistics of {other} are missing; rebuilding the totals from the other recordings")
+                self._rebuild()
+                return
+            taken = np.isin(shared.index.to_numpy(), other_part["hashes"])
+            if taken.any():
+                self._add_rows(shared[taken])
+                self._write_part(other, {"hashes": other_part["hashes"],
+                                         "rows": pd.concat([other_part["rows"], shared[taken]])})
+                shared = shared[~taken]
+
+    def _rebuild(self):
+        """
+        Recomputes the totals and row counts from the stored parts. Recordings whose part is
+        missing, or that share rows only stored with such a recording, are dropped so that the
+        next `sync_directory` reads them again.
+        """
+        parts = {}
+        for recording_id in self.recordings:
+            part = self._read_part(recording_id)
+            if part is None:
+                self._drop_part(recording_id)
+                del self.index[recording_id]
+            else:
+                parts[recording_id] = part
+        pool = pd.concat([part["rows"] for part in parts.values()]) if parts else pd.DataFrame()
+        pool = pool[~pool.index.duplicated()]
+
+        self._reset()
+        for recording_id, part in parts.items():
+            if not np.isin(part["hashes"], pool.index.to_numpy()).all():
+                print(f"Statistics of {recording_id} are incomplete; it will be read again")
+                self._drop_part(recording_id)
+                del self.index[recording_id]
+                continue
+            rows = pool.loc[part["hashes"][self.row_index.add(part["hashes"])]]
+            self._add_rows(rows)
+            self._write_part(recording_id, {"hashes": part["hashes"], "rows": rows})
+
+    def sync_directory(self, directory_path, schema=None):
+        """
+        Brings the store up to date with the CSV files under a directory: new and modified files
+        are (re-)added, deleted files are removed, unchanged files are not read. Files that can't
+        be read are reported and skipped (a previous version stays in the store). Saves the store.
+
+        Args:
+            directory_path (str): Root directory of the recordings.
+            schema (dict, optional): Column dtypes (default is EEG_SCHEMA).
+
+        Returns:
+            dict: Lists of the "added", "updated", "removed" and "skipped" recordings.
+        """
+        schema = EEG_SCHEMA if schema is None else schema
+        manifest = {path: [size, mtime] for path, size, mtime in source_manifest(directory_path)}
+        changes = {"added": [], "updated": [], "removed": [], "skipped": []}
+
+        for recording_id in [r for r in self.recordings if r not in manifest]:
+            self.remove_recording(recording_id)
+            changes["removed"].append(recording_id)
+        for recording_id, source in manifest.items():
+            previous = self.index.get(recording_id)
+            if previous is not None and previous["source"] == source:
+                continue
+            file = os.path.join(directory_path, recording_id)
+            try:
+                df = read_typed_csv(file, schema)
+            except Exception as e:
+                print(f"Error reading {file}: {e}")
+                changes["skipped"].append(recording_id)
+                continue
+            self.add_recording(recording_id, df, source)
+            changes["updated" if previous is not None else "added"].append(recording_id)
+
+        self.save()
+        print(f"Statistics store: {len(changes['added'])} added, {len(changes['updated'])} updated, "
+              f"{len(changes['removed'])} removed, {len(changes['skipped'])} skipped, "
+              f"{len(self.index)} recordings")
+        return changes
+
+    def rollup(self, keys):
+        """
+        Combines the statistics over all other keys.
+
+        Args:
+            keys (list): Subset of the store keys to keep.
+
+        Returns:
+            pd.DataFrame: count, mean and var (ddof=1) per combination of the keys, in order of
+            first appearance.
+        """
+        totals = self.totals
+        levels = list(keys)
+        count = totals["count"].groupby(level=levels, sort=False).sum()
+        weighted = (totals["count"] * totals["mean"]).groupby(level=levels, sort=False)
+        mean = weighted.sum() / count
+        # Spread of the key means around the combined mean, added to the within-key M2
+        combined_mean = weighted.transform("sum") / totals["count"].groupby(level=levels, sort=False).transform("sum")
+        m2 = (totals["m2"] + totals["count"] * (totals["mean"] - combined_mean) ** 2).groupby(
+            level=levels, sort=False).sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (m2 / (count - 1)).where(count > 1)
+        return pd.DataFrame({"count": count, "mean": mean, "var": var})
@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# The 64 sensor positions of the Kaggle Alcoholics recordings, in channel order
+SENSOR_NAMES = [
+    "FP1", "FP2", "F7", "F8", "AF1", "AF2", "FZ", "F4", "F3", "FC6", "FC5", "FC2", "FC1", "T8", "T7", "CZ",
+    "C3", "C4", "CP5", "CP6", "CP1", "CP2", "P3", "P4", "PZ", "P8", "P7", "PO2", "PO1", "O2", "O1", "X",
+    "AF7", "AF8", "F5", "F6", "FT7", "FT8", "FPZ", "FC4", "FC3", "C6", "C5", "F2", "F1", "TP8", "TP7", "AFZ",
+    "CP3", "CP4", "P5", "P6", "C1", "C2", "PO7", "PO8", "FCZ", "POZ", "OZ", "P2", "P1", "CPZ", "nd", "Y",
+]
+
+CONDITIONS = ["S1 obj", "S2 match", "S2 nomatch,"]
+
+SAMPLING_RATE = 256
+
+
+def synthetic_trial(name, group, trial, condition, rng, n_channels=64, n_samples=256, group_effect=1.5, noise=5.0):
+    """
+    One synthetic recording (trial) in the long format of the Kaggle CSV files.
+
+    The signal of every channel is a 10 Hz alpha rhythm with a random phase, an evoked
+    response around 300 ms whose size depends on the condition, a per-channel offset and
+    Gaussian noise. Frontal channels of the alcoholic group ('a') are shifted by group_effect.
+
+    Args:
+        name (str): Subject name, e.g. "co2a0000364".
+        group (str): 'a' (alcoholic) or 'c' (control).
+        trial (int): Trial number.
+        condition (str): Matching condition.
+        rng (np.random.Generator): Random generator.
+        n_channels (int, optional): Number of channels, at most 64 (default is 64).
+        n_samples (int, optional): Samples per channel (default is 256, one second).
+        group_effect (float, optional): Shift of the alcoholic group's frontal channels in µV (default is 1.5).
+        noise (float, optional): Standard deviation of the noise in µV (default is 5.0).
+
+    Returns:
+        pd.DataFrame: One row per (channel, sample) with the columns of the Kaggle files.
+    """
+    sensors = np.array(SENSOR_NAMES[:n_channels], dtype=object)
+    time = np.arange(n_samples) / SAMPLING_RATE
+
+    phase = rng.uniform(0, 2 * np.pi, size=(n_channels, 1))
+    alpha = rng.uniform(2, 6, size=(n_channels, 1)) * np.sin(2 * np.pi * 10 * time + phase)
+    evoked_size = 4.0 * (CONDITIONS.index(condition) + 1 if condition in CONDITIONS else 1)
+    evoked = evoked_size * np.exp(-((time - 0.3) ** 2) / (2 * 0.05 ** 2))
+    offset = rng.normal(0, 2, size=(n_channels, 1))
+    signal = alpha + evoked + offset + rng.normal(0, noise, size=(n_channels, n_samples))
+    if group == "a":
+        frontal = np.array([sensor.startswith(("F", "AF")) for sensor in sensors])
+        signal[frontal] += group_effect
+
+    channels = np.repeat(np.arange(n_channels), n_samples)
+    return pd.DataFrame({
+        "trial number": trial,
+        "sensor position": sensors[channels],
+        "sample num": np.tile(np.arange(n_samples), n_channels),
+        "sensor value": signal.reshape(-1).round(3),
+        "subject identifier": group,
+        "matching condition": condition,
+        "channel": channels,
+        "name": name,
+        "time": np.tile(time, n_channels),
+    })
+
+
+def _write_trial(path, seed, args, kwargs):
+    synthetic_trial(*args, rng=np.random.default_rng(seed), **kwargs).to_csv(path)
+    return path
+
+
+def generate_dataset(directory_path, n_alcoholic=10, n_control=10, n_trials=10, n_channels=64, n_samples=256,
+                     group_effect=1.5, noise=5.0, seed=0, workers=None):
+    """
+    Writes a synthetic dataset in the directory layout of the Kaggle Alcoholics data: one CSV
+    per trial, alternating between SMNI_CMI_TRAIN and SMNI_CMI_TEST, readable by `csv_combined`.
+
+    Args:
+        directory_path (str): Output directory (created if missing).
+        n_alcoholic (int, optional): Number of alcoholic subjects (default is 10).
+        n_control (int, optional): Number of control subjects (default is 10).
+        n_trials (int, optional): Trials per subject, cycling through the conditions (default is 10).
+        n_channels (int, optional): Number of channels, at most 64 (default is 64).
+        n_samples (int, optional): Samples per channel (default is 256).
+        group_effect (float, optional): Shift of the alcoholic group's frontal channels (default is 1.5).
+        noise (float, optional): Standard deviation of the noise (default is 5.0).
+        seed (int, optional): Seed; every file gets its own derived seed (default is 0).
+        workers (int, optional): Number of writing processes; 1 writes in the calling process.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    if not 0 < n_channels <= len(SENSOR_NAMES):
+        raise ValueError(f"n_channels must be between 1 and {len(SENSOR_NAMES)}, got {n_channels}")
+    for folder in ("SMNI_CMI_TRAIN", "SMNI_CMI_TEST"):
+        os.makedirs(os.path.join(directory_path, folder), exist_ok=True)
+
+    subjects = [(f"co2a{364 + i:07d}", "a") for i in range(n_alcoholic)]
+    subjects += [(f"co2c{337 + i:07d}", "c") for i in range(n_control)]
+    kwargs = {"n_channels": n_channels, "n_samples": n_samples, "group_effect": group_effect, "noise": noise}
+    tasks = []
+    for name, group in subjects:
+        for trial in range(n_trials):
+            folder = "SMNI_CMI_TRAIN" if len(tasks) % 2 == 0 else "SMNI_CMI_TEST"
+            path = os.path.join(directory_path, folder, f"Data{len(tasks) // 2 + 1}.csv")
+            tasks.append((path, (name, group, trial, CONDITIONS[trial % len(CONDITIONS)])))
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+
+    workers = workers or os.cpu_count() or 1
+    paths = [path for path, _ in tasks]
+    all_args = [args for _, args in tasks]
+    if workers == 1:
+        return [_write_trial(path, file_seed, args, kwargs) for path, file_seed, args in zip(paths, seeds, all_args)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_trial, paths, seeds, all_args, [kwargs] * len(tasks), chunksize=8))
@@ -0,0 +1,298 @@
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.data_analysis import region_lookup
+from src.eeg_dataset import as_dataframe
+
+# Rows of the 10-10 system from front to back: (y of the midline electrode, angle of the row's
+# electrode on the head outline in degrees from the front, number of that electrode counted per
+# side). Rows sharing a line (FC/FT, C/T, CP/TP) only differ by how far out their electrodes are.
+_ROWS = {
+    "FP": (0.8, 18, 1),
+    "AF": (0.6, 36, 4),
+    "F": (0.4, 54, 4),
+    "FC": (0.2, 72, 4),
+    "FT": (0.2, 72, 4),
+    "C": (0.0, 90, 4),
+    "T": (0.0, 90, 4),
+    "CP": (-0.2, 108, 4),
+    "TP": (-0.2, 108, 4),
+    "P": (-0.4, 126, 4),
+    "PO": (-0.6, 144, 4),
+    "O": (-0.8, 162, 1),
+}
+
+_SENSOR_NAME = re.compile(r"^(FP|AF|FC|FT|CP|TP|PO|F|C|T|P|O)(Z|\d+)$")
+
+# Radius of the head outline: the FPZ - T7 - OZ circle of the 10-10 system
+HEAD_RADIUS = 0.8
+
+
+def sensor_position(sensor_name):
+    """
+    2D position of a 10-10 electrode on the scalp seen from above (nose up, left hemisphere left),
+    derived from its name: the letters give the row, odd numbers are left, even numbers right,
+    larger numbers further out and Z on the midline.
+
+    Args:
+        sensor_name (str): Name of the sensor, e.g. "FP1", "CZ" or "PO8".
+
+    Returns:
+        tuple: (x, y), or None for names that aren't electrodes (e.g. "X", "Y", "nd").
+    """
+    match = _SENSOR_NAME.match(sensor_name.upper()) if isinstance(sensor_name, str) else None
+    if match is None:
+        return None
+    row, number = match.groups()
+    y_midline, angle, outer = _ROWS[row]
+    if number == "Z":
+        return 0.0, y_midline
+    number = int(number)
+    # Electrodes are evenly spaced between the midline and the one on the head outline
+    fraction = ((number + 1) // 2) / outer
+    x_outer = HEAD_RADIUS * np.sin(np.radians(angle))
+    y_outer = HEAD_RADIUS * np.cos(np.radians(angle))
+    x = float(fraction * x_outer)
+    return (-x if number % 2 else x), float(y_midline + fraction * (y_outer - y_midline))
+
+
+def sensor_positions(sensor_names):
+    """
+    Positions and brain regions (from `region_mapping`) of the sensors that are electrodes.
+
+    Args:
+        sensor_names (list): Sensor names; names without a position are left out.
+
+    Returns:
+        pd.DataFrame: Indexed by sensor, with x, y and region columns.
+    """
+    names = [name for name in dict.fromkeys(sensor_names) if sensor_position(name) is not None]
+    xy = np.array([sensor_position(name) for name in names], dtype=float).reshape(-1, 2)
+    return pd.DataFrame({"x": xy[:, 0], "y": xy[:, 1], "region": region_lookup(np.array(names, dtype=object))},
+                        index=pd.Index(names, name="sensor"))
+
+
+@lru_cache(maxsize=16)
+def interpolation_weights(sensors, resolution=64, power=2.0):
+    """
+    Inverse-distance weights from the sensors to the pixels of a square grid over the head.
+
+    Every pixel inside the head outline is a weighted mean of all sensors, so interpolating
+    any number of frames is one matrix product: weights @ values. The result is cached per
+    sensor layout and resolution, and read-only for that reason.
+
+    Args:
+        sensors (tuple): Sensor names (the row order of the values to interpolate).
+        resolution (int, optional): Pixels per side of the grid (default is 64).
+        power (float, optional): Power of the inverse distance (default is 2.0).
+
+    Returns:
+        tuple: (weights of shape (pixels inside the head, sensors), boolean (resolution, resolution)
+            mask of those pixels, grid extent (x0, x1, y0, y1)).
+    """
+    positions = sensor_positions(sensors)
+    if len(positions) != len(sensors):
+        missing = [sensor for sensor in sensors if sensor not in positions.index]
+        raise ValueError(f"No scalp position for sensors: {missing}")
+    extent = 1.1 * HEAD_RADIUS
+    axis = np.linspace(-extent, extent, resolution)
+    grid_x, grid_y = np.meshgrid(axis, axis[::-1])  # row 0 is the front of the head
+    inside = grid_x ** 2 + grid_y ** 2 <= extent ** 2
+    pixels = np.column_stack([grid_x[inside], grid_y[inside]])
+
+    distances = np.linalg.norm(pixels[:, None, :] - positions[["x", "y"]].to_numpy()[None, :, :], axis=2)
+    weights = 1.0 / np.maximum(distances, 1e-9) ** power
+    weights /= weights.sum(axis=1, keepdims=True)
+    weights.setflags(write=False)
+    inside.setflags(write=False)
+    return weights, inside, (-extent, extent, -extent, extent)
+
+
+def group_difference_frames(combined_df, value, subject_identifier, position, time, group1="a", group2="c"):
+    """
+    Mean of group1 minus mean of group2 per sensor and time point, for the sensors that have
+    a scalp position.
+
+    Args:
+        combined_df (pd.DataFrame): The dataset (or EEGDataset).
+        value (str): Column name for numerical values.
+        subject_identifier (str): Column name for the group.
+        position (str): Column name for the sensor position.
+        time (str): Column name for the time points.
+        group1 (str, optional): Label of the first group (default is 'a', alcoholic).
+        group2 (str, optional): Label of the second group (default is 'c', control).
+
+    Returns:
+        pd.DataFrame: Sensors as rows, time points as columns.
+    """
+    combined_df = as_dataframe(combined_df)
+    means = combined_df.groupby([position, subject_identifier, time], observed=True)[value].mean()
+    differences = means.xs(group1, level=subject_identifier) - means.xs(group2, level=subject_identifier)
+    differences = differences.unstack(time)
+    sensors = sensor_positions(differences.index).index
+    return differences.loc[sensors].sort_index(axis=1)
+
+
+def topographic_frames(differences, resolution=64, power=2.0):
+    """
+    Interpolates sensor values onto the scalp grid, all time points at once.
+
+    Args:
+        differences (pd.DataFrame): Sensors as rows, time points as columns (see `group_difference_frames`).
+        resolution (int, optional): Pixels per side (default is 64).
+        power (float, optional): Power of the inverse-distance weighting (default is 2.0).
+
+    Returns:
+        np.ndarray: (time points, resolution, resolution) images, NaN outside the head.
+    """
+    weights, inside, _ = interpolation_weights(tuple(differences.index), resolution, power)
+    values = np.nan_to_num(differences.to_numpy(dtype=float))
+    frames = np.full((values.shape[1], resolution, resolution), np.nan)
+    frames[:, inside] = (weights @ values).T
+    return frames
+
+
+def _draw_head(ax, positions, extent):
+    import matplotlib.pyplot as plt
+
+    ax.add_patch(plt.Circle((0, 0), extent, fill=False, color="black", linewidth=1.5))
+    ax.plot([-0.08, 0, 0.08], [extent, extent + 0.1, extent], color="black", linewidth=1.5)  # nose
+    for region, sensors in positions.groupby("region", sort=False):
+        ax.scatter(sensors["x"], sensors["y"], s=8, label=region)
+    ax.set_xlim(-extent - 0.15, extent + 0.15)
+    ax.set_ylim(-extent - 0.15, extent + 0.2)
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+
+def _color_limit(values):
+    # Symmetric color range of the maps; 1.0 when there is no value (e.g. all sensors missing)
+    finite = np.abs(values[np.isfinite(values)])
+    return float(finite.max()) if finite.size and finite.max() > 0 else 1.0
+
+
+def plot_topography(differences, time=None, resolution=64, title="Alcoholic - Control Difference",
+                    save_path=None):
+    """
+    Scalp map of the group difference at one time point, or averaged over all time points.
+
+    Args:
+        differences (pd.DataFrame): Sensors as rows, time points as columns.
+        time (float, optional): Time point to show (default is the mean over all of them).
+        resolution (int, optional): Pixels per side (default is 64).
+        title (str, optional): Title of the plot.
+        save_path (str, optional): Write the figure to this file instead of showing it.
+    """
+    import matplotlib.pyplot as plt
+
+    from src.data_visualization import finish_figure
+
+    values = differences.mean(axis=1) if time is None else differences[time]
+    frame = topographic_frames(values.to_frame(), resolution)[0]
+    _, _, extent = interpolation_weights(tuple(differences.index), resolution, 2.0)
+    limit = _color_limit(frame)
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    image = ax.imshow(frame, extent=extent, cmap="RdBu_r", vmin=-limit, vmax=limit)
+    _draw_head(ax, sensor_positions(differences.index), extent[1])
+    fig.colorbar(image, ax=ax, shrink=0.7, label="µV")
+    ax.set_title(title if time is None else f"{title} at {time:.3f} s")
+    ax.legend(loc="upper center", bbox_to_anchor=(0.5, 0.0), ncol=3, fontsize=7, frameon=False)
+    finish_figure(fig, save_path)
+
+
+def animate_topography(differences, save_path, resolution=64, step=1, fps=20,
+                       title="Alcoholic - Control Difference"):
+    """
+    Writes an animation of the scalp map over the time points of the trial.
+
+    All frames are interpolated up front with one matrix product. The figure (head,
+    electrodes, colorbar) is drawn once and reduced to a palette; the map colors are another
+    fixed part of the palette, so a frame is the background's palette indices with the map
+    area replaced by colormap indices, and no frame is drawn or color-quantized on its own.
+    GIFs are written with Pillow, other formats (e.g. .mp4) with the ffmpeg writer of
+    matplotlib, which needs ffmpeg on the PATH.
+
+    Args:
+        differences (pd.DataFrame): Sensors as rows, time points as columns.
+        save_path (str): Output file, .gif or .mp4.
+        resolution (int, optional): Pixels per side (default is 64).
+        step (int, optional): Use every step-th time point (default is 1, all of them).
+        fps (int, optional): Frames per second (default is 20).
+        title (str, optional): Title of the animation.
+
+    Returns:
+        str: save_path
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib import animation
+    from PIL import Image, ImageDraw
+
+    differences = differences.iloc[:, ::step]
+    frames = topographic_frames(differences, resolution)
+    _, _, extent = interpolation_weights(tuple(differences.index), resolution, 2.0)
+    limit = _color_limit(frames)
+
+    # Static background: everything but the map itself, with the map area left blank
+    fig, ax = plt.subplots(figsize=(5, 5), dpi=80)
+    image = ax.imshow(frames[0], extent=extent, cmap="RdBu_r", vmin=-limit, vmax=limit)
+    _draw_head(ax, sensor_positions(differences.index), extent[1])
+    fig.colorbar(image, ax=ax, shrink=0.7, label="µV")
+    ax.set_title(title)
+    image.set_visible(False)
+    fig.canvas.draw()
+    background = np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+    box = image.get_window_extent()
+    plt.close(fig)
+
+    # Palette: 128 colors of the background, then 128 colors of the colormap
+    quantized = Image.fromarray(background).quantize(colors=128)
+    indices = np.asarray(quantized)
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    background_palette = np.array(quantized.getpalette()[:128 * 3], dtype=np.uint8).reshape(-1, 3)
+    palette[:len(background_palette)] = background_palette
+    palette[128:] = (plt.get_cmap("RdBu_r")(np.linspace(0, 1, 128))[:, :3] * 255).astype(np.uint8)
+    black = int(np.argmin(palette[:128].astype(int).sum(axis=1)))
+
+    # Pixels of the map area that nothing else was drawn on, and the grid pixel each of them shows
+    height = background.shape[0]
+    top, bottom = int(round(height - box.y1)), int(round(height - box.y0))
+    left, right = int(round(box.x0)), int(round(box.x1))
+    blank = (background[top:bottom, left:right] == 255).all(axis=-1)
+    rows = np.minimum(np.arange(bottom - top) * resolution // (bottom - top), resolution - 1)
+    columns = np.minimum(np.arange(right - left) * resolution // (right - left), resolution - 1)
+    colors = 128 + np.rint(np.nan_to_num((frames + limit) / (2 * limit)) * 127).astype(np.uint8)
+    inside = ~np.isnan(frames[0])
+
+    images = []
+    for colored, time in zip(colors, differences.columns):
+        frame = indices.copy()
+        area = frame[top:bottom, left:right]
+        shown = blank & inside[rows[:, None], columns[None, :]]
+        area[shown] = colored[rows[:, None], columns[None, :]][shown]
+        # uint8 indices are read as a grayscale image; converting keeps them as palette indices
+        frame_image = Image.fromarray(frame).convert("P")
+        frame_image.putpalette(palette.reshape(-1).tolist())
+        ImageDraw.Draw(frame_image).text((background.shape[1] // 2 - 20, height - 20), f"{time:.3f} s", fill=black)
+        images.append(frame_image)
+
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if save_path.lower().endswith(".gif"):
+        images[0].save(save_path, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+        return save_path
+
+    writer = animation.FFMpegWriter(fps=fps)
+    out = plt.figure(figsize=(background.shape[1] / 80, height / 80), dpi=80)
+    canvas = out.figimage(background)
+    with writer.saving(out, save_path, dpi=80):
+        for frame_image in images:
+            canvas.set_data(np.asarray(frame_image.convert("RGB")))
+            writer.grab_frame()
+    plt.close(out)
+    return save_path
@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from run_benchmarks import SIZES, STREAMING_SIZES, compare, run_streaming_stages
+from src.synthetic_data import generate_dataset
+
+BASELINE = {"small": {"csv_combined": {"seconds": 2.0, "peak_mb": 200.0},
+                      "perform_t_tests": {"seconds": 0.01, "peak_mb": 0.5}}}
+
+
+def test_compare_flags_slower_and_larger_stages():
+    results = {"small": {"csv_combined": {"seconds": 3.5, "peak_mb": 210.0},
+                         "perform_t_tests": {"seconds": 0.01, "peak_mb": 0.5}}}
+    assert compare(results, BASELINE, 1.5) == ["small/csv_combined: seconds 3.5 > 1.5 x 2.0"]
+
+    results["small"]["csv_combined"]["peak_mb"] = 400.0
+    assert len(compare(results, BASELINE, 1.5)) == 2
+    assert compare(results, BASELINE, 2.5) == []
+
+
+def test_compare_ignores_noise_and_unknown_stages():
+    # Three times slower, but below the absolute floors
+    results = {"small": {"perform_t_tests": {"seconds": 0.03, "peak_mb": 1.4}},
+               "medium": {"csv_combined": {"seconds": 100.0, "peak_mb": 1000.0}}}
+    assert compare(results, BASELINE, 1.5) == []
+
+
+def test_streaming_sizes_run_without_loading_the_data(tmp_path):
+    assert STREAMING_SIZES <= set(SIZES)
+    generate_dataset(str(tmp_path), n_alcoholic=2, n_control=2, n_trials=2, n_channels=16, n_samples=32, workers=1)
+    results = run_streaming_stages(str(tmp_path))
+    assert list(results) == ["stream_statistics", "t_tests_from_stats", "group_differences_from_stats",
+                             "condition_stats_from_stats"]
+    assert all(result["seconds"] >= 0 and result["peak_mb"] >= 0 for result in results.values())
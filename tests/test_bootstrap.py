@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.bootstrap import bootstrap_condition_stats, bootstrap_group_differences, bootstrap_means
+
+
+@pytest.fixture
+def combined_df():
+    # 8 subjects per group, 4 trials each; group 'a' is higher on FP1 only
+    rng = np.random.default_rng(11)
+    rows = []
+    for group in ["a", "c"]:
+        for subject in range(8):
+            for trial in range(4):
+                condition = "S1 obj" if trial % 2 else "S2 match"
+                for sensor in ["FP1", "CZ"]:
+                    shift = 2.0 if group == "a" and sensor == "FP1" else 0.0
+                    for value in rng.normal(shift, 1.0, 16):
+                        rows.append((f"co2{group}{subject}", trial, condition, group, sensor, value))
+    return pd.DataFrame(rows, columns=["name", "trial number", "matching condition", "subject identifier",
+                                       "sensor position", "sensor value"])
+
+
+def test_group_difference_intervals(combined_df):
+    args = (combined_df, "sensor value", "subject identifier", "sensor position", "a", "c")
+    result = bootstrap_group_differences(*args, n_resamples=400, workers=1, seed=3)
+
+    assert list(result.index) == ["FP1", "CZ"]
+    assert (result["ci low"] <= result["difference"]).all() and (result["difference"] <= result["ci high"]).all()
+    assert result.loc["FP1", "ci low"] > result.loc["CZ", "ci high"]
+
+    # Reproducible and independent of the number of workers
+    parallel = bootstrap_group_differences(*args, n_resamples=400, workers=2, seed=3)
+    pd.testing.assert_frame_equal(result, parallel)
+    trial_level = bootstrap_group_differences(*args, level="trial", n_resamples=400, workers=1, seed=3)
+    assert not np.allclose(trial_level["ci low"], result["ci low"])
+
+    with pytest.raises(ValueError):
+        bootstrap_group_differences(*args, level="sample")
+
+
+def test_condition_intervals(combined_df):
+    result = bootstrap_condition_stats(combined_df, "sensor value", "matching condition", "subject identifier",
+                                       n_resamples=300, workers=1)
+    assert list(result.columns) == ["matching condition", "subject identifier", "mean", "std", "ci low", "ci high"]
+    assert ((result["ci low"] < result["mean"]) & (result["mean"] < result["ci high"])).all()
+
+
+def test_identical_units_give_a_point_interval():
+    sums = np.array([[2.0, 4.0], [2.0, 4.0], [6.0, 0.0]])
+    counts = np.array([[1.0, 2.0], [1.0, 2.0], [2.0, 1.0]])
+    means = bootstrap_means(sums, counts, [np.array([0, 1]), np.array([2])], n_resamples=50, workers=1)
+    assert means.shape == (2, 50, 2)
+    np.testing.assert_allclose(means[0], [[2.0, 2.0]] * 50)
+    np.testing.assert_allclose(means[1], [[3.0, 0.0]] * 50)
@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest.mock import Mock
+import numpy as np
+import pandas as pd
+from src.cache_utils import cached, fingerprint
+
+
+def test_fingerprint_depends_on_content():
+    df = pd.DataFrame({"value": [1.0, 2.0], "sensor": ["CZ", "FP1"]})
+    assert fingerprint(df, {"alpha": 0.05}) == fingerprint(df.copy(), {"alpha": 0.05})
+    assert fingerprint(df, {"alpha": 0.05}) != fingerprint(df, {"alpha": 0.01})
+    assert fingerprint(np.arange(3)) != fingerprint(np.arange(3).astype(float))
+    changed = df.copy()
+    changed.loc[1, "value"] = 2.5
+    assert fingerprint(df) != fingerprint(changed)
+
+
+def test_cached_computes_once(tmp_path):
+    compute = Mock(return_value=pd.DataFrame({"x": [1, 2]}))
+    first = cached(str(tmp_path), "result", "abc", compute)
+    second = cached(str(tmp_path), "result", "abc", compute)
+    compute.assert_called_once()
+    pd.testing.assert_frame_equal(first, second)
@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.classification import cross_validate, feature_matrix, subject_folds
+from src.eeg_tensor import EEGTensor
+
+
+@pytest.fixture
+def tensor():
+    # 8 subjects per group with 3 trials each; group 'a' has a raised FZ and F3, everything else is noise
+    rng = np.random.default_rng(7)
+    subjects = np.repeat([f"s{i}" for i in range(16)], 3).astype(object)
+    groups = np.repeat(["a"] * 8 + ["c"] * 8, 3).astype(object)
+    data = rng.normal(size=(48, 4, 64))
+    data[groups == "a", :2] += 1.0
+    return EEGTensor(
+        data=data.astype(np.float32),
+        channels=np.array(["FZ", "F3", "CZ", "X"], dtype=object),
+        samples=np.arange(64),
+        subjects=subjects,
+        groups=groups,
+        conditions=np.array(["S1 obj"] * 48, dtype=object),
+        trial_numbers=np.tile(np.arange(3), 16),
+    )
+
+
+def test_feature_matrix_is_cached(tensor, tmp_path):
+    features = feature_matrix(tensor, batch_size=10, cache_dir=str(tmp_path))
+    assert features.shape == (48, (3 + 2) * 7)  # FZ, F3, CZ + Frontal Lobe, Central Sulcus
+    np.testing.assert_allclose(features["FZ mean"], tensor.data[:, 0].mean(axis=1, dtype=np.float64))
+    np.testing.assert_allclose(features["Frontal Lobe alpha"], (features["FZ alpha"] + features["F3 alpha"]) / 2)
+    # The non-electrode channel X is left out, as in the t-tests
+    assert "X mean" not in features and not any(column.startswith("Unknown") for column in features)
+    assert "CZ mean" not in feature_matrix(tensor, cache_dir=None, unknown_regions=("CZ",))
+    assert list(features.index.names) == ["name", "trial number", "subject identifier", "matching condition"]
+    pd.testing.assert_frame_equal(feature_matrix(tensor, cache_dir=str(tmp_path)), features)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_subject_folds_keep_subjects_together():
+    subjects = np.repeat(np.arange(10), 4)
+    labels = (subjects < 5).astype(int)
+    folds = subject_folds(subjects, labels, n_folds=5)
+    assert (pd.Series(folds).groupby(subjects).nunique() == 1).all()
+    assert (pd.Series(labels).groupby(folds).mean() == 0.5).all()  # one subject of each class per fold
+    with pytest.raises(ValueError):
+        subject_folds(subjects, labels, n_folds=11)
+
+
+def test_cross_validation_finds_the_group_effect(tensor):
+    features = feature_matrix(tensor, cache_dir=None)
+    result = cross_validate(features, n_folds=4, workers=1)
+    assert result["accuracy"] > 0.8 and result["subject accuracy"] > 0.8
+    assert result["baseline"] == 0.5
+    assert result["folds"]["test trials"].sum() == 48
+    assert result["importance"].index[0].endswith("mean")
+    assert result["importance"].index[0].split()[0] in ("FZ", "F3", "Frontal")
+
+    parallel = cross_validate(features, classifier="centroid", n_folds=4, workers=2)
+    pd.testing.assert_frame_equal(parallel["importance"],
+                                  cross_validate(features, classifier="centroid", n_folds=4, workers=1)["importance"])
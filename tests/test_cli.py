@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+
+import pandas as pd
+import pytest
+from src.cli import main
+from src.synthetic_data import generate_dataset
+
+
+def test_analyze_writes_results_without_plotting(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # figures would go to the default output/figures under it
+    data_dir = str(tmp_path / "data")
+    generate_dataset(data_dir, n_alcoholic=2, n_control=2, n_trials=3, n_channels=16, n_samples=32, workers=1)
+    output_dir = tmp_path / "results"
+    argv = ["--data-dir", data_dir, "--cache-dir", str(tmp_path / "cache"), "--executor", "serial", "--quiet",
+            "analyze", "--output-dir", str(output_dir)]
+    assert main(argv) == 0
+
+    t_tests = pd.read_csv(output_dir / "t_tests.csv", index_col=0)
+    assert "X" not in t_tests.index and "FP1" in t_tests.index
+    assert (output_dir / "group_differences.csv").exists() and (output_dir / "condition_stats.csv").exists()
+    assert not (tmp_path / "output" / "figures").exists()
+
+
+def test_analyze_does_not_import_the_plotting_libraries(tmp_path):
+    data_dir = str(tmp_path / "data")
+    generate_dataset(data_dir, n_alcoholic=2, n_control=2, n_trials=3, n_channels=16, n_samples=32, workers=1)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    # A fresh interpreter, since this one may have imported them for other tests
+    script = ("import sys\n"
+              f"sys.path.insert(0, {root!r})\n"
+              "from src.cli import main\n"
+              f"main(['--data-dir', {data_dir!r}, '--cache-dir', 'cache', '--executor', 'serial', '--quiet', 'analyze'])\n"
+              "print(sorted(name for name in ('matplotlib', 'seaborn', 'PIL') if name in sys.modules))\n")
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    assert not (tmp_path / "output").exists()
+
+
+def test_missing_data_directory_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.delenv("EEG_DATA_DIR", raising=False)
+    with pytest.raises(SystemExit):
+        main(["analyze"])
+    with pytest.raises(SystemExit):
+        main(["--data-dir", str(tmp_path / "missing"), "analyze"])
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+from src.cluster_permutation import cluster_permutation_test
+from src.data_analysis import time_resolved_t_tests
+from src.eeg_tensor import EEGTensor
+
+
+@pytest.fixture
+def tensor():
+    # 8 subjects x 3 trials, 4 channels x 20 samples; group 'a' is shifted on CZ and O1 at samples 8-13
+    rng = np.random.default_rng(3)
+    n_trials = 24
+    data = rng.normal(size=(n_trials, 4, 20)).astype(np.float32)
+    subjects = np.repeat([f"s{i}" for i in range(8)], 3)
+    groups = np.where(np.repeat(np.arange(8), 3) < 4, "a", "c")
+    data[groups == "a", 1:3, 8:14] += 2.5
+    return EEGTensor(
+        data=data,
+        channels=np.array(["FP1", "CZ", "O1", "P3"], dtype=object),
+        samples=np.arange(20),
+        subjects=subjects,
+        groups=groups,
+        conditions=np.array(["S1 obj"] * n_trials, dtype=object),
+        trial_numbers=np.tile([0, 1, 2], 8),
+    )
+
+
+def test_finds_the_group_effect(tensor):
+    result = cluster_permutation_test(tensor, n_permutations=200, level="trial", workers=1, seed=1)
+    clusters = result["clusters"]
+    best = clusters.iloc[0]
+    assert best["p"] < 0.05
+    assert best["sign"] == 1
+    assert best["channels"] in ("CZ", "O1")
+    assert len(result["null_distribution"]) == 200
+
+    expected = time_resolved_t_tests(tensor.to_dataframe(), "sensor value", "subject identifier",
+                                     "sensor position", "sample num", "a", "c")["t"]
+    np.testing.assert_allclose(result["t"].loc[expected.index].to_numpy(), expected.to_numpy(), rtol=1e-4)
+
+
+def test_adjacency_merges_neighbouring_channels(tensor):
+    adjacency = np.zeros((4, 4), dtype=bool)
+    adjacency[1, 2] = adjacency[2, 1] = True
+    result = cluster_permutation_test(tensor, n_permutations=50, level="trial", adjacency=adjacency, workers=1)
+    best = result["clusters"].iloc[0]
+    assert best["channels"] == "CZ, O1"
+    labels = result["cluster_labels"]
+    assert labels.loc["CZ", 10] == labels.loc["O1", 10] != 0
+
+
+def test_reproducible_across_worker_counts(tensor):
+    serial = cluster_permutation_test(tensor, n_permutations=40, batch_size=16, workers=1, seed=7)
+    parallel = cluster_permutation_test(tensor, n_permutations=40, batch_size=16, workers=2, seed=7)
+    np.testing.assert_array_equal(serial["null_distribution"], parallel["null_distribution"])
+    with pytest.raises(ValueError):
+        cluster_permutation_test(tensor, level="sensor")
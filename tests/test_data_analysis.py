@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from src.data_analysis import compute_group_differences, map_sensors_to_regions, assign_brain_region, perform_t_tests, analyze_responses_by_condition_and_group
+from src.data_analysis import compute_group_differences, map_sensors_to_regions, assign_brain_region, perform_t_tests, analyze_responses_by_condition_and_group, welch_t_tests, adjust_p_values, time_resolved_t_tests
 import matplotlib
 import pytest
 matplotlib.use("Agg")  # Use a non-interactive backend
@@ -8,7 +9,7 @@ from unittest.mock import patch
 
 from io import StringIO
 from unittest.mock import patch
-from scipy.stats import ttest_ind
+from scipy.stats import false_discovery_control, ttest_ind
 
 # Sample test data for compute_group_differences
 @pytest.fixture
@@ -148,3 +149,91 @@ def test_analyze_responses_by_condition_and_group():
 
     # Use assert_frame_equal with check_like=True to allow for column/row order differences
     pd.testing.assert_frame_equal(result_sorted, expected_result_sorted, check_like=True)
+
+
+def test_welch_t_tests_matches_scipy():
+    rng = np.random.default_rng(0)
+    n = 600
+    df = pd.DataFrame({
+        "position": rng.choice(["FP1", "CZ", "PO1", "X"], n),
+        "subject_id": rng.choice(["a", "c"], n),
+        "value": rng.normal(size=n),
+    })
+    df.loc[df["position"] == "CZ", "value"] += (df["subject_id"] == "a") * 1.5
+    df.loc[5, "value"] = np.nan
+
+    results = welch_t_tests(df, "value", "subject_id", "position", "a", "c", unknown_regions=["X"])
+
+    assert list(results.columns) == ["region", "t", "p", "df", "effect size"]
+    assert "X" not in results.index
+    for sensor, row in results.iterrows():
+        values_a = df[(df["subject_id"] == "a") & (df["position"] == sensor)]["value"]
+        values_c = df[(df["subject_id"] == "c") & (df["position"] == sensor)]["value"]
+        expected = ttest_ind(values_a, values_c, equal_var=False, nan_policy="omit")
+        assert row["t"] == pytest.approx(expected.statistic)
+        assert row["p"] == pytest.approx(expected.pvalue)
+        assert row["region"] == assign_brain_region(sensor)
+    assert results.loc["CZ", "effect size"] > 1
+
+
+def test_perform_t_tests_prints_significant_regions():
+    df = pd.DataFrame({
+        "position": ["CP1"] * 8 + ["P3"] * 8,
+        "subject_id": ["a", "c"] * 8,
+        "value": [10.0, 1.0, 11.0, 1.5, 10.5, 0.5, 9.5, 1.0] + [1.0, 1.2, 0.8, 1.1, 1.3, 0.7, 0.9, 1.0],
+    })
+    with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+        results = perform_t_tests(df, "value", "subject_id", "position", "a", "c", unknown_regions=[])
+    output = mock_stdout.getvalue()
+    assert "Sensory-Motor Cortex: CP1" in output
+    assert "P3" not in output
+    assert set(results.index) == {"CP1", "P3"}
+
+
+def test_map_sensors_to_regions_assigns_each_sensor_once():
+    data = pd.DataFrame({
+        "sensor_position": ["CP1", "P3", "X", "CP1", "P3", None, "CP1"],
+        "value": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    })
+    with patch("src.data_analysis.assign_brain_region", side_effect=assign_brain_region) as mock_assign:
+        result = map_sensors_to_regions(data, sensor_column="sensor_position")
+    assert mock_assign.call_count == 3  # CP1, P3 and X
+    assert list(result["value"]) == [1.0, 2.0, 4.0, 5.0, 7.0]
+    assert list(result["region"]) == ["Sensory-Motor Cortex", "Parietal Lobe"] * 2 + ["Sensory-Motor Cortex"]
+
+
+def test_adjust_p_values():
+    p = np.array([[0.01, 0.04], [0.03, np.nan]])
+    np.testing.assert_allclose(adjust_p_values(p, "bonferroni"), [[0.03, 0.12], [0.09, np.nan]])
+    expected = false_discovery_control([0.01, 0.04, 0.03])
+    np.testing.assert_allclose(adjust_p_values(p, "fdr_bh")[~np.isnan(p)], expected)
+    with pytest.raises(ValueError):
+        adjust_p_values(p, "holm")
+
+
+def test_time_resolved_t_tests_matches_scipy():
+    rng = np.random.default_rng(2)
+    rows = []
+    for trial in range(12):
+        group = "a" if trial < 6 else "c"
+        for sensor in ["FP1", "CZ", "Y"]:
+            for sample in range(4):
+                shift = 3.0 if (group == "a" and sensor == "CZ" and sample == 2) else 0.0
+                rows.append({"position": sensor, "sample": sample, "subject_id": group,
+                             "value": rng.normal() + shift})
+    df = pd.DataFrame(rows)
+    df["position"] = df["position"].astype("category")
+
+    results = time_resolved_t_tests(df, "value", "subject_id", "position", "sample", "a", "c",
+                                    unknown_regions=["Y"], correction="bonferroni")
+
+    assert results["t"].shape == (2, 4)
+    for sensor in ["FP1", "CZ"]:
+        for sample in range(4):
+            cell = df[(df["position"] == sensor) & (df["sample"] == sample)]
+            expected = ttest_ind(cell[cell["subject_id"] == "a"]["value"], cell[cell["subject_id"] == "c"]["value"],
+                                 equal_var=False)
+            assert results["t"].loc[sensor, sample] == pytest.approx(expected.statistic)
+            assert results["p"].loc[sensor, sample] == pytest.approx(expected.pvalue)
+            assert results["p_corrected"].loc[sensor, sample] == pytest.approx(min(expected.pvalue * 8, 1))
+    assert results["significant"].loc["CZ", 2]
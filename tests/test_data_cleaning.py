@@ -5,10 +5,17 @@ import os
 # Add the project root directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import glob
+import gzip
+import shutil
+import tarfile
+import zipfile
 import pandas as pd
+import tempfile
 import unittest
 from unittest.mock import patch
-from src.data_cleaning import csv_combined, convert_numeric_val
+from src.data_cleaning import (csv_combined, convert_numeric_val, load_cleaned_data, csv_combined_incremental,
+                               read_typed_csv, source_manifest)
 
 class TestCsvCombined(unittest.TestCase):
     
@@ -45,3 +52,188 @@ class TestCsvCombined(unittest.TestCase):
         self.assertEqual(df['column1'].isnull().sum(), 2, "Two non-convertible values should result in NaNs.")
 
         print("All tests passed for convert_numeric_val.")
+
+
+def _write_recording(path, subject, name, trial, values):
+    # Small CSV in the layout of the Kaggle Alcoholics recordings
+    pd.DataFrame({
+        "trial number": trial,
+        "sensor position": ["FP1", "FP2"] * (len(values) // 2),
+        "sample num": [i // 2 for i in range(len(values))],
+        "sensor value": values,
+        "subject identifier": subject,
+        "matching condition": "S1 obj",
+        "channel": [i % 2 for i in range(len(values))],
+        "name": name,
+        "time": [i // 2 / 256 for i in range(len(values))],
+    }).to_csv(path)
+
+
+class TestTypedCsvCombined(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "SMNI_CMI_TRAIN"))
+        _write_recording(os.path.join(self.tmp.name, "SMNI_CMI_TRAIN", "Data1.csv"), "a", "co2a0000364", 0,
+                         [-8.921, 0.834, -2.1, 1.5])
+        _write_recording(os.path.join(self.tmp.name, "SMNI_CMI_TRAIN", "Data2.csv"), "c", "co2c0000337", 3,
+                         [4.2, -1.25, 0.5, 2.75])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_typed_matches_default(self):
+        with patch("sys.stdout"):
+            expected = csv_combined(self.tmp.name)
+            for executor in ("thread", "process"):
+                result = csv_combined(self.tmp.name, workers=2, executor=executor)
+                self.assertEqual(result["sensor value"].dtype, "float32")
+                self.assertEqual(result["sample num"].dtype, "int16")
+                self.assertIsInstance(result["subject identifier"].dtype, pd.CategoricalDtype)
+                pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False,
+                                              rtol=1e-6)
+
+    def test_incomplete_rows_keep_their_labels(self):
+        # A missing trial number (integer column) and a non-numeric value send files through the untyped fallback
+        for name, column, bad in (("Data1.csv", "trial number", None), ("Data2.csv", "sensor value", "bad")):
+            path = os.path.join(self.tmp.name, "SMNI_CMI_TRAIN", name)
+            df = pd.read_csv(path, index_col=0)
+            df[column] = df[column].astype(object)
+            df.loc[0, column] = bad
+            df.to_csv(path)
+        with patch("sys.stdout"):
+            expected = csv_combined(self.tmp.name)
+            result = csv_combined(self.tmp.name, executor="thread")
+        self.assertEqual(list(result.index), list(expected.index))
+        for df in (expected, result):
+            convert_numeric_val("sensor value", df)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False, rtol=1e-6)
+
+    def test_invalid_executor(self):
+        with self.assertRaises(ValueError):
+            csv_combined(self.tmp.name, executor="gpu")
+
+
+class TestArchiveCsvCombined(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        for folder, name, values in (("SMNI_CMI_TRAIN", "Data1.csv", [-8.921, 0.834, -2.1, 1.5]),
+                                     ("SMNI_CMI_TEST", "Data1.csv", [4.2, -1.25, 0.5, 2.75]),
+                                     ("SMNI_CMI_TEST", "Data2.csv", [4.2, -1.25, 0.5, 2.75])):  # duplicate rows
+            os.makedirs(os.path.join(self.data_dir, folder), exist_ok=True)
+            _write_recording(os.path.join(self.data_dir, folder, name), "c", "co2c0000337", 3, values)
+        # Members are added in the order csv_combined reads the extracted tree
+        files = glob.glob(os.path.join(self.data_dir, "**", "*.csv"), recursive=True)
+        self.zip_path = os.path.join(self.tmp.name, "data.zip")
+        with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file in files:
+                archive.write(file, os.path.relpath(file, self.tmp.name))
+        self.tar_path = os.path.join(self.tmp.name, "data.tar.gz")
+        with tarfile.open(self.tar_path, "w:gz") as archive:
+            for file in files:
+                archive.add(file, os.path.relpath(file, self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_archives_match_extracted_tree(self):
+        with patch("sys.stdout"):
+            for options in ({}, {"executor": "thread", "workers": 2}, {"executor": "process", "workers": 2}):
+                expected = csv_combined(self.data_dir, **options)
+                for archive in (self.zip_path, self.tar_path):
+                    pd.testing.assert_frame_equal(csv_combined(archive, **options), expected)
+        self.assertEqual(len(expected), 8)
+
+    def test_gzip_file_and_manifest(self):
+        gz_path = os.path.join(self.tmp.name, "Data1.csv.gz")
+        source = os.path.join(self.data_dir, "SMNI_CMI_TRAIN", "Data1.csv")
+        with open(source, "rb") as f, gzip.open(gz_path, "wb") as out:
+            shutil.copyfileobj(f, out)
+        with patch("sys.stdout"):
+            pd.testing.assert_frame_equal(csv_combined(gz_path, executor="thread"),
+                                          csv_combined(os.path.dirname(source), executor="thread"))
+        self.assertEqual([entry[0] for entry in source_manifest(self.zip_path)], ["data.zip"])
+        with self.assertRaises(ValueError):
+            csv_combined_incremental(self.zip_path, store_dir=os.path.join(self.tmp.name, "store"))
+
+
+class TestCleanedDataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        os.makedirs(self.data_dir)
+        _write_recording(os.path.join(self.data_dir, "Data1.csv"), "a", "co2a0000364", 0, [-8.921, 0.834, -2.1, 1.5])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache_round_trip(self):
+        with patch("sys.stdout"):
+            for options in ({}, {"executor": "thread"}):
+                built = load_cleaned_data(self.data_dir, cache_dir=self.cache_dir, **options)
+                with patch("src.data_cleaning.csv_combined") as mock_combined:
+                    cached = load_cleaned_data(self.data_dir, cache_dir=self.cache_dir, **options)
+                mock_combined.assert_not_called()
+                pd.testing.assert_frame_equal(cached, built)
+
+    def test_cache_invalidated_by_new_file(self):
+        with patch("sys.stdout"):
+            first = load_cleaned_data(self.data_dir, cache_dir=self.cache_dir)
+            _write_recording(os.path.join(self.data_dir, "Data2.csv"), "c", "co2c0000337", 3, [4.2, -1.25, 0.5, 2.75])
+            second = load_cleaned_data(self.data_dir, cache_dir=self.cache_dir)
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 8)
+
+    def test_optional_csv_export(self):
+        export = os.path.join(self.tmp.name, "cleaned_data.csv")
+        with patch("sys.stdout"):
+            load_cleaned_data(self.data_dir, cache_dir=None)
+            self.assertFalse(os.path.exists(export))
+            load_cleaned_data(self.data_dir, cache_dir=None, export_csv=export)
+        self.assertEqual(len(pd.read_csv(export)), 4)
+
+
+class TestIncrementalCsvCombined(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        self.store_dir = os.path.join(self.tmp.name, "store")
+        os.makedirs(self.data_dir)
+        _write_recording(self._path("Data1.csv"), "a", "co2a0000364", 0, [-8.921, 0.834, -2.1, 1.5])
+        _write_recording(self._path("Data2.csv"), "c", "co2c0000337", 3, [4.2, -1.25, 0.5, 2.75])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def _assert_matches_full_rebuild(self):
+        with patch("sys.stdout"):
+            result = csv_combined_incremental(self.data_dir, store_dir=self.store_dir)
+            expected = csv_combined(self.data_dir, executor="thread")
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_added_modified_and_removed_files(self):
+        self._assert_matches_full_rebuild()
+        # New session, with one row duplicated from Data1.csv and one incomplete row
+        _write_recording(self._path("Data3.csv"), "a", "co2a0000364", 0, [-8.921, 7.0, float("nan"), 1.0])
+        self._assert_matches_full_rebuild()
+        _write_recording(self._path("Data2.csv"), "c", "co2c0000337", 3, [1.0, 2.0, 3.0, 4.0])
+        self._assert_matches_full_rebuild()
+        os.remove(self._path("Data1.csv"))
+        self._assert_matches_full_rebuild()
+
+    def test_only_changed_files_are_parsed(self):
+        with patch("sys.stdout"):
+            csv_combined_incremental(self.data_dir, store_dir=self.store_dir)
+            _write_recording(self._path("Data3.csv"), "a", "co2a0000364", 1, [0.1, 0.2, 0.3, 0.4])
+            with patch("src.data_cleaning.read_typed_csv", wraps=read_typed_csv) as mock_read:
+                csv_combined_incremental(self.data_dir, store_dir=self.store_dir)
+        mock_read.assert_called_once()
+        self.assertTrue(mock_read.call_args[0][0].endswith("Data3.csv"))
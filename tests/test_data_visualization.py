@@ -3,9 +3,10 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.data_visualization import time_series_visualization,visualize_all_conditions, plot_brain_region_analysis
+from src.data_visualization import time_series_visualization,visualize_all_conditions, plot_brain_region_analysis, aggregate_time_series, use_headless_backend, FigureSpec, render_figures, time_series_specs
 import unittest.mock
 from unittest.mock import patch
+import numpy as np
 import pandas as pd
 import pytest
 import matplotlib.pyplot as plt
@@ -83,3 +84,64 @@ def test_plot_brain_region_analysis(brain_region_data):
     # Optionally: Check that the function didn't raise any exceptions
     # If no exceptions were raised, the test passes.
 
+
+
+def test_aggregate_time_series():
+    df = pd.DataFrame({
+        "time": [0, 0, 0, 1, 1, 1],
+        "sensor value": [1.0, 3.0, 10.0, 2.0, 4.0, 6.0],
+        "subject identifier": ["a", "a", "c", "a", "a", "c"],
+    })
+    stats = aggregate_time_series(df, "time", "sensor value", "subject identifier")
+    row = stats[(stats["subject identifier"] == "a") & (stats["time"] == 0)].iloc[0]
+    assert row["count"] == 2
+    assert row["mean"] == pytest.approx(2.0)
+    assert row["sem"] == pytest.approx(df["sensor value"][:2].std() / 2 ** 0.5)
+
+
+def test_headless_figures_are_written_to_files(tmp_path, brain_region_data):
+    use_headless_backend()
+    plt.close("all")
+    df = pd.DataFrame({
+        "time": [0, 1, 2, 3] * 2,
+        "sensor value": [1.0, 2.0, 3.0, 4.0, 2.0, 1.0, 0.5, 0.0],
+        "subject identifier": ["a"] * 4 + ["c"] * 4,
+        "matching condition": ["S1 obj", "S2 match"] * 4,
+    })
+    with patch("matplotlib.pyplot.show") as mock_show:
+        time_series_visualization(df, "time", "sensor value", "subject identifier",
+                                  save_path=str(tmp_path / "time_series.png"))
+        plot_brain_region_analysis(brain_region_data, "group", "value", save_path=str(tmp_path / "regions.svg"))
+        visualize_all_conditions(df, "sensor value", "matching condition", "subject identifier",
+                                 save_path=str(tmp_path / "figures" / "conditions.png"))
+    mock_show.assert_not_called()
+    assert (tmp_path / "time_series.png").stat().st_size > 0
+    assert (tmp_path / "regions.svg").read_text().lstrip().startswith("<?xml")
+    assert (tmp_path / "figures" / "conditions.png").exists()
+    assert plt.get_fignums() == []  # saved figures are closed
+
+
+def test_render_figures_skips_unchanged(tmp_path):
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        "time": np.tile(np.arange(4), 12),
+        "sensor position": np.repeat(["FP1", "CZ", "O1"], 16),
+        "subject identifier": np.tile(np.repeat(["a", "c"], 4), 6),
+        "sensor value": rng.normal(size=48),
+    })
+    specs = time_series_specs(df, "time", "sensor value", "subject identifier", by="sensor position")
+    assert sorted(spec.name for spec in specs) == ["CZ.png", "FP1.png", "O1.png"]
+    assert all(len(spec.data) == 8 for spec in specs)  # 2 groups x 4 time points
+
+    status = render_figures(specs, str(tmp_path), workers=2)
+    assert set(status.values()) == {"rendered"}
+    assert all((tmp_path / name).exists() for name in status)
+
+    # Only the figure whose data changed is rendered again
+    df.loc[df["sensor position"] == "CZ", "sensor value"] += 1
+    specs = time_series_specs(df, "time", "sensor value", "subject identifier", by="sensor position")
+    status = render_figures(specs, str(tmp_path), workers=1)
+    assert status == {"CZ.png": "rendered", "FP1.png": "cached", "O1.png": "cached"}
+
+    with pytest.raises(ValueError):
+        render_figures([FigureSpec("x.png", "pie", df)], str(tmp_path))
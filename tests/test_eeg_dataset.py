@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import compute_group_differences, welch_t_tests
+from src.data_visualization import aggregate_time_series
+from src.eeg_dataset import EEGDataset
+
+
+@pytest.fixture
+def combined_df():
+    # Rows of 6 trials (3 subjects, 2 conditions) x 3 sensors x 4 samples, shuffled
+    rng = np.random.default_rng(2)
+    rows = []
+    for subject, group in [("co2a1", "a"), ("co2c1", "c"), ("co2a2", "a")]:
+        for trial, condition in [(0, "S1 obj"), (1, "S2 match")]:
+            for sensor in ["FP1", "CZ", "O1"]:
+                for sample in range(4):
+                    rows.append((subject, group, condition, trial, sensor, sample, rng.normal(), sample / 256))
+    df = pd.DataFrame(rows, columns=["name", "subject identifier", "matching condition", "trial number",
+                                     "sensor position", "sample num", "sensor value", "time"])
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def _mask(df, **conditions):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in conditions.items():
+        mask &= df[column].isin(values if isinstance(values, list) else [values]).to_numpy()
+    return df[mask]
+
+
+def _assert_same_rows(dataset, expected):
+    columns = ["name", "trial number", "sensor position", "sample num"]
+    result = dataset.to_dataframe().sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected.sort_values(columns).reset_index(drop=True))
+
+
+def test_select_matches_boolean_masks(combined_df):
+    dataset = EEGDataset.from_dataframe(combined_df)
+    assert len(dataset) == len(combined_df)
+
+    _assert_same_rows(dataset.select(group="a"), _mask(combined_df, **{"subject identifier": "a"}))
+    _assert_same_rows(dataset.select(group="a", subject="co2a2", condition="S2 match", trial=1, sensor="CZ"),
+                      _mask(combined_df, name="co2a2", **{"trial number": 1, "sensor position": "CZ"}))
+    _assert_same_rows(dataset.select(sensor=["FP1", "O1"], condition="S1 obj"),
+                      _mask(combined_df, **{"sensor position": ["FP1", "O1"], "matching condition": "S1 obj"}))
+    assert len(dataset.select(group="a", subject="co2c1")) == 0
+    assert len(dataset.select(sensor="nd")) == 0
+
+    # Nested selections of a selection
+    trial = dataset.select(group="c").select(group="c", subject="co2c1", condition="S1 obj", trial=0)
+    assert sorted(trial.values("sensor")) == ["CZ", "FP1", "O1"]
+    assert (trial.to_dataframe()["sample num"].to_numpy().reshape(3, 4) == np.arange(4)).all()
+
+
+def test_prefix_selection_is_a_view(combined_df):
+    dataset = EEGDataset.from_dataframe(combined_df)
+    block = dataset.select(group="a", subject="co2a1", condition="S1 obj", trial=0, sensor="O1")
+    assert len(block) == 4
+    assert np.shares_memory(block.to_dataframe()["sensor value"].to_numpy(),
+                            dataset.to_dataframe()["sensor value"].to_numpy())
+
+
+def test_analysis_functions_accept_dataset(combined_df):
+    dataset = EEGDataset.from_dataframe(combined_df)
+    args = ("sensor value", "subject identifier", "sensor position", "a", "c")
+    pd.testing.assert_frame_equal(compute_group_differences(dataset, *args), compute_group_differences(combined_df, *args))
+    pd.testing.assert_frame_equal(welch_t_tests(dataset, *args).sort_index(), welch_t_tests(combined_df, *args).sort_index())
+    pd.testing.assert_frame_equal(aggregate_time_series(dataset, "time", "sensor value", "subject identifier"),
+                                  aggregate_time_series(combined_df, "time", "sensor value", "subject identifier"))
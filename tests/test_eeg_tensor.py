@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import compute_group_differences
+from src.eeg_tensor import EEGTensor
+
+
+@pytest.fixture
+def long_data():
+    # 4 trials (2 per group) x 3 sensors x 5 samples
+    rng = np.random.default_rng(1)
+    rows = []
+    for subject, group, trial, condition in [("co2a1", "a", 0, "S1 obj"), ("co2a1", "a", 3, "S2 match"),
+                                             ("co2c1", "c", 0, "S1 obj"), ("co2c2", "c", 5, "S1 obj")]:
+        for channel, sensor in enumerate(["FP1", "CZ", "O1"]):
+            for sample in range(5):
+                rows.append({"trial number": trial, "sensor position": sensor, "sample num": sample,
+                             "sensor value": round(rng.normal(), 3), "subject identifier": group,
+                             "matching condition": condition, "channel": channel, "name": subject,
+                             "time": sample / 256})
+    return pd.DataFrame(rows)
+
+
+def test_round_trip(long_data):
+    tensor = EEGTensor.from_dataframe(long_data)
+    assert tensor.shape == (4, 3, 5)
+    assert tensor.data.dtype == np.float32
+    assert list(tensor.groups) == ["a", "a", "c", "c"]
+
+    # Every column of the Kaggle files, in their order, so consumers of the long format accept it
+    result = tensor.to_dataframe()
+    assert list(result.columns) == list(long_data.columns)
+    columns = list(long_data.columns)
+    expected = long_data.sort_values(columns).reset_index(drop=True)
+    result = result[columns].sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, atol=1e-6)
+
+
+def test_missing_cells_are_nan(long_data):
+    tensor = EEGTensor.from_dataframe(long_data.drop(index=[0, 1]))
+    assert np.isnan(tensor.data[0, 0, :2]).all()
+    assert len(tensor.to_dataframe()) == len(long_data) - 2
+
+
+def test_select_and_group_reductions(long_data):
+    tensor = EEGTensor.from_dataframe(long_data)
+    control = tensor.select(groups=["c"], channels=["CZ", "O1"])
+    assert control.shape == (2, 2, 5)
+    np.testing.assert_allclose(tensor.group_difference("a", "c"),
+                               tensor.group_mean("a") - tensor.group_mean("c"))
+
+    result = tensor.sensor_group_differences("a", "c")
+    expected = compute_group_differences(long_data, "sensor value", "subject identifier", "sensor position", "a", "c")
+    pd.testing.assert_frame_equal(result.sort_index(), expected[["a", "c", "difference"]].sort_index(),
+                                  check_names=False, check_index_type=False, rtol=1e-5)
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pandas as pd
+import src.data_analysis as data_analysis
+from src import spectral_analysis
+from src.instrumentation import Instrumentation
+
+
+def _combined_df():
+    return pd.DataFrame({
+        "sensor position": ["FP1", "CZ", "X"] * 4,
+        "subject identifier": ["a"] * 6 + ["c"] * 6,
+        "sensor value": [1.0, 2.0, 3.0, 1.5, 2.5, 3.5, 0.5, 1.0, 2.0, 0.0, 1.5, 2.5],
+    })
+
+
+def test_records_calls_and_restores_functions(tmp_path):
+    original = data_analysis.welch_t_tests
+    report_path = str(tmp_path / "run_profile")
+    with Instrumentation(profile=True, report_path=report_path, verbose=False) as instrumentation:
+        # Patched in its module and where it was imported with `from ... import`
+        assert data_analysis.welch_t_tests is not original
+        assert spectral_analysis.welch_t_tests is data_analysis.welch_t_tests
+        data_analysis.perform_t_tests(_combined_df(), "sensor value", "subject identifier", "sensor position",
+                                      "a", "c", ["X"], verbose=False)
+    assert data_analysis.welch_t_tests is original
+    assert spectral_analysis.welch_t_tests is original
+
+    calls = {record["function"]: record for record in instrumentation.records}
+    outer = calls["src.data_analysis.perform_t_tests"]
+    assert outer["depth"] == 0 and calls["src.data_analysis.welch_t_tests"]["depth"] == 1
+    assert outer["rows_in"] == 12 and outer["rows_out"] == 2
+    assert outer["wall_s"] >= calls["src.data_analysis.welch_t_tests"]["wall_s"]
+    assert outer["peak_traced_mb"] is not None
+
+    with open(report_path + ".json") as f:
+        report = json.load(f)
+    assert report["summary"][0]["function"] == "src.data_analysis.perform_t_tests"
+    assert report["profile"]
+    with open(report_path + ".txt") as f:
+        assert "src.data_analysis.welch_t_tests" in f.read()
+
+
+def test_disabled_instrumentation_leaves_functions_alone():
+    original = data_analysis.compute_group_differences
+    with Instrumentation(modules=("src.data_visualization",), memory=False, verbose=False) as instrumentation:
+        assert data_analysis.compute_group_differences is original
+        data_analysis.compute_group_differences(_combined_df(), "sensor value", "subject identifier",
+                                                "sensor position", "a", "c")
+    assert instrumentation.records == []
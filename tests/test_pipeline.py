@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import importlib
+import threading
+import pytest
+from src.pipeline import Pipeline, Stage
+
+calls = []
+
+
+def load(n, executor=None):
+    calls.append("load")
+    return list(range(n))
+
+
+def total(numbers, offset=0):
+    calls.append("total")
+    return sum(numbers) + offset
+
+
+def count(numbers):
+    calls.append("count")
+    return len(numbers)
+
+
+def report(total, count, label):
+    calls.append("report")
+    return f"{label}: {total}/{count}"
+
+
+def build(tmp_path, n=4, label="mean", offset=0):
+    return Pipeline([
+        Stage("load", load, params={"n": n}),
+        Stage("total", total, {"numbers": "load"}, {"offset": offset}),
+        Stage("count", count, {"numbers": "load"}),
+        Stage("report", report, {"total": "total", "count": "count"}, {"label": label}),
+    ], cache_dir=str(tmp_path), verbose=False)
+
+
+def test_only_changed_stages_are_rerun(tmp_path):
+    calls.clear()
+    assert build(tmp_path).run(["report"]) == {"report": "mean: 6/4"}
+    assert sorted(calls) == ["count", "load", "report", "total"]
+
+    # Nothing changed: the target is loaded from the cache and nothing upstream is touched
+    calls.clear()
+    pipeline = build(tmp_path)
+    assert pipeline.run(["report"]) == {"report": "mean: 6/4"}
+    assert calls == []
+    assert pipeline.last_run == {"load": "skipped", "total": "skipped", "count": "skipped", "report": "cached"}
+
+    # A parameter of the last stage only re-runs that stage
+    calls.clear()
+    assert build(tmp_path, label="sum").run(["report"]) == {"report": "sum: 6/4"}
+    assert calls == ["report"]
+
+    # A parameter of a middle stage re-runs it and what depends on it
+    calls.clear()
+    assert build(tmp_path, offset=10).run(["report"]) == {"report": "mean: 16/4"}
+    assert sorted(calls) == ["report", "total"]
+
+
+def test_edited_functions_ignored_params_and_refresh(tmp_path, monkeypatch):
+    # Editing a stage function invalidates it, even under the same name
+    module_path = tmp_path / "edited_stage.py"
+    module_path.write_text("def double(n):\n    return 2 * n\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import edited_stage
+
+    def build_edited():
+        return Pipeline([Stage("double", edited_stage.double, params={"n": 3})], cache_dir=str(tmp_path / "cache"),
+                        verbose=False)
+
+    assert build_edited().run() == {"double": 6}
+    module_path.write_text("def double(n):\n    return n + n + 1\n")
+    importlib.reload(edited_stage)
+    assert build_edited().run() == {"double": 7}
+
+    # Parameters that don't change the output don't change the keys downstream
+    def build_ignored(executor):
+        return Pipeline([
+            Stage("load", load, params={"n": 4, "executor": executor}, ignore_params=("executor",)),
+            Stage("count", count, {"numbers": "load"}),
+        ], cache_dir=str(tmp_path / "cache"), verbose=False)
+
+    assert build_ignored("thread").keys() == build_ignored("process").keys()
+
+    calls.clear()
+    pipeline = build(tmp_path)
+    pipeline.run(["report"])
+    calls.clear()
+    pipeline.run(["report"], refresh=["count"])
+    assert sorted(calls) == ["count", "report"]  # load's output comes from the cache
+    calls.clear()
+    pipeline.run(["report"], refresh=True)
+    assert sorted(calls) == ["count", "load", "report", "total"]
+
+
+def test_independent_stages_run_concurrently(tmp_path, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+    printed = []
+    monkeypatch.setattr("src.pipeline.print", lambda *args: printed.append((threading.current_thread(), *args)),
+                        raising=False)
+
+    def first():
+        barrier.wait()  # would time out if the stages ran one after the other
+        return 1
+
+    def second():
+        barrier.wait()
+        return 2
+
+    pipeline = Pipeline([Stage("first", first), Stage("second", second)], cache_dir=None, verbose=True)
+    assert pipeline.run() == {"first": 1, "second": 2}
+    # Progress lines come from the calling thread only, so they can't interleave
+    assert sorted(line for _, line in printed) == ["[pipeline] first: run", "[pipeline] second: run"]
+    assert all(thread is threading.current_thread() for thread, _ in printed)
+
+
+def test_invalid_pipelines():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", load), Stage("a", count)])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", count, {"numbers": "missing"})])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", count, {"numbers": "b"}), Stage("b", count, {"numbers": "a"})]).run()
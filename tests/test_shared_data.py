@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import compute_group_differences
+from src.shared_data import SharedFrame, attach_array, attach_frame, map_partitions, release_array, share_array
+
+
+@pytest.fixture
+def combined_df():
+    rng = np.random.default_rng(5)
+    n = 600
+    return pd.DataFrame({
+        "sensor position": pd.Categorical(rng.choice(["FP1", "CZ", "O1"], n)),
+        "name": rng.choice(["co2a1", "co2a2", "co2c1"], n),
+        "subject identifier": rng.choice(["a", "c"], n),
+        "sample num": rng.integers(0, 256, n).astype(np.int16),
+        "sensor value": rng.normal(size=n).astype(np.float32),
+    })
+
+
+def test_shared_array_round_trip():
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    block, handle = share_array(array)
+    try:
+        view = attach_array(handle)
+        np.testing.assert_array_equal(view, array)
+        assert not view.flags.writeable
+    finally:
+        del view
+        release_array(block)
+
+
+def test_attached_frame_matches_original(combined_df):
+    with SharedFrame(combined_df) as shared:
+        frame = attach_frame(shared.handle)
+        pd.testing.assert_frame_equal(frame, combined_df.astype({"name": "category", "subject identifier": "category"}),
+                                      check_categorical=False)
+        # The columns are views of the shared memory, not copies
+        assert np.shares_memory(frame["sensor value"].to_numpy(), attach_array(shared.handle["columns"]["sensor value"][0]))
+        del frame
+
+
+def test_map_partitions_matches_direct_calls(combined_df):
+    kwargs = {"value": "sensor value", "subject_id": "subject identifier", "position": "sensor position",
+              "group1": "a", "group2": "c"}
+    with SharedFrame(combined_df, partition_by="name") as shared:
+        results = map_partitions(compute_group_differences, shared, workers=2, **kwargs)
+
+    assert sorted(results) == ["co2a1", "co2a2", "co2c1"]
+    for name, result in results.items():
+        expected = compute_group_differences(combined_df[combined_df["name"] == name], **kwargs)
+        pd.testing.assert_frame_equal(result, expected, check_index_type=False, check_column_type=False)
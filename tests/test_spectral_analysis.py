@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
+from src import spectral_analysis
+from src.eeg_tensor import EEGTensor
+from src.spectral_analysis import band_power_array, band_power_group_differences, band_power_t_tests, band_powers
+
+
+@pytest.fixture
+def tensor():
+    # Group 'a' has a strong 10 Hz (alpha) rhythm on CZ, everything else is noise
+    rng = np.random.default_rng(4)
+    time = np.arange(256) / 256
+    groups = np.array(["a"] * 6 + ["c"] * 6, dtype=object)
+    data = rng.normal(scale=0.5, size=(12, 2, 256))
+    data[groups == "a", 1] += 5 * np.sin(2 * np.pi * 10 * time)
+    return EEGTensor(
+        data=data.astype(np.float32),
+        channels=np.array(["FP1", "CZ"], dtype=object),
+        samples=np.arange(256),
+        subjects=np.array([f"s{i}" for i in range(12)], dtype=object),
+        groups=groups,
+        conditions=np.array(["S1 obj"] * 12, dtype=object),
+        trial_numbers=np.zeros(12, dtype=int),
+    )
+
+
+def test_band_power_array_finds_alpha(tensor):
+    power = band_power_array(tensor.data)
+    assert power.shape == (12, 2, 5)
+    bands = list(spectral_analysis.FREQUENCY_BANDS)
+    assert np.argmax(power[0, 1]) == bands.index("alpha")
+    # Integrated power of a sine of amplitude 5 is about 5**2 / 2
+    assert power[0, 1, bands.index("alpha")] == pytest.approx(12.5, rel=0.2)
+
+
+def test_band_powers_are_cached(tensor, tmp_path):
+    first = band_powers(tensor, cache_dir=str(tmp_path))
+    with patch("src.spectral_analysis.band_power_array") as mock_transform:
+        second = band_powers(tensor, cache_dir=str(tmp_path))
+    mock_transform.assert_not_called()
+    pd.testing.assert_frame_equal(first, second)
+    assert len(first) == 12 * 2 * 5
+
+
+def test_group_comparisons_per_band(tensor):
+    power_df = band_powers(tensor, cache_dir=None)
+    differences = band_power_group_differences(power_df, "subject identifier", "sensor position", "a", "c")
+    assert differences.loc["alpha"]["difference"].idxmax() == "CZ"
+
+    t_tests = band_power_t_tests(power_df, "subject identifier", "sensor position", "a", "c")
+    assert t_tests.loc[("alpha", "CZ"), "p"] < 0.001
+    assert t_tests.loc[("alpha", "CZ"), "region"] == "Central Sulcus"
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import analyze_responses_by_condition_and_group, compute_group_differences, welch_t_tests
+from src.data_cleaning import csv_combined
+from src.streaming import (MomentAccumulator, condition_stats_from_stats, group_differences_from_stats,
+                           stream_statistics, t_tests_from_stats)
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    rng = np.random.default_rng(7)
+    sensors = ["FP1", "CZ", "X"]
+    for i, (group, condition) in enumerate([("a", "S1 obj"), ("c", "S1 obj"), ("a", "S2 match"),
+                                            ("c", "S2 match"), ("a", "S1 obj")]):
+        n = len(sensors) * 8
+        df = pd.DataFrame({
+            "trial number": i,
+            "sensor position": sensors * 8,
+            "sample num": np.repeat(np.arange(8), len(sensors)),
+            "sensor value": rng.normal(1.0 if group == "a" else 0.0, 2.0, n).round(3),
+            "subject identifier": group,
+            "matching condition": condition,
+            "channel": np.tile(np.arange(len(sensors)), 8),
+            "name": f"co2{group}000036{i}",
+            "time": np.repeat(np.arange(8), len(sensors)) / 256,
+        })
+        df.loc[3, "sensor value"] = np.nan
+        df.to_csv(tmp_path / f"Data{i}.csv")
+    # An exact copy of a recording must not be counted twice
+    pd.read_csv(tmp_path / "Data0.csv", index_col=0).to_csv(tmp_path / "Data0_copy.csv")
+    return str(tmp_path)
+
+
+def test_streamed_statistics_match_in_memory(recordings):
+    combined_df = csv_combined(recordings)
+    combined_df["sensor value"] = combined_df["sensor value"].astype(float)
+    stats = stream_statistics(recordings, chunksize=10)
+
+    expected = compute_group_differences(combined_df, "sensor value", "subject identifier", "sensor position", "a", "c")
+    result = group_differences_from_stats(stats, "sensor position", "subject identifier", "a", "c")
+    pd.testing.assert_frame_equal(result, expected, check_names=False, check_index_type=False)
+
+    expected = analyze_responses_by_condition_and_group(combined_df, "sensor value", "matching condition",
+                                                        "subject identifier")
+    result = condition_stats_from_stats(stats, "matching condition", "subject identifier")
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    expected = welch_t_tests(combined_df, "sensor value", "subject identifier", "sensor position", "a", "c", ["X"])
+    result = t_tests_from_stats(stats, "sensor position", "subject identifier", "a", "c", ["X"])
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_merged_accumulators_equal_single_pass():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"sensor position": rng.choice(["FP1", "CZ"], 200), "subject identifier": rng.choice(["a", "c"], 200),
+                       "sensor value": rng.normal(size=200)})
+    keys = ["sensor position", "subject identifier"]
+    whole = MomentAccumulator(keys).update(df)
+    merged = MomentAccumulator(keys).update(df.iloc[:70]).merge(MomentAccumulator(keys).update(df.iloc[70:]))
+
+    expected = df.groupby(keys, sort=False)["sensor value"].agg(["count", "mean", "var"])
+    for accumulator in (whole, merged):
+        pd.testing.assert_frame_equal(accumulator.rollup(keys), expected, check_dtype=False)
+    with pytest.raises(ValueError):
+        whole.merge(MomentAccumulator(["sensor position"]))
+
+
+def test_chunked_reading_survives_missing_integers(recordings):
+    df = pd.read_csv(os.path.join(recordings, "Data1.csv"), index_col=0)
+    df.loc[5, "trial number"] = np.nan
+    df.to_csv(os.path.join(recordings, "Data1.csv"))
+
+    chunked = stream_statistics(recordings, chunksize=10)
+    whole = stream_statistics(recordings)
+    keys = ["sensor position", "subject identifier"]
+    pd.testing.assert_frame_equal(chunked.rollup(keys), whole.rollup(keys))
+    with pytest.raises(ValueError):
+        stream_statistics(recordings, chunksize=10, workers=2)
+
+
+def test_unreadable_files_are_skipped(recordings, capsys):
+    keys = ["sensor position", "subject identifier"]
+    expected = stream_statistics(recordings).rollup(keys)
+    broken = os.path.join(recordings, "broken.csv")
+    with open(broken, "wb") as f:
+        f.write(b"\xff\xfe\x00 not a csv")
+
+    for chunksize in (None, 10):
+        stats = stream_statistics(recordings, chunksize=chunksize)
+        pd.testing.assert_frame_equal(stats.rollup(keys), expected)
+        assert f"Error reading {broken}" in capsys.readouterr().out
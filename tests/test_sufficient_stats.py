@@ -0,0 +1,150 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import analyze_responses_by_condition_and_group, compute_group_differences, welch_t_tests
+from src.data_cleaning import csv_combined
+from src.sufficient_stats import SufficientStatsStore
+
+KEYS = ["sensor position", "subject identifier", "matching condition", "sample num"]
+
+
+def _recording(seed, group, condition):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "sensor position": ["FP1", "CZ", "O1"] * 10,
+        "sample num": np.repeat(np.arange(10), 3),
+        "sensor value": rng.normal(1.0 if group == "a" else 0.0, 2.0, 30),
+        "subject identifier": group,
+        "matching condition": condition,
+    })
+
+
+@pytest.fixture
+def recordings():
+    return {f"rec{i}": _recording(i, group, condition) for i, (group, condition) in
+            enumerate([("a", "S1 obj"), ("c", "S1 obj"), ("a", "S2 match"), ("c", "S2 match"), ("a", "S1 obj")])}
+
+
+def _assert_same_analysis(store, combined_df):
+    args = ("sensor value", "subject identifier", "sensor position", "a", "c")
+    pd.testing.assert_frame_equal(compute_group_differences(store, *args), compute_group_differences(combined_df, *args),
+                                  check_index_type=False)
+    pd.testing.assert_frame_equal(
+        analyze_responses_by_condition_and_group(store, "sensor value", "matching condition", "subject identifier"),
+        analyze_responses_by_condition_and_group(combined_df, "sensor value", "matching condition", "subject identifier"))
+    pd.testing.assert_frame_equal(
+        welch_t_tests(store, "sensor value", "subject identifier", "sensor position", "a", "c"),
+        welch_t_tests(combined_df, "sensor value", "subject identifier", "sensor position", "a", "c"))
+
+
+def test_add_and_remove_match_full_recompute(recordings):
+    store = SufficientStatsStore(store_dir=None)
+    for recording_id, df in recordings.items():
+        store.add_recording(recording_id, df)
+    _assert_same_analysis(store, pd.concat(recordings.values(), ignore_index=True))
+
+    store.remove_recording("rec2")
+    store.remove_recording("rec3")
+    remaining = pd.concat([df for recording_id, df in recordings.items() if recording_id not in ("rec2", "rec3")],
+                          ignore_index=True)
+    _assert_same_analysis(store, remaining)
+
+    expected = remaining.groupby(KEYS, sort=False)["sensor value"].agg(["count", "mean", "var"])
+    pd.testing.assert_frame_equal(store.rollup(KEYS), expected, check_dtype=False)
+
+
+def test_sync_directory_persists_and_updates(tmp_path, recordings):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for recording_id, df in recordings.items():
+        df.to_csv(data_dir / f"{recording_id}.csv")
+
+    store_dir = str(tmp_path / "store")
+    changes = SufficientStatsStore(store_dir).sync_directory(str(data_dir))
+    assert len(changes["added"]) == 5
+
+    # Reloaded from disk: only the deleted and the modified file are touched
+    (data_dir / "rec1.csv").unlink()
+    modified = recordings["rec4"].assign(**{"sensor value": recordings["rec4"]["sensor value"] + 3})
+    modified.to_csv(data_dir / "rec4.csv")
+    os.utime(data_dir / "rec4.csv", ns=(1, 1))
+    store = SufficientStatsStore(store_dir)
+    changes = store.sync_directory(str(data_dir))
+    assert changes == {"added": [], "updated": ["rec4.csv"], "removed": ["rec1.csv"], "skipped": []}
+
+    combined_df = pd.concat([recordings["rec0"], recordings["rec2"], recordings["rec3"], modified], ignore_index=True)
+    reloaded = SufficientStatsStore(store_dir)
+    assert reloaded.recordings == ["rec0.csv", "rec2.csv", "rec3.csv", "rec4.csv"]
+    expected = combined_df.groupby(["sensor position", "subject identifier"])["sensor value"].agg(["count", "mean", "var"])
+    pd.testing.assert_frame_equal(reloaded.rollup(["sensor position", "subject identifier"]).sort_index(), expected,
+                                  check_dtype=False)
+
+
+def test_rows_shared_between_recordings_are_counted_once(tmp_path, recordings):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for recording_id, df in recordings.items():
+        df.to_csv(data_dir / f"{recording_id}.csv")
+    # A copied recording and one that repeats half of another
+    recordings["rec0"].to_csv(data_dir / "rec0_copy.csv")
+    pd.concat([recordings["rec1"].iloc[:15], _recording(9, "c", "S1 obj").iloc[15:]]).to_csv(data_dir / "rec5.csv")
+
+    store_dir = str(tmp_path / "store")
+    SufficientStatsStore(store_dir).sync_directory(str(data_dir))
+    _assert_same_analysis(SufficientStatsStore(store_dir), csv_combined(str(data_dir)))
+
+    # Removing the recordings that held the shared rows hands them over to the copies
+    (data_dir / "rec0.csv").unlink()
+    (data_dir / "rec1.csv").unlink()
+    SufficientStatsStore(store_dir).sync_directory(str(data_dir))
+    _assert_same_analysis(SufficientStatsStore(store_dir), csv_combined(str(data_dir)))
+
+
+def test_unreadable_files_and_missing_parts_dont_break_the_store(tmp_path, recordings):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for recording_id, df in recordings.items():
+        df.to_csv(data_dir / f"{recording_id}.csv")
+    (data_dir / "broken.csv").write_bytes(b"\xff\xfe\x00 not a csv")
+
+    store_dir = str(tmp_path / "store")
+    changes = SufficientStatsStore(store_dir).sync_directory(str(data_dir))
+    assert changes["skipped"] == ["broken.csv"] and len(changes["added"]) == 5
+
+    # A lost part file: the totals are rebuilt from the other recordings
+    store = SufficientStatsStore(store_dir)
+    os.remove(os.path.join(store_dir, "parts", store.index["rec0.csv"]["part"]))
+    store.remove_recording("rec0.csv")
+    store.save()
+    (data_dir / "broken.csv").unlink()
+    combined_df = pd.concat([df for recording_id, df in recordings.items() if recording_id != "rec0"],
+                            ignore_index=True)
+    _assert_same_analysis(SufficientStatsStore(store_dir), combined_df)
+    assert sorted(os.listdir(os.path.join(store_dir, "parts"))) == sorted(
+        entry["part"] for entry in SufficientStatsStore(store_dir).index.values())
+
+
+def test_adding_a_recording_does_not_slow_down_as_the_store_grows():
+    rng = np.random.default_rng(0)
+    store = SufficientStatsStore(store_dir=None)
+    seconds = []
+    for i in range(240):
+        df = pd.DataFrame({"sensor position": np.tile([f"S{j}" for j in range(20)], 50),
+                           "sample num": np.repeat(np.arange(50), 20), "sensor value": rng.normal(size=1000),
+                           "subject identifier": "ac"[i % 2], "matching condition": "S1 obj"})
+        start = time.perf_counter()
+        store.add_recording(f"rec{i}", df)
+        seconds.append(time.perf_counter() - start)
+    # The store holds 240,000 row hashes at the end; looking them up must not scan all of them
+    assert np.median(seconds[-40:]) < 3 * np.median(seconds[:40])
+    hashes, counts = store.row_index.arrays()
+    assert len(hashes) == 240_000 and (hashes[1:] > hashes[:-1]).all() and (counts == 1).all()
+    for i in range(0, 240, 2):
+        store.remove_recording(f"rec{i}")
+    assert len(store.row_index.arrays()[0]) == 120_000
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_analysis import compute_group_differences
+from src.data_cleaning import csv_combined
+from src.synthetic_data import SENSOR_NAMES, generate_dataset, synthetic_trial
+
+
+def test_generated_dataset_reads_like_kaggle(tmp_path):
+    paths = generate_dataset(str(tmp_path), n_alcoholic=2, n_control=2, n_trials=3, n_channels=16, n_samples=32,
+                             group_effect=20.0, noise=1.0, workers=1)
+    assert len(paths) == 12
+    assert sorted(os.listdir(tmp_path)) == ["SMNI_CMI_TEST", "SMNI_CMI_TRAIN"]
+
+    combined_df = csv_combined(str(tmp_path))
+    assert combined_df.shape == (12 * 16 * 32, 10)
+    assert list(combined_df.columns) == ["Unnamed: 0", "trial number", "sensor position", "sample num", "sensor value",
+                                         "subject identifier", "matching condition", "channel", "name", "time"]
+    assert set(combined_df["sensor position"]) == set(SENSOR_NAMES[:16])
+
+    # The group effect is on the frontal channels only
+    differences = compute_group_differences(combined_df, "sensor value", "subject identifier", "sensor position",
+                                            "a", "c")["difference"]
+    assert differences[["FP1", "F7", "AF1"]].min() > 15
+    assert differences[["T8", "T7", "CZ"]].max() < 5
+
+
+def test_generation_is_reproducible(tmp_path):
+    serial = generate_dataset(str(tmp_path / "serial"), 1, 1, 2, n_channels=4, n_samples=16, workers=1, seed=9)
+    parallel = generate_dataset(str(tmp_path / "parallel"), 1, 1, 2, n_channels=4, n_samples=16, workers=2, seed=9)
+    for serial_path, parallel_path in zip(serial, parallel):
+        pd.testing.assert_frame_equal(pd.read_csv(serial_path), pd.read_csv(parallel_path))
+
+    trial = synthetic_trial("co2c1", "c", 0, "S2 match", np.random.default_rng(0), n_channels=64)
+    assert len(trial) == 64 * 256
+    with pytest.raises(ValueError):
+        generate_dataset(str(tmp_path / "invalid"), n_channels=65)
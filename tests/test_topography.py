@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from src.data_visualization import use_headless_backend
+from src.topography import (_color_limit, animate_topography, group_difference_frames, interpolation_weights,
+                            sensor_position, sensor_positions, topographic_frames)
+
+
+def _differences():
+    sensors = ["FP1", "FP2", "FZ", "C3", "CZ", "C4", "O1", "O2"]
+    values = np.arange(len(sensors) * 5, dtype=float).reshape(len(sensors), 5)
+    return pd.DataFrame(values, index=sensors, columns=np.arange(5) / 256)
+
+
+def test_sensor_positions_follow_the_10_10_names():
+    assert sensor_position("CZ") == (0.0, 0.0)
+    assert sensor_position("X") is None and sensor_position("nd") is None
+    assert sensor_position("C3")[0] < 0 < sensor_position("C4")[0]  # odd left, even right
+    assert sensor_position("FZ")[1] > 0 > sensor_position("OZ")[1]  # nose up
+    assert abs(np.hypot(*sensor_position("T7")) - 0.8) < 1e-9  # on the head outline
+    positions = sensor_positions(["FP1", "X", "PO8", "FP1"])
+    assert list(positions.index) == ["FP1", "PO8"]
+    assert list(positions["region"]) == ["Frontal Lobe", "Parietal-Occipital Lobe"]
+
+
+def test_frames_are_one_cached_matrix_product():
+    differences = _differences()
+    weights, inside, _ = interpolation_weights(tuple(differences.index), 32)
+    assert interpolation_weights(tuple(differences.index), 32)[0] is weights
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+
+    frames = topographic_frames(differences, 32)
+    assert frames.shape == (5, 32, 32)
+    assert np.isnan(frames[:, ~inside]).all()
+    for i, time in enumerate(differences.columns):
+        np.testing.assert_allclose(frames[i][inside], weights @ differences[time].to_numpy())
+
+
+def test_group_difference_animation(tmp_path):
+    use_headless_backend()
+    rows = []
+    for group, shift in (("a", 2.0), ("c", 0.0)):
+        for sensor in ["FZ", "CZ", "PZ", "X"]:
+            for sample in range(4):
+                rows.append({"subject identifier": group, "sensor position": sensor, "time": sample / 256,
+                             "sensor value": sample + shift})
+    differences = group_difference_frames(pd.DataFrame(rows), "sensor value", "subject identifier",
+                                          "sensor position", "time")
+    assert list(differences.index) == ["CZ", "FZ", "PZ"]  # X has no scalp position
+    np.testing.assert_allclose(differences.to_numpy(), 2.0)
+
+    path = animate_topography(differences, str(tmp_path / "topography.gif"), resolution=16)
+    with Image.open(path) as animation:
+        assert animation.n_frames == 4
+
+
+def test_missing_values_and_no_deprecated_pillow_calls(tmp_path):
+    use_headless_backend()
+    # Grid points without any value still give a finite color range
+    assert _color_limit(np.full((2, 4, 4), np.nan)) == 1.0
+    assert _color_limit(np.zeros((2, 4, 4))) == 1.0
+    assert _color_limit(np.array([[np.nan, -3.0], [2.0, np.nan]])) == 3.0
+
+    differences = _differences()
+    differences[0.0] = np.nan  # no sensor at the first time point
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        path = animate_topography(differences, str(tmp_path / "missing.gif"), resolution=16)
+    with Image.open(path) as animation:
+        assert animation.n_frames == 5